@@ -0,0 +1,169 @@
+# coding = utf-8
+"""
+OCR流水线吞吐量基准测试
+
+在一组固定的合成验证码图片（固定随机种子生成，每次相同）上比较：
+- preprocess: 只做预处理（OpenCV/NumPy整图运算）
+- per_call: 逐张识别，每张图片启动一个tesseract进程（原来关键字的做法）
+- pooled: 常驻线程池批量识别，不使用缓存
+- cached: 缓存已预热时再次识别同一组图片
+输出每项的最小耗时、每秒图片数和识别准确率，结果可保存为JSON。
+
+用法（在项目根目录下运行，需要安装 opencv-python、numpy 和 tesseract）:
+    python -m benchmarks.ocr_throughput
+    python -m benchmarks.ocr_throughput --images 200 --workers 4 --output ocr.json
+"""
+import os
+import sys
+import json
+import random
+import shutil
+import string
+import logging
+import argparse
+import platform
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from benchmarks.runner_overhead import Skipped, measure
+from extend import ocr_pipeline
+from extend.ocr_pipeline import OcrPipeline, OcrCache, TesseractPool, preprocess, cv2, np
+
+DEFAULT_IMAGES = 100
+DEFAULT_REPEAT = 3
+SEED = 20240101
+
+# 验证码字符（去掉容易混淆的字符）
+ALPHABET = "".join(c for c in string.ascii_uppercase + string.digits if c not in "0O1IL")
+
+
+def make_fixtures(count, seed=SEED):
+    """
+    生成 count 张带干扰线和噪点的验证码图片
+
+    返回:
+        list: [(PNG数据, 正确文字)]
+    """
+    if cv2 is None:
+        raise Skipped("未安装 opencv-python 或 numpy")
+    rng = random.Random(seed)
+    noise = np.random.default_rng(seed)
+    fixtures = []
+    for _ in range(count):
+        text = "".join(rng.choice(ALPHABET) for _ in range(rng.randint(4, 6)))
+        image = np.full((50, 40 + 28 * len(text), 3), 235, np.uint8)
+        for _ in range(3):
+            start = (rng.randrange(image.shape[1]), rng.randrange(image.shape[0]))
+            end = (rng.randrange(image.shape[1]), rng.randrange(image.shape[0]))
+            cv2.line(image, start, end, (160, 160, 160), 1)
+        cv2.putText(image, text, (12, 36), cv2.FONT_HERSHEY_SIMPLEX, 1.1, (30, 30, 30), 2, cv2.LINE_AA)
+        image = np.clip(image.astype(np.int16) + noise.integers(-25, 25, image.shape), 0, 255).astype(np.uint8)
+        ok, png = cv2.imencode(".png", image)
+        fixtures.append((png.tobytes(), text))
+    return fixtures
+
+
+def _accuracy(texts, fixtures):
+    correct = sum(1 for text, (_, expected) in zip(texts, fixtures) if "".join(text.split()) == expected)
+    return round(correct / len(fixtures), 3)
+
+
+def _result(timing, count):
+    return dict(timing, images_per_second=round(count / timing["min"], 1))
+
+
+def run_benchmarks(count=DEFAULT_IMAGES, repeat=DEFAULT_REPEAT, workers=None):
+    """
+    运行基准测试
+
+    返回:
+        dict: {"environment": {...}, "results": {指标: {...}}}
+    """
+    if shutil.which(ocr_pipeline.tesseract_cmd()) is None:
+        raise Skipped("未找到tesseract命令")
+    fixtures = make_fixtures(count)
+    images = [png for png, _ in fixtures]
+    results = {}
+    texts = {}
+
+    results["preprocess"] = _result(measure(lambda _: [preprocess(png) for png in images], repeat), count)
+
+    # 每张图片单独启动进程，逐张等待结果
+    pool = TesseractPool(workers=1, batch_window=0, max_batch=1)
+    try:
+        single = OcrPipeline(pool)
+
+        def per_call(_):
+            texts["per_call"] = [single.recognize(png) for png in images]
+
+        results["per_call"] = _result(measure(per_call, repeat), count)
+    finally:
+        pool.close()
+
+    pool = TesseractPool(workers=workers)
+    try:
+        pooled = OcrPipeline(pool)
+
+        def pooled_run(_):
+            texts["pooled"] = pooled.recognize_many(images)
+
+        results["pooled"] = _result(measure(pooled_run, repeat), count)
+
+        cached = OcrPipeline(pool, OcrCache(cache_dir=None, size=count))
+        cached.recognize_many(images)
+
+        def cached_run(_):
+            texts["cached"] = cached.recognize_many(images)
+
+        results["cached"] = _result(measure(cached_run, repeat), count)
+    finally:
+        pool.close()
+
+    for name in ("per_call", "pooled", "cached"):
+        results[name]["accuracy"] = _accuracy(texts[name], fixtures)
+    return {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "images": count, "repeat": repeat, "workers": pool.workers},
+        "results": results,
+    }
+
+
+def print_report(report):
+    env = report["environment"]
+    print(f"Python {env['python']}，{env['images']} 张图片，重复 {env['repeat']} 次，{env['workers']} 个worker")
+    print(f"{'指标':<12} {'最小值(ms)':>12} {'中位数(ms)':>12} {'图片/秒':>10} {'准确率':>8}")
+    for name, metric in report["results"].items():
+        accuracy = metric.get("accuracy")
+        print(f"{name:<12} {metric['min'] * 1000:>12.1f} {metric['median'] * 1000:>12.1f} "
+              f"{metric['images_per_second']:>10.1f} {'' if accuracy is None else accuracy:>8}")
+
+
+def parse_arguments():
+    """处理命令行参数"""
+    parser = argparse.ArgumentParser(description="测量OCR流水线的吞吐量")
+    parser.add_argument('--images', type=int, default=DEFAULT_IMAGES, help=f'合成图片数，默认为{DEFAULT_IMAGES}')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help=f'每项重复次数，默认为{DEFAULT_REPEAT}')
+    parser.add_argument('--workers', type=int, help='线程池worker数，默认为CPU核数的一半')
+    parser.add_argument('--output', help='把结果保存为JSON文件')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    logging.disable(logging.INFO)
+    try:
+        report = run_benchmarks(max(1, args.images), max(1, args.repeat), args.workers)
+    except Skipped as e:
+        print(f"跳过: {e}")
+        return 0
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,391 @@
+# coding = utf-8
+"""
+框架开销基准测试
+
+用进程内的模拟WebDriver代替浏览器，只测量框架本身在Python中的开销：
+- yaml_parse_cold / yaml_parse_warm: YAML用例解析（无缓存 / 命中缓存）
+- compile_steps: 关键字解析与参数检查
+- dispatch: execute_yaml_file 的完整步骤调度（包括Keywords）
+- keyword_calls: 单个关键字调用的开销，以及每个步骤发出的WebDriver命令数
+- allure_write: Allure结果文件写入
+- report_packaging: 报告打包与校验
+
+在 10、1000、10000 个合成用例上分别运行，每项重复多次取最小值和中位数，结果可保存为JSON，并按最小值与基线比较。
+
+用法（在项目根目录下运行）:
+    python -m benchmarks.runner_overhead
+    python -m benchmarks.runner_overhead --sizes 10,1000 --output bench.json
+    python -m benchmarks.runner_overhead --baseline bench.json --tolerance 0.15
+"""
+import os
+import gc
+import sys
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+from uuid import uuid4
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from extend.fake_driver import FakeDriver, BLANK_PNG
+
+DEFAULT_SIZES = (10, 1000, 10000)
+DEFAULT_REPEAT = 5
+
+# 合成用例的模板，覆盖常用关键字和各种定位方式
+CASE_TEMPLATE = """title: 基准用例{index}
+description: 合成的基准测试用例
+config:
+  default_timeout: 1
+steps:
+  - 打开页面:
+      关键字: open_browser
+      数据内容: https://example.com/case/{index}
+  - 输入用户名:
+      关键字: input_context
+      定位方式: id
+      目标对象: username
+      数据内容: user{index}
+  - 输入密码:
+      关键字: input_context
+      定位方式: xpath
+      目标对象: //input[@name='password']
+      数据内容: secret
+  - 点击登录:
+      关键字: option_click
+      定位方式: css
+      目标对象: button.login
+  - 等待页面:
+      关键字: wait_sleep
+      数据内容: 0
+  - 读取标题:
+      关键字: get_element_text
+      定位方式: xpath
+      目标对象: //h1
+  - 清空搜索框:
+      关键字: clear_input
+      定位方式: name
+      目标对象: q
+  - 校验地址:
+      关键字: assert_url
+      数据内容: https://example.com/case/{index}
+"""
+
+
+class Skipped(Exception):
+    """基准测试依赖的模块不可用"""
+
+
+def make_suite(suite_dir, size):
+    """生成 size 个合成用例，返回文件路径列表"""
+    os.makedirs(suite_dir, exist_ok=True)
+    files = []
+    for index in range(size):
+        path = os.path.join(suite_dir, f"case_{index:05d}.yaml")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(CASE_TEMPLATE.format(index=index))
+        files.append(path)
+    return files
+
+
+def make_report(report_dir, size):
+    """生成包含 size 个用例的合成Allure报告目录"""
+    for sub in ("data/test-cases", "data/attachments", "widgets", "history"):
+        os.makedirs(os.path.join(report_dir, sub), exist_ok=True)
+    with open(os.path.join(report_dir, "index.html"), 'w', encoding='utf-8') as f:
+        f.write('<html><body><div class="spinner"></div><script src="app.js"></script></body></html>')
+    with open(os.path.join(report_dir, "app.js"), 'w', encoding='utf-8') as f:
+        f.write("/* allure */\n" * 20000)
+    for index in range(size):
+        uid = f"{index:016x}"
+        case = {"uid": uid, "name": f"基准用例{index}", "status": "passed",
+                "steps": [{"name": f"步骤{n}", "status": "passed", "time": {"duration": n}} for n in range(8)]}
+        with open(os.path.join(report_dir, "data", "test-cases", f"{uid}.json"), 'w', encoding='utf-8') as f:
+            json.dump(case, f, ensure_ascii=False)
+        with open(os.path.join(report_dir, "data", "attachments", f"{uid}.png"), 'wb') as f:
+            f.write(BLANK_PNG)
+
+
+def measure(func, repeat, setup=None):
+    """
+    重复执行并计时
+
+    参数:
+        func: 被测函数，参数为 setup() 的返回值
+        repeat: 重复次数
+        setup: 每次执行前的准备（不计入耗时）
+
+    返回:
+        dict: 最小值和中位数（秒）
+    """
+    timings = []
+    for _ in range(repeat):
+        state = setup() if setup else None
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            func(state)
+            timings.append(time.perf_counter() - start)
+        finally:
+            gc.enable()
+    return {"min": min(timings), "median": statistics.median(timings)}
+
+
+def _keywords():
+    try:
+        from extend.keywords import Keywords
+    except ImportError as e:
+        raise Skipped(f"无法导入Keywords: {e}")
+    return Keywords
+
+
+def bench_yaml_parse(files, work_dir, repeat):
+    from parse.case_loader import CaseCache
+
+    def cold_setup():
+        cache_dir = os.path.join(work_dir, f"cache-{uuid4().hex}")
+        return CaseCache(cache_dir)
+
+    def load_all(cache):
+        for path in files:
+            cache.load(path)
+
+    warm_cache = CaseCache(os.path.join(work_dir, "cache-warm"))
+    load_all(warm_cache)
+    return {
+        "yaml_parse_cold": measure(load_all, repeat, cold_setup),
+        "yaml_parse_warm": measure(load_all, repeat, lambda: CaseCache(warm_cache.cache_dir)),
+    }
+
+
+def bench_compile(files, work_dir, repeat):
+    from parse.case_loader import load_case
+    from extend.keyword_registry import KeywordRegistry, compile_steps
+
+    registry = KeywordRegistry(_keywords())
+    cases = [(path, load_case(path)) for path in files]
+
+    def compile_all(_):
+        for path, case in cases:
+            compile_steps(case["steps"], registry, source=path)
+
+    return {"compile_steps": measure(compile_all, repeat)}
+
+
+def bench_dispatch(files, work_dir, repeat):
+    Keywords = _keywords()
+    try:
+        from run_yaml import execute_yaml_file
+    except ImportError as e:
+        raise Skipped(f"无法导入run_yaml: {e}")
+
+    def setup():
+        driver = FakeDriver(record=False)
+        return driver, Keywords(driver, default_timeout=1)
+
+    def run_all(state):
+        driver, keywords = state
+        for path in files:
+            execute_yaml_file(path, driver=driver, keywords=keywords, close_driver=False, resolve_depends=False)
+
+    return {"dispatch": measure(run_all, repeat, setup)}
+
+
+def bench_keyword_calls(files, work_dir, repeat):
+    from parse.case_loader import load_case
+    from extend.keyword_registry import KeywordRegistry, compile_steps
+
+    Keywords = _keywords()
+    registry = KeywordRegistry(Keywords)
+    plan = compile_steps(load_case(files[0])["steps"], registry, source=files[0])
+    calls = max(1, len(files)) * len(plan)
+
+    def setup():
+        driver = FakeDriver(record=False)
+        return driver, Keywords(driver, default_timeout=1)
+
+    def call_all(state):
+        driver, keywords = state
+        bound = [(registry.bind(step.keyword, keywords), step.params) for step in plan]
+        for _ in range(max(1, len(files))):
+            for func, params in bound:
+                func(**params)
+
+    # 每个步骤发出的WebDriver命令数与机器性能无关，可以直接比较
+    driver = FakeDriver()
+    keywords = Keywords(driver, default_timeout=1)
+    for step in plan:
+        registry.bind(step.keyword, keywords)(**step.params)
+
+    result = measure(call_all, repeat, setup)
+    result["calls"] = calls
+    return {"keyword_calls": result, "commands_per_step": round(len(driver.calls) / len(plan), 2)}
+
+
+def bench_allure_write(files, work_dir, repeat):
+    try:
+        from allure_commons.logger import AllureFileLogger
+        from allure_commons.model2 import TestResult, TestStepResult, Status, Attachment
+        from allure_commons.types import AttachmentType
+    except ImportError as e:
+        raise Skipped(f"未安装allure-python-commons: {e}")
+
+    def setup():
+        results_dir = os.path.join(work_dir, f"allure-{uuid4().hex}")
+        return AllureFileLogger(results_dir, clean=True)
+
+    def write_all(logger):
+        now = int(time.time() * 1000)
+        for index, path in enumerate(files):
+            result_uuid, attachment_uuid = str(uuid4()), str(uuid4())
+            logger.attach_data(attachment_uuid, BLANK_PNG, attachment_type=AttachmentType.PNG)
+            attachment_name = f"{attachment_uuid}-attachment.{AttachmentType.PNG.extension}"
+            steps = [TestStepResult(name=f"步骤{n}", status=Status.PASSED, start=now, stop=now + 1)
+                     for n in range(8)]
+            logger.report_result(TestResult(
+                uuid=result_uuid, name=f"基准用例{index}", fullName=path, historyId=path,
+                status=Status.PASSED, start=now, stop=now + 8, steps=steps,
+                attachments=[Attachment(source=attachment_name, name="截图", type=AttachmentType.PNG.mime_type)]
+            ))
+
+    return {"allure_write": measure(write_all, repeat, setup)}
+
+
+def bench_packaging(files, work_dir, repeat):
+    from diagnose_allure_report import package_report, verify_zip
+
+    report_dir = os.path.join(work_dir, "report")
+    make_report(report_dir, len(files))
+
+    def package(_):
+        zip_path = os.path.join(work_dir, "report.zip")
+        package_report(report_dir, zip_path)
+        if not verify_zip(zip_path)["valid"]:
+            raise RuntimeError("打包的报告校验失败")
+
+    return {"report_packaging": measure(package, repeat)}
+
+
+BENCHMARKS = {
+    "yaml_parse": bench_yaml_parse,
+    "compile": bench_compile,
+    "dispatch": bench_dispatch,
+    "keyword_calls": bench_keyword_calls,
+    "allure_write": bench_allure_write,
+    "packaging": bench_packaging,
+}
+
+
+def run_benchmarks(sizes, repeat=DEFAULT_REPEAT, only=None):
+    """
+    运行基准测试
+
+    返回:
+        dict: {"environment": {...}, "results": {用例数: {指标: 数值}}, "skipped": {...}}
+    """
+    report = {
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "repeat": repeat},
+        "results": {},
+        "skipped": {},
+    }
+    original_dir = os.getcwd()
+    for size in sizes:
+        work_dir = tempfile.mkdtemp(prefix=f"bench_{size}_")
+        # 在临时目录中运行，用例缓存、耗时明细等文件不写入项目目录
+        os.chdir(work_dir)
+        try:
+            files = make_suite(os.path.join(work_dir, "cases"), size)
+            results = {}
+            for name, bench in BENCHMARKS.items():
+                if only and name not in only:
+                    continue
+                try:
+                    results.update(bench(files, work_dir, repeat))
+                except Skipped as e:
+                    report["skipped"][name] = str(e)
+            for metric in results.values():
+                if isinstance(metric, dict):
+                    metric["per_case_us"] = round(metric["min"] / size * 1e6, 2)
+            report["results"][str(size)] = results
+        finally:
+            os.chdir(original_dir)
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return report
+
+
+def compare(report, baseline, tolerance):
+    """与基线比较耗时的最小值（受机器负载影响最小），返回变慢超过容差的指标"""
+    regressions = []
+    for size, results in report["results"].items():
+        for name, metric in results.items():
+            old = baseline.get("results", {}).get(size, {}).get(name)
+            if isinstance(metric, dict) and isinstance(old, dict) and old.get("min"):
+                ratio = metric["min"] / old["min"]
+                if ratio > 1 + tolerance:
+                    regressions.append((size, name, old["min"], metric["min"], ratio))
+            elif isinstance(metric, (int, float)) and isinstance(old, (int, float)) and metric > old:
+                regressions.append((size, name, old, metric, metric / old if old else float("inf")))
+    return regressions
+
+
+def print_report(report):
+    print(f"Python {report['environment']['python']}，重复 {report['environment']['repeat']} 次")
+    print(f"{'用例数':>8}  {'指标':<20} {'最小值(ms)':>12} {'中位数(ms)':>12} {'每用例(us)':>12}")
+    for size, results in report["results"].items():
+        for name, metric in results.items():
+            if isinstance(metric, dict):
+                print(f"{size:>8}  {name:<20} {metric['min'] * 1000:>12.2f} {metric['median'] * 1000:>12.2f} "
+                      f"{metric['per_case_us']:>12.2f}")
+            else:
+                print(f"{size:>8}  {name:<20} {metric:>12}")
+    for name, reason in report["skipped"].items():
+        print(f"跳过 {name}: {reason}")
+
+
+def parse_arguments():
+    """处理命令行参数"""
+    parser = argparse.ArgumentParser(description="使用模拟WebDriver测量框架自身的开销")
+    parser.add_argument('--sizes', default=",".join(str(s) for s in DEFAULT_SIZES),
+                        help='合成用例数，逗号分隔，默认为10,1000,10000')
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help='每项重复次数，默认为5')
+    parser.add_argument('--only', help='只运行指定的基准，逗号分隔: ' + ",".join(BENCHMARKS))
+    parser.add_argument('--output', help='把结果保存为JSON文件')
+    parser.add_argument('--baseline', help='与基线JSON文件比较，有指标变慢超过容差时退出码为1')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='允许变慢的比例，默认为0.15')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+    # 关闭INFO日志，避免日志输出的耗时掩盖框架本身的变化
+    logging.disable(logging.INFO)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    only = set(args.only.split(",")) if args.only else None
+    report = run_benchmarks(sizes, repeat=max(1, args.repeat), only=only)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for size, name, old, new, ratio in regressions:
+            print(f"性能下降: {size} 个用例 {name} {old} -> {new}（x{ratio:.2f}）")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
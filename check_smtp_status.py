@@ -4,19 +4,33 @@
 企业微信邮箱SMTP服务状态检查脚本
 """
 
+import os
+import sys
+import json
+import math
 import smtplib
 import ssl
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import time
 
+# 默认SMTP服务器
+DEFAULT_SMTP_SERVER = 'smtp.exmail.qq.com'
+DEFAULT_SMTP_PORT = 465
+
+# 探测模式下认证信息所在的环境变量
+SMTP_USERNAME_ENV = 'SMTP_USERNAME'
+SMTP_PASSWORD_ENV = 'SMTP_PASSWORD'
+
 def check_smtp_connection():
     """检查SMTP连接状态"""
     print("🔍 检查企业微信邮箱SMTP服务状态...")
     
     # 企业微信邮箱SMTP配置
-    smtp_server = 'smtp.exmail.qq.com'
-    smtp_port = 465
+    smtp_server = DEFAULT_SMTP_SERVER
+    smtp_port = DEFAULT_SMTP_PORT
     
     try:
         # 创建SSL上下文
@@ -44,8 +58,8 @@ def test_smtp_auth(username, password):
     """测试SMTP认证"""
     print(f"\n🔐 测试认证: {username}")
     
-    smtp_server = 'smtp.exmail.qq.com'
-    smtp_port = 465
+    smtp_server = DEFAULT_SMTP_SERVER
+    smtp_port = DEFAULT_SMTP_PORT
     
     try:
         context = ssl.create_default_context()
@@ -67,6 +81,119 @@ def test_smtp_auth(username, password):
         print(f"❌ 其他错误: {e}")
         return False
 
+def probe_once(host, port, use_ssl=True, timeout=10, username=None, password=None):
+    """
+    建立一次连接并记录各阶段耗时（毫秒）
+
+    connect 包括TCP连接、TLS握手和读取服务器欢迎信息，ehlo 和 auth 分别为对应命令的耗时。
+    """
+    result = {"connect_ms": None, "ehlo_ms": None, "auth_ms": None, "error": None}
+    server = None
+    try:
+        start = time.perf_counter()
+        if use_ssl:
+            server = smtplib.SMTP_SSL(host, port, timeout=timeout, context=ssl.create_default_context())
+        else:
+            server = smtplib.SMTP(host, port, timeout=timeout)
+        result["connect_ms"] = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        code, _ = server.ehlo()
+        result["ehlo_ms"] = (time.perf_counter() - start) * 1000
+        if code != 250:
+            raise smtplib.SMTPHeloError(code, "EHLO失败")
+
+        if username and password:
+            start = time.perf_counter()
+            server.login(username, password)
+            result["auth_ms"] = (time.perf_counter() - start) * 1000
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                pass
+    return result
+
+
+def percentile(values, percent):
+    """最近秩法计算百分位数"""
+    if not values:
+        return None
+    values = sorted(values)
+    index = max(0, math.ceil(percent / 100 * len(values)) - 1)
+    return round(values[index], 2)
+
+
+def latency_stats(values):
+    """计算耗时统计"""
+    if not values:
+        return None
+    return {
+        "min": round(min(values), 2),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": round(max(values), 2),
+    }
+
+
+def run_probe(host, port, concurrency=10, use_ssl=True, timeout=10, username=None, password=None):
+    """
+    同时建立多个连接探测SMTP服务
+
+    返回:
+        dict: 连接数、失败数、各阶段的耗时统计和错误信息
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = [executor.submit(probe_once, host, port, use_ssl, timeout, username, password)
+                   for _ in range(concurrency)]
+        results = [future.result() for future in futures]
+    errors = [r["error"] for r in results if r["error"]]
+
+    return {
+        "host": host,
+        "port": port,
+        "ssl": use_ssl,
+        "concurrency": concurrency,
+        "auth": bool(username and password),
+        "succeeded": len(results) - len(errors),
+        "failed": len(errors),
+        "wall_ms": round((time.perf_counter() - start) * 1000, 2),
+        "connect_ms": latency_stats([r["connect_ms"] for r in results if r["connect_ms"] is not None]),
+        "ehlo_ms": latency_stats([r["ehlo_ms"] for r in results if r["ehlo_ms"] is not None]),
+        "auth_ms": latency_stats([r["auth_ms"] for r in results if r["auth_ms"] is not None]),
+        "errors": sorted(set(errors)),
+    }
+
+
+def parse_arguments():
+    """处理命令行参数"""
+    parser = argparse.ArgumentParser(description="SMTP服务诊断工具，不带参数时进入交互式诊断")
+    parser.add_argument('--probe', action='store_true', help='非交互式探测模式，输出JSON')
+    parser.add_argument('--host', default=DEFAULT_SMTP_SERVER, help=f'SMTP服务器，默认为{DEFAULT_SMTP_SERVER}')
+    parser.add_argument('--port', type=int, default=DEFAULT_SMTP_PORT, help=f'SMTP端口，默认为{DEFAULT_SMTP_PORT}')
+    parser.add_argument('-n', '--concurrency', type=int, default=10, help='同时建立的连接数，默认为10')
+    parser.add_argument('--no-ssl', action='store_true', help='使用明文SMTP连接（本地测试服务器）')
+    parser.add_argument('--timeout', type=float, default=10, help='单个连接的超时时间（秒），默认为10')
+    parser.add_argument('--no-auth', action='store_true',
+                        help=f'不进行认证（默认在设置了{SMTP_USERNAME_ENV}/{SMTP_PASSWORD_ENV}时认证）')
+    return parser.parse_args()
+
+
+def probe_main(args):
+    """探测模式入口，全部连接成功时返回0"""
+    username = None if args.no_auth else os.environ.get(SMTP_USERNAME_ENV)
+    password = None if args.no_auth else os.environ.get(SMTP_PASSWORD_ENV)
+    report = run_probe(args.host, args.port, concurrency=max(1, args.concurrency), use_ssl=not args.no_ssl,
+                       timeout=args.timeout, username=username, password=password)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0 if report["failed"] == 0 else 1
+
+
 def main():
     """主函数"""
     print("=" * 50)
@@ -99,4 +226,7 @@ def main():
         print("4. 联系企业微信管理员确认设置")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    arguments = parse_arguments()
+    if arguments.probe:
+        sys.exit(probe_main(arguments))
+    main()
@@ -4,8 +4,10 @@
 import logging
 import pytest
 from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 from extend.driver_manager import DriverManager
+from extend.driver_cache import cached_driver_path, remember_driver
+from extend import process_tracker, lean_browser
+from concurrent.futures import ThreadPoolExecutor, wait
 import allure
 import sys
 import os
@@ -19,40 +21,30 @@ _active_drivers = []
 # 默认的本地驱动路径
 DEFAULT_CHROME_DRIVER_PATH = r"D:\program\chromedriver-win64\chromedriver-win64\chromedriver.exe"
 
-# 使用我们的驱动管理器，自动检查和更新驱动
-@pytest.fixture(scope="function")
-def driver(request):
+# 会话结束时关闭单个浏览器的等待时间（秒）
+DRIVER_QUIT_TIMEOUT = 10
+
+def _create_driver(request):
+    """根据命令行参数创建一个新的WebDriver实例"""
     browser_type = request.config.getoption("--browser", default="chrome")
     headless = request.config.getoption("--headless", default=False)
     
-    # 获取驱动路径，如果命令行没有指定，则使用默认路径
+    # 获取驱动路径，如果命令行没有指定，则依次使用本地驱动缓存中与浏览器版本匹配的驱动、默认路径
     local_driver_path = request.config.getoption("--driver-path")
     if local_driver_path is None:  # 如果命令行没有指定驱动路径
-        local_driver_path = DEFAULT_CHROME_DRIVER_PATH
+        local_driver_path = cached_driver_path(browser_type) or DEFAULT_CHROME_DRIVER_PATH
     
     options = None
     if browser_type.lower() == "chrome":
-        options = Options()
-        if headless:
-            options.add_argument("--headless")
-        
-        # 添加额外的Chrome选项，减少错误日志
-        options.add_argument('--ignore-certificate-errors')
-        options.add_argument('--ignore-ssl-errors')
-        options.add_argument('--log-level=3')  # 仅显示致命错误
-        options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        options.add_argument('--disable-dev-shm-usage')
-        
-        # 添加性能优化选项
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-gpu')
-        options.add_argument('--disable-extensions')
+        # 通用选项（减少错误日志、性能优化），开启精简模式时使用新版无头模式并关闭无关的后台功能
+        options = lean_browser.chrome_options(headless, lean_browser.lean_config())
     
     # 使用驱动管理器获取驱动
     driver_manager = DriverManager()
     
     # 检查本地驱动路径是否存在
-    if os.path.exists(local_driver_path):
+    use_local_driver = os.path.exists(local_driver_path)
+    if use_local_driver:
         logging.info(f"使用本地驱动: {local_driver_path}")
         driver_manager.set_local_driver_path(browser_type, local_driver_path)
     else:
@@ -60,12 +52,56 @@ def driver(request):
     
     driver = driver_manager.get_driver(browser_type, options)
     
-    # 将驱动添加到活动驱动列表中
+    # 自动下载的驱动加入本地缓存，之后的会话无需再检查版本
+    if not use_local_driver:
+        remember_driver(driver, browser_type)
+    
+    # 将驱动添加到活动驱动列表中，并登记本次运行启动的浏览器进程
     _active_drivers.append(driver)
+    process_tracker.register_driver(driver)
     
     # 设置浏览器窗口大小
     driver.maximize_window()
     
+    return driver
+
+def _forget_driver(driver):
+    """从活动驱动列表中移除已关闭的浏览器"""
+    if driver in _active_drivers:
+        _active_drivers.remove(driver)
+    process_tracker.unregister_driver(driver)
+
+# 浏览器复用池，仅在 --driver-pool 模式下创建
+@pytest.fixture(scope="session")
+def driver_pool(request):
+    if not request.config.getoption("--driver-pool", default=False):
+        yield None
+        return
+    
+    from extend.driver_pool import DriverPool
+    pool = DriverPool(
+        factory=lambda: _create_driver(request),
+        max_reuse=request.config.getoption("--max-reuse", default=50),
+        on_close=_forget_driver
+    )
+    logging.info("已启用浏览器复用池")
+    
+    yield pool
+    
+    pool.close_all()
+
+# 使用我们的驱动管理器，自动检查和更新驱动
+@pytest.fixture(scope="function")
+def driver(request, driver_pool):
+    if driver_pool is not None:
+        # 复用池模式：从池中取出浏览器，测试结束后重置并归还
+        driver = driver_pool.acquire()
+        yield driver
+        driver_pool.release(driver)
+        return
+    
+    driver = _create_driver(request)
+    
     yield driver
     
     # 测试结束后关闭浏览器，使用静默关闭来减少连接错误
@@ -73,8 +109,7 @@ def driver(request):
         driver.execute_script("window.onbeforeunload = function() {};")  # 禁用页面的beforeunload事件
         driver.quit()
         # 从活动驱动列表中移除
-        if driver in _active_drivers:
-            _active_drivers.remove(driver)
+        _forget_driver(driver)
     except Exception as e:
         logging.debug(f"关闭浏览器时出现错误（通常可以忽略）: {e}")
 
@@ -87,49 +122,48 @@ def pytest_sessionfinish(session, exitstatus):
     """
     global _active_drivers
     
+    # 输出智能等待节省时间的汇总
+    from extend import smart_wait, step_timing
+    smart_wait.write_report()
+    
+    # 按本次运行的步骤耗时明细生成Prometheus指标文件
+    step_timing.write_prometheus()
+    
     if _active_drivers:
         logging.warning(f"发现 {len(_active_drivers)} 个未关闭的浏览器实例，正在强制关闭...")
         
-        for driver in _active_drivers[:]:  # 使用副本进行迭代
-            try:
-                # 检查驱动是否还活着
-                try:
-                    # 尝试执行一个简单操作，如果失败则说明浏览器已关闭
-                    driver.current_url
-                    # 浏览器仍在运行，需要关闭
-                    logging.info("正在关闭浏览器实例...")
-                    driver.execute_script("window.onbeforeunload = function() {};")
-                    driver.quit()
-                    logging.info("成功关闭浏览器实例")
-                except Exception as e:
-                    # 浏览器可能已经关闭，但未从列表中移除
-                    logging.debug(f"浏览器实例已关闭或无法访问: {str(e)}")
-                
-                # 从列表中移除，无论是否成功关闭
-                _active_drivers.remove(driver)
-            except Exception as e:
-                logging.error(f"尝试关闭浏览器时出错: {e}")
+        # 并行关闭浏览器，单个浏览器最多等待 DRIVER_QUIT_TIMEOUT 秒，未关闭的由下面按进程结束
+        executor = ThreadPoolExecutor(max_workers=min(len(_active_drivers), 8))
+        futures = [executor.submit(_quit_driver, driver) for driver in _active_drivers[:]]
+        _, not_done = wait(futures, timeout=DRIVER_QUIT_TIMEOUT)
+        executor.shutdown(wait=False)
+        if not_done:
+            logging.warning(f"{len(not_done)} 个浏览器实例未在 {DRIVER_QUIT_TIMEOUT} 秒内关闭")
         
         # 清空列表
         _active_drivers.clear()
         logging.info("所有浏览器实例已清理完毕")
-        
-        # 强制结束所有chrome进程（作为最后的保险措施）
-        try:
-            if sys.platform.startswith('win'):
-                os.system('taskkill /f /im chromedriver.exe /t')
-                os.system('taskkill /f /im chrome.exe /t')
-                logging.info("已强制结束Chrome相关进程")
-            elif sys.platform.startswith('linux'):
-                os.system('pkill -f chrome')
-                os.system('pkill -f chromedriver')
-                logging.info("已强制结束Chrome相关进程")
-            elif sys.platform.startswith('darwin'):  # macOS
-                os.system('pkill -f "Google Chrome"')
-                os.system('pkill -f chromedriver')
-                logging.info("已强制结束Chrome相关进程")
-        except Exception as e:
-            logging.error(f"强制结束Chrome进程时出错: {e}")
+    
+    # 只结束本进程启动的浏览器进程（作为最后的保险措施），不影响同一台机器上的其他运行
+    try:
+        process_tracker.terminate_processes(owner=os.getpid())
+    except Exception as e:
+        logging.error(f"结束浏览器进程时出错: {e}")
+
+def _quit_driver(driver):
+    """关闭一个浏览器实例"""
+    try:
+        # 尝试执行一个简单操作，如果失败则说明浏览器已关闭
+        driver.current_url
+        # 浏览器仍在运行，需要关闭
+        logging.info("正在关闭浏览器实例...")
+        driver.execute_script("window.onbeforeunload = function() {};")
+        driver.quit()
+        process_tracker.unregister_driver(driver)
+        logging.info("成功关闭浏览器实例")
+    except Exception as e:
+        # 浏览器可能已经关闭，但未从列表中移除
+        logging.debug(f"浏览器实例已关闭或无法访问: {str(e)}")
 
 # 添加命令行参数
 def pytest_addoption(parser):
@@ -144,6 +178,12 @@ def pytest_addoption(parser):
                      help="指定要运行的YAML文件路径")
     parser.addoption("--yaml-dir", action="store", default="examples",
                      help="指定要运行的YAML文件目录，默认为examples")
+    parser.addoption("--yaml-list", action="store", default=None,
+                     help="用例列表文件（每行一个YAML路径），只执行目录中列出的用例并按列表顺序执行")
+    parser.addoption("--driver-pool", action="store_true", default=False,
+                     help="复用浏览器实例，测试之间只重置浏览器状态而不重新启动")
+    parser.addoption("--max-reuse", action="store", type=int, default=50,
+                     help="复用池模式下单个浏览器的最大复用次数，达到后重建，0表示不限制")
 
 # 测试会话开始时重置驱动检查标志
 @pytest.fixture(scope="session", autouse=True)
@@ -151,10 +191,36 @@ def reset_driver_check_flag():
     DriverManager.reset_check_flag()
     yield
 
+# 按 --yaml-list 筛选并排序用例（并行执行时每个worker只执行分到的用例）
+def pytest_collection_modifyitems(config, items):
+    list_file = config.getoption("--yaml-list")
+    if not list_file:
+        return
+    from utils.parallel_runner import read_yaml_list, select_items
+    selected, deselected = select_items(items, read_yaml_list(list_file))
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+    items[:] = selected
+
+# 并行执行时各worker进程共享的失败计数（run.py --fail-fast）
+_fail_fast = None
+
+def pytest_sessionstart(session):
+    global _fail_fast
+    from utils.parallel_runner import FailFast
+    _fail_fast = FailFast.from_env()
+
+def pytest_runtest_logreport(report):
+    if _fail_fast is not None and report.failed and report.when in ("setup", "call"):
+        _fail_fast.record_failure()
+
 # 异常处理：在每个测试失败后检查浏览器状态
 @pytest.hookimpl(tryfirst=True)
 def pytest_runtest_protocol(item, nextitem):
-    pass
+    # 其他worker的失败也计入，达到上限后当前worker不再开始新的用例
+    if _fail_fast is not None and _fail_fast.stopped:
+        item.session.shouldstop = f"各worker失败用例数已达到 {_fail_fast.limit} 个"
+        return True
 
 @pytest.hookimpl(tryfirst=True)
 def pytest_exception_interact(node, call, report):
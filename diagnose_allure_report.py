@@ -6,9 +6,49 @@ Allure报告诊断工具
 """
 
 import os
+import sys
 import json
 import zipfile
+import argparse
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# 已经压缩过的文件类型，打包时直接存储，不再deflate
+COMPRESSED_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.gif', '.zip', '.gz', '.woff', '.woff2', '.mp4', '.webm'}
+
+# 压缩级别
+COMPRESS_LEVEL = 6
+
+def _check_json(file_path):
+    """解析单个JSON文件，返回机器可读的检查结果"""
+    result = {"file": file_path, "exists": os.path.exists(file_path), "valid": False, "error": None}
+    if not result["exists"]:
+        result["error"] = "缺失"
+        return result
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            json.load(f)
+        result["valid"] = True
+    except Exception as e:
+        result["error"] = f"JSON解析失败: {e}"
+    return result
+
+def check_json_files(file_paths):
+    """
+    检查多个JSON文件（只有几个小文件，直接依次解析）
+    
+    返回:
+        list: 每个文件的检查结果 {file, exists, valid, error}，顺序与输入一致
+    """
+    return [_check_json(path) for path in file_paths]
+
+def _print_json_results(results):
+    for result in results:
+        file = os.path.basename(result["file"])
+        if result["valid"]:
+            print(f"  ✅ {file} - 有效JSON")
+        else:
+            print(f"  ❌ {file} - {result['error']}")
 
 def check_report_structure(report_dir):
     """检查报告目录结构"""
@@ -76,17 +116,7 @@ def check_data_files(report_dir):
         'categories.json'
     ]
     
-    for file in key_data_files:
-        file_path = os.path.join(data_dir, file)
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                print(f"  ✅ {file} - 有效JSON")
-            except Exception as e:
-                print(f"  ❌ {file} - JSON解析失败: {e}")
-        else:
-            print(f"  ❌ {file} - 缺失")
+    _print_json_results(check_json_files([os.path.join(data_dir, file) for file in key_data_files]))
     
     return True
 
@@ -109,17 +139,7 @@ def check_widgets_files(report_dir):
         'duration.json'
     ]
     
-    for file in key_widget_files:
-        file_path = os.path.join(widgets_dir, file)
-        if os.path.exists(file_path):
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                print(f"  ✅ {file} - 有效JSON")
-            except Exception as e:
-                print(f"  ❌ {file} - JSON解析失败: {e}")
-        else:
-            print(f"  ❌ {file} - 缺失")
+    _print_json_results(check_json_files([os.path.join(widgets_dir, file) for file in key_widget_files]))
     
     return True
 
@@ -152,7 +172,59 @@ def check_plugins_files(report_dir):
     
     return True
 
-def create_test_zip(report_dir):
+def _read_file(file_path, arcname):
+    """
+    读取单个文件，PNG/WebP等已压缩的文件直接存储，其余文件deflate压缩
+    
+    返回:
+        tuple: (ZipInfo, 文件内容)
+    """
+    zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+    if os.path.splitext(file_path)[1].lower() in COMPRESSED_EXTENSIONS:
+        zinfo.compress_type = zipfile.ZIP_STORED
+    else:
+        zinfo.compress_type = zipfile.ZIP_DEFLATED
+    with open(file_path, 'rb') as f:
+        return zinfo, f.read()
+
+def package_report(report_dir, zip_path, workers=None):
+    """
+    打包报告目录
+    
+    多个线程预先读取文件，主线程按顺序通过 ZipFile.writestr 写入zip；PNG/WebP等已压缩的文件直接存储。
+    同时在途的文件数量有上限，避免大报告占用过多内存。
+    
+    返回:
+        dict: 文件数量、原始大小、压缩后大小
+    """
+    workers = workers or os.cpu_count() or 1
+    file_paths = []
+    for root, dirs, files in os.walk(report_dir):
+        dirs.sort()
+        for file in sorted(files):
+            file_paths.append(os.path.join(root, file))
+    
+    total_size = 0
+    with zipfile.ZipFile(zip_path, 'w') as zipf, ThreadPoolExecutor(max_workers=workers) as executor:
+        window = workers * 2
+        pending = []
+        for index, file_path in enumerate(file_paths):
+            pending.append(executor.submit(_read_file, file_path, os.path.relpath(file_path, report_dir)))
+            if len(pending) >= window or index == len(file_paths) - 1:
+                for future in pending:
+                    zinfo, data = future.result()
+                    zipf.writestr(zinfo, data, compresslevel=COMPRESS_LEVEL)
+                    total_size += len(data)
+                pending = []
+    
+    return {
+        "zip_path": zip_path,
+        "file_count": len(file_paths),
+        "total_size": total_size,
+        "zip_size": os.path.getsize(zip_path),
+    }
+
+def create_test_zip(report_dir, workers=None):
     """创建测试zip文件"""
     print("\n" + "=" * 60)
     print("🗜️ 创建测试zip文件")
@@ -163,23 +235,11 @@ def create_test_zip(report_dir):
     zip_path = os.path.join(os.path.dirname(report_dir), zip_filename)
     
     try:
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            file_count = 0
-            total_size = 0
-            
-            for root, dirs, files in os.walk(report_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, report_dir)
-                    zipf.write(file_path, arcname)
-                    file_count += 1
-                    total_size += os.path.getsize(file_path)
-        
-        zip_size = os.path.getsize(zip_path)
+        stats = package_report(report_dir, zip_path, workers)
         print(f"✅ 测试zip文件创建成功: {zip_path}")
-        print(f"📊 文件数量: {file_count}")
-        print(f"📁 原始大小: {total_size / 1024 / 1024:.2f} MB")
-        print(f"🗜️ 压缩大小: {zip_size / 1024 / 1024:.2f} MB")
+        print(f"📊 文件数量: {stats['file_count']}")
+        print(f"📁 原始大小: {stats['total_size'] / 1024 / 1024:.2f} MB")
+        print(f"🗜️ 压缩大小: {stats['zip_size'] / 1024 / 1024:.2f} MB")
         
         return zip_path
         
@@ -187,38 +247,56 @@ def create_test_zip(report_dir):
         print(f"❌ 创建zip文件失败: {e}")
         return None
 
-def extract_and_test_zip(zip_path, extract_dir):
-    """解压并测试zip文件"""
-    print("\n" + "=" * 60)
-    print("📦 解压并测试zip文件")
-    print("=" * 60)
+def verify_zip(zip_path):
+    """
+    不解压，直接流式校验zip文件
+    
+    逐个读取成员校验CRC，并检查index.html是否存在且包含加载动画元素。
     
+    返回:
+        dict: 机器可读的校验结果
+    """
+    result = {"zip_path": zip_path, "valid": False, "members": 0, "bad_member": None,
+              "index_html": False, "spinner": False, "error": None}
     try:
         with zipfile.ZipFile(zip_path, 'r') as zipf:
-            zipf.extractall(extract_dir)
-        
-        print(f"✅ 文件解压成功到: {extract_dir}")
-        
-        # 检查解压后的文件
-        index_path = os.path.join(extract_dir, 'index.html')
-        if os.path.exists(index_path):
-            print(f"✅ index.html存在: {index_path}")
-            
-            # 检查文件内容
-            with open(index_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                if 'spinner' in content:
-                    print("✅ index.html包含加载动画元素")
-                else:
-                    print("⚠️ index.html可能不完整")
-        else:
-            print("❌ index.html不存在")
-        
-        return True
-        
+            result["members"] = len(zipf.infolist())
+            result["bad_member"] = zipf.testzip()
+            if 'index.html' in zipf.namelist():
+                result["index_html"] = True
+                with zipf.open('index.html') as f:
+                    result["spinner"] = b'spinner' in f.read()
+        result["valid"] = result["bad_member"] is None and result["index_html"]
     except Exception as e:
-        print(f"❌ 解压文件失败: {e}")
+        result["error"] = str(e)
+    return result
+
+def verify_test_zip(zip_path):
+    """流式校验zip文件并输出结果"""
+    print("\n" + "=" * 60)
+    print("📦 校验zip文件")
+    print("=" * 60)
+    
+    result = verify_zip(zip_path)
+    if result["error"]:
+        print(f"❌ 读取zip文件失败: {result['error']}")
         return False
+    
+    if result["bad_member"]:
+        print(f"❌ 文件损坏: {result['bad_member']}")
+    else:
+        print(f"✅ {result['members']} 个文件校验通过")
+    
+    if result["index_html"]:
+        print("✅ index.html存在")
+        if result["spinner"]:
+            print("✅ index.html包含加载动画元素")
+        else:
+            print("⚠️ index.html可能不完整")
+    else:
+        print("❌ index.html不存在")
+    
+    return result["valid"]
 
 def provide_solutions():
     """提供解决方案"""
@@ -251,13 +329,50 @@ def provide_solutions():
     print("   - 解压到本地目录")
     print("   - 在该目录运行：python -m http.server 8000")
 
+def diagnose_json(report_dir, zip_path=None, workers=None):
+    """
+    输出机器可读的诊断结果（JSON），供CI使用
+    
+    返回:
+        int: 退出码，全部检查通过为0
+    """
+    key_files = [os.path.join(report_dir, 'data', f) for f in
+                 ('behaviors.json', 'suites.json', 'timeline.json', 'categories.json')]
+    key_files += [os.path.join(report_dir, 'widgets', f) for f in
+                  ('summary.json', 'status-chart.json', 'severity.json', 'duration.json')]
+    result = {"report_dir": report_dir, "exists": os.path.isdir(report_dir)}
+    if result["exists"]:
+        result["json"] = check_json_files(key_files)
+        if zip_path:
+            result["package"] = package_report(report_dir, zip_path, workers)
+            result["verify"] = verify_zip(zip_path)
+    
+    ok = result["exists"] and all(r["valid"] for r in result.get("json", [])) \
+        and result.get("verify", {}).get("valid", True)
+    result["ok"] = ok
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0 if ok else 1
+
+def parse_arguments():
+    """处理命令行参数"""
+    parser = argparse.ArgumentParser(description="Allure报告诊断工具")
+    parser.add_argument('--report-dir', default='./report', help='报告目录，默认为./report')
+    parser.add_argument('--json', action='store_true', help='以JSON格式输出检查结果')
+    parser.add_argument('--package', help='把报告打包到指定的zip文件并保留（默认只打包测试后删除）')
+    parser.add_argument('--workers', type=int, default=None, help='打包时并行读取文件的线程数，默认为CPU核数')
+    return parser.parse_args()
+
 def main():
     """主函数"""
+    args = parse_arguments()
+    report_dir = args.report_dir
+    
+    if args.json:
+        sys.exit(diagnose_json(report_dir, args.package, args.workers))
+    
     print("🤖 Allure报告诊断工具")
     print("用于检查报告完整性和解决加载问题")
     
-    report_dir = "./report"
-    
     # 检查报告结构
     if not check_report_structure(report_dir):
         return
@@ -271,18 +386,22 @@ def main():
     # 检查插件文件
     check_plugins_files(report_dir)
     
-    # 创建测试zip文件
-    zip_path = create_test_zip(report_dir)
-    
-    if zip_path:
-        # 解压并测试
-        extract_dir = f"./test_extract_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        extract_and_test_zip(zip_path, extract_dir)
+    # 打包报告：指定了--package时保留zip文件，否则创建测试zip文件
+    if args.package:
+        stats = package_report(report_dir, args.package, args.workers)
+        print(f"\n✅ 报告已打包: {args.package} ({stats['zip_size'] / 1024 / 1024:.2f} MB)")
+        verify_test_zip(args.package)
+    else:
+        zip_path = create_test_zip(report_dir, args.workers)
         
-        # 清理测试文件
-        if os.path.exists(zip_path):
-            os.remove(zip_path)
-            print(f"\n🧹 已清理测试zip文件: {zip_path}")
+        if zip_path:
+            # 不解压，直接校验
+            verify_test_zip(zip_path)
+            
+            # 清理测试文件
+            if os.path.exists(zip_path):
+                os.remove(zip_path)
+                print(f"\n🧹 已清理测试zip文件: {zip_path}")
     
     # 提供解决方案
     provide_solutions()
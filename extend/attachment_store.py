@@ -0,0 +1,277 @@
+# coding = utf-8
+"""
+按内容寻址的附件存储
+
+截图附件以内容哈希命名，相同内容只保存一份；可选缩小分辨率并用有损的 JPEG/WebP 重新编码。
+既可以在写入附件时使用（截图流水线），也可以在生成报告前对已有的 allure-results 做一次整理：
+重新编码图片附件、按内容合并重复的附件（包括文本、HTML等其他类型），并同步修改结果文件中的引用。
+已按内容命名的附件不再处理，重复整理同一个目录不会重复编码。
+"""
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 环境变量配置，run.py 的 --attachment-* 参数会设置这些变量
+ATTACHMENT_FORMAT_ENV = "ATTACHMENT_FORMAT"
+ATTACHMENT_QUALITY_ENV = "ATTACHMENT_QUALITY"
+ATTACHMENT_MAX_WIDTH_ENV = "ATTACHMENT_MAX_WIDTH"
+
+# 支持的编码格式: 扩展名 -> MIME类型
+FORMATS = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+DEFAULT_QUALITY = 80
+
+# 可以重新编码的图片类型
+IMAGE_TYPES = ("image/png", "image/jpeg", "image/webp", "image/bmp")
+
+# 按内容命名的附件文件名
+STORED_NAME = re.compile(r"^[0-9a-f]{40}-attachment(\.\w+)?$")
+
+try:
+    import numpy as np
+    import cv2
+except ImportError:
+    np = None
+    cv2 = None
+
+
+class AttachmentStore:
+    """
+    附件编码与命名
+
+    参数:
+        fmt: 输出格式，png / jpeg / webp
+        quality: 有损编码质量（1~100）
+        max_width: 宽度超过该值时等比缩小，None表示不缩放
+    """
+
+    def __init__(self, fmt="png", quality=DEFAULT_QUALITY, max_width=None):
+        fmt = fmt.lower().replace("jpg", "jpeg")
+        if fmt not in FORMATS:
+            raise ValueError(f"不支持的附件格式: {fmt}")
+        self.fmt = fmt
+        self.quality = int(quality)
+        self.max_width = int(max_width) if max_width else None
+        self._stored = {}  # 按配置格式生成的文件名 -> (实际文件名, MIME类型)
+        self._lock = threading.Lock()
+
+    @property
+    def mime_type(self):
+        return FORMATS[self.fmt]
+
+    @property
+    def reencodes(self):
+        """是否会改变图片内容（转换格式或缩放）"""
+        return self.fmt != "png" or bool(self.max_width)
+
+    def file_name(self, png, fmt=None):
+        """
+        按原始内容和编码参数生成文件名，相同截图得到相同的文件名
+
+        参数:
+            png: 原始PNG内容
+            fmt: 实际编码的格式（决定扩展名），默认为配置的格式
+        """
+        digest = hashlib.sha1(png)
+        digest.update(f"{self.fmt}:{self.quality}:{self.max_width}".encode())
+        return f"{digest.hexdigest()}-attachment.{fmt or self.fmt}"
+
+    def encode(self, png):
+        """
+        把PNG按配置缩放并重新编码
+
+        返回:
+            tuple: (编码后的内容, 实际格式)；无法编码时原样返回PNG，格式为png
+        """
+        if self.fmt == "png" and not self.max_width:
+            return png, "png"
+        if cv2 is not None:
+            data = self._encode_cv2(png)
+        else:
+            try:
+                data = self._encode_pillow(png)
+            except ImportError:
+                logging.warning("未安装OpenCV或Pillow，附件保持PNG格式")
+                data = None
+            except Exception as e:
+                logging.warning(f"附件编码失败，保持PNG格式: {e}")
+                data = None
+        if data is None:
+            return png, "png"
+        return data, self.fmt
+
+    def _encode_cv2(self, png):
+        image = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return None
+        height, width = image.shape[:2]
+        if self.max_width and width > self.max_width:
+            size = (self.max_width, max(1, height * self.max_width // width))
+            image = cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+        params = {
+            "jpeg": [cv2.IMWRITE_JPEG_QUALITY, self.quality],
+            "webp": [cv2.IMWRITE_WEBP_QUALITY, self.quality],
+            "png": [cv2.IMWRITE_PNG_COMPRESSION, 6],
+        }[self.fmt]
+        ok, buffer = cv2.imencode(f".{self.fmt}", image, params)
+        return buffer.tobytes() if ok else None
+
+    def _encode_pillow(self, png):
+        import io
+        from PIL import Image
+
+        image = Image.open(io.BytesIO(png))
+        if self.max_width and image.width > self.max_width:
+            image = image.resize((self.max_width, max(1, image.height * self.max_width // image.width)))
+        if self.fmt == "jpeg":
+            image = image.convert("RGB")
+        output = io.BytesIO()
+        image.save(output, format=self.fmt.upper(), quality=self.quality)
+        return output.getvalue()
+
+    def put(self, png):
+        """
+        准备写入一张截图
+
+        返回:
+            tuple: (文件名, 编码后的内容, MIME类型)；该内容本进程已经写入过时内容为None，调用方无需再次写入。
+            编码失败时按PNG命名和登记类型
+        """
+        key = self.file_name(png)
+        with self._lock:
+            if key in self._stored:
+                file_name, mime_type = self._stored[key]
+                return file_name, None, mime_type
+        data, fmt = self.encode(png)
+        file_name = self.file_name(png, fmt)
+        with self._lock:
+            self._stored[key] = (file_name, FORMATS[fmt])
+        return file_name, data, FORMATS[fmt]
+
+
+def store_from_env():
+    """根据环境变量创建附件存储，未配置时返回None"""
+    fmt = os.environ.get(ATTACHMENT_FORMAT_ENV)
+    max_width = os.environ.get(ATTACHMENT_MAX_WIDTH_ENV)
+    if not fmt and not max_width:
+        return None
+    return AttachmentStore(
+        fmt or "png",
+        quality=os.environ.get(ATTACHMENT_QUALITY_ENV, DEFAULT_QUALITY),
+        max_width=max_width
+    )
+
+
+def _iter_attachments(node):
+    """递归遍历结果文件（包括嵌套步骤）中的所有附件"""
+    if isinstance(node, dict):
+        for attachment in node.get("attachments") or []:
+            yield attachment
+        for value in node.values():
+            if isinstance(value, (list, dict)):
+                yield from _iter_attachments(value)
+    elif isinstance(node, list):
+        for value in node:
+            yield from _iter_attachments(value)
+
+
+def is_stored_name(file_name):
+    """附件是否已按内容命名（由附件存储写入或已整理过）"""
+    return bool(STORED_NAME.match(file_name))
+
+
+def compact_results(results_dir, store, workers=None):
+    """
+    整理已有的allure结果目录，并更新结果文件中的引用：
+    - 图片附件按配置重新编码
+    - 其他类型的附件保持原样，只按内容去重
+    - 已按内容命名的附件跳过，整理可以重复执行
+
+    参数:
+        results_dir: allure-results目录
+        store: AttachmentStore
+        workers: 并行编码的线程数
+
+    返回:
+        dict: 处理前后的附件数量和大小
+    """
+    result_files = [f for f in os.listdir(results_dir) if f.endswith(("-result.json", "-container.json"))]
+    documents = {}
+    sources = {}
+    for file in result_files:
+        path = os.path.join(results_dir, file)
+        with open(path, 'r', encoding='utf-8') as f:
+            documents[path] = json.load(f)
+        for attachment in _iter_attachments(documents[path]):
+            source = attachment.get("source")
+            if source and not is_stored_name(source):
+                sources.setdefault(source, attachment.get("type"))
+
+    def convert(source, mime_type):
+        path = os.path.join(results_dir, source)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return source, None, None, 0
+        if mime_type in IMAGE_TYPES and (store.reencodes or mime_type == "image/png"):
+            file_name, new_type = store.file_name(data), store.mime_type
+            if not os.path.exists(os.path.join(results_dir, file_name)):
+                # 编码失败时保留PNG内容，文件名和类型随之使用PNG
+                data_out, fmt = store.encode(data)
+                file_name, new_type = store.file_name(data, fmt), FORMATS[fmt]
+            else:
+                data_out = None
+        else:
+            # 其他类型只按内容去重，保留原来的扩展名和类型
+            file_name = f"{hashlib.sha1(data).hexdigest()}-attachment{os.path.splitext(source)[1]}"
+            new_type, data_out = mime_type, data
+        target = os.path.join(results_dir, file_name)
+        if data_out is not None and not os.path.exists(target):
+            temp_path = f"{target}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                f.write(data_out)
+            os.replace(temp_path, target)
+        return source, file_name, new_type, len(data)
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        converted = executor.map(lambda item: convert(*item), sorted(sources.items()))
+        mapping = {source: (new, new_type, size) for source, new, new_type, size in converted if new}
+
+    # 更新引用后再删除旧文件，保证结果文件始终指向存在的附件
+    for path, document in documents.items():
+        changed = False
+        for attachment in _iter_attachments(document):
+            if attachment.get("source") in mapping:
+                new, new_type, _ = mapping[attachment["source"]]
+                attachment["source"] = new
+                if new_type:
+                    attachment["type"] = new_type
+                changed = True
+        if changed:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(document, f, ensure_ascii=False)
+
+    new_files = set()
+    for source, (new, _, _) in mapping.items():
+        new_files.add(new)
+        if source != new:
+            os.remove(os.path.join(results_dir, source))
+
+    stats = {
+        "attachments": len(mapping),
+        "files": len(new_files),
+        "original_bytes": sum(size for _, _, size in mapping.values()),
+        "stored_bytes": sum(os.path.getsize(os.path.join(results_dir, f)) for f in new_files),
+    }
+    logging.info(f"已整理 {stats['attachments']} 个附件为 {stats['files']} 个文件，"
+                 f"大小 {stats['original_bytes'] / 1024 / 1024:.2f} MB -> {stats['stored_bytes'] / 1024 / 1024:.2f} MB")
+    return stats
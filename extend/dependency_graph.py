@@ -0,0 +1,120 @@
+# coding = utf-8
+"""
+depends_on 依赖图
+
+把用例的 depends_on 解析成有向无环图：执行前检查循环依赖，按拓扑顺序给出依赖的执行顺序，
+并按"文件路径 + 内容哈希"记录每个浏览器会话中已经执行过的依赖，同一会话内每个依赖只执行一次。
+"""
+import os
+import hashlib
+import threading
+from parse.case_loader import load_depends
+
+
+class DependencyCycleError(ValueError):
+    """depends_on 中存在循环依赖"""
+
+
+def content_hash(yaml_file_path):
+    """计算文件内容的哈希值，文件不存在时返回None"""
+    try:
+        with open(yaml_file_path, 'rb') as f:
+            return hashlib.sha1(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+class DependencyGraph:
+    """
+    depends_on 依赖图
+
+    参数:
+        read_depends: 读取某个文件依赖列表的函数，默认使用用例编译缓存中已解析的依赖
+    """
+
+    def __init__(self, read_depends=load_depends):
+        self.read_depends = read_depends
+        self.edges = {}  # 文件路径 -> 依赖的文件路径列表
+
+    def add(self, yaml_file_path):
+        """
+        从指定文件开始递归加入依赖，并检查循环依赖
+
+        返回:
+            DependencyGraph: self，方便链式调用
+
+        异常:
+            DependencyCycleError: 存在循环依赖时抛出
+        """
+        self._visit(os.path.normpath(yaml_file_path), [])
+        return self
+
+    def _visit(self, path, stack):
+        if path in stack:
+            cycle = stack[stack.index(path):] + [path]
+            raise DependencyCycleError("检测到循环依赖: " + " -> ".join(cycle))
+        if path in self.edges:
+            return
+
+        # 缺失的依赖文件作为叶子节点保留，执行时再报错
+        depends = self.read_depends(path) if os.path.exists(path) else []
+        stack.append(path)
+        for depend in depends:
+            self._visit(depend, stack)
+        stack.pop()
+        self.edges[path] = depends
+
+    def execution_order(self, yaml_file_path):
+        """
+        返回执行指定文件之前需要依次执行的依赖（拓扑顺序，不包含文件本身）
+        """
+        root = os.path.normpath(yaml_file_path)
+        if root not in self.edges:
+            self.add(root)
+
+        order = []
+        visited = set()
+
+        def visit(path):
+            for depend in self.edges.get(path, []):
+                if depend not in visited:
+                    visited.add(depend)
+                    visit(depend)
+                    order.append(depend)
+
+        visit(root)
+        return order
+
+
+# 每个浏览器会话已执行过的依赖: session_id -> {(文件路径, 内容哈希)}
+_executed = {}
+_executed_lock = threading.Lock()
+
+
+def _session_key(driver):
+    return getattr(driver, "session_id", None) or id(driver)
+
+
+def _executed_key(yaml_file_path):
+    # 用绝对路径，同一个文件以相对路径和绝对路径引用时视为同一个依赖
+    return os.path.abspath(yaml_file_path), content_hash(yaml_file_path)
+
+
+def is_executed(driver, yaml_file_path):
+    """判断依赖文件（当前内容）是否已在该浏览器会话中执行过"""
+    key = _executed_key(yaml_file_path)
+    with _executed_lock:
+        return key in _executed.get(_session_key(driver), set())
+
+
+def mark_executed(driver, yaml_file_path):
+    """记录文件已在该浏览器会话中成功执行"""
+    key = _executed_key(yaml_file_path)
+    with _executed_lock:
+        _executed.setdefault(_session_key(driver), set()).add(key)
+
+
+def clear_session(driver):
+    """浏览器会话被重置或关闭后，清空该会话的执行记录"""
+    with _executed_lock:
+        _executed.pop(_session_key(driver), None)
@@ -0,0 +1,235 @@
+# coding = utf-8
+"""
+本地浏览器驱动缓存
+
+按浏览器主版本号保存驱动文件，查找时不访问网络：
+- 浏览器版本按浏览器可执行文件的修改时间缓存在索引中，浏览器未升级时只需要一次stat
+- 索引和驱动文件的写入在文件锁内完成并原子替换，多个worker可以同时使用同一个缓存目录
+
+离线环境可以预先放入驱动:
+    python -m extend.driver_cache --install /path/to/chromedriver
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import logging
+import argparse
+import subprocess
+from extend.file_lock import FileLock
+
+# 缓存目录，可通过环境变量修改（例如指向CI机器上的共享目录）
+DRIVER_CACHE_ENV = "DRIVER_CACHE_DIR"
+DEFAULT_CACHE_DIR = ".driver_cache"
+
+# 指定浏览器可执行文件的环境变量
+CHROME_BINARY_ENV = "CHROME_BINARY"
+
+INDEX_FILE = "index.json"
+
+# 各平台常见的Chrome安装位置
+CHROME_CANDIDATES = {
+    "linux": ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome"],
+    "darwin": ["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"],
+    "win32": [
+        os.path.expandvars(r"%ProgramFiles%\Google\Chrome\Application\chrome.exe"),
+        os.path.expandvars(r"%ProgramFiles(x86)%\Google\Chrome\Application\chrome.exe"),
+        os.path.expandvars(r"%LocalAppData%\Google\Chrome\Application\chrome.exe"),
+    ],
+}
+
+VERSION_PATTERN = re.compile(r"(\d+)\.\d+\.\d+(?:\.\d+)?")
+
+
+def find_chrome_binary():
+    """查找本机的Chrome可执行文件，找不到时返回None"""
+    binary = os.environ.get(CHROME_BINARY_ENV)
+    if binary:
+        return binary if os.path.exists(binary) else None
+    platform = "linux" if sys.platform.startswith("linux") else sys.platform
+    for candidate in CHROME_CANDIDATES.get(platform, []):
+        path = candidate if os.path.isabs(candidate) else shutil.which(candidate)
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def read_version(binary):
+    """读取浏览器或驱动的版本号（本地命令，不访问网络），失败时返回None"""
+    if sys.platform.startswith("win") and not binary.lower().endswith("chromedriver.exe"):
+        # Windows上chrome.exe --version不输出版本，从注册表读取
+        try:
+            import winreg
+            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, r"Software\Google\Chrome\BLBeacon") as key:
+                return winreg.QueryValueEx(key, "version")[0]
+        except OSError:
+            pass
+    try:
+        output = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=10).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    match = VERSION_PATTERN.search(output)
+    return match.group(0) if match else None
+
+
+def major_of(version):
+    return version.split(".", 1)[0] if version else None
+
+
+class DriverCache:
+    """
+    按浏览器主版本号索引的驱动缓存
+
+    参数:
+        cache_dir: 缓存目录，默认读取环境变量 DRIVER_CACHE_DIR，未设置时为 .driver_cache
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.environ.get(DRIVER_CACHE_ENV) or DEFAULT_CACHE_DIR
+        self.index_path = os.path.join(self.cache_dir, INDEX_FILE)
+        self.lock_path = os.path.join(self.cache_dir, ".lock")
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"browsers": {}, "drivers": {}}
+
+    def _save_index(self, index):
+        temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def browser_major(self, browser="chrome", index=None):
+        """
+        本机浏览器的主版本号
+
+        浏览器可执行文件的修改时间未变时直接使用索引中记录的版本，否则执行一次 --version 并更新索引。
+        """
+        binary = find_chrome_binary() if browser == "chrome" else None
+        if binary is None:
+            return None
+        try:
+            mtime_ns = os.stat(binary).st_mtime_ns
+        except OSError:
+            return None
+
+        index = index if index is not None else self._load_index()
+        known = index["browsers"].get(binary)
+        if known and known.get("mtime_ns") == mtime_ns:
+            return major_of(known.get("version"))
+
+        version = read_version(binary)
+        if version:
+            with FileLock(self.lock_path):
+                index = self._load_index()
+                index["browsers"][binary] = {"mtime_ns": mtime_ns, "version": version}
+                self._save_index(index)
+        return major_of(version)
+
+    def lookup(self, browser="chrome"):
+        """
+        查找与本机浏览器主版本号匹配的驱动
+
+        返回:
+            str: 驱动路径，未缓存时返回None
+        """
+        index = self._load_index()
+        major = self.browser_major(browser, index)
+        if major is None:
+            return None
+        entry = index["drivers"].get(f"{browser}/{major}")
+        if entry and os.path.exists(entry["path"]):
+            return entry["path"]
+        return None
+
+    def install(self, driver_path, browser="chrome", browser_major=None):
+        """
+        把驱动文件复制到缓存中
+
+        参数:
+            driver_path: 驱动文件路径
+            browser: 浏览器名称
+            browser_major: 驱动所服务的浏览器主版本号，指定时与驱动主版本号不一致则不加入缓存
+
+        返回:
+            str: 缓存中的驱动路径，无法识别驱动版本或版本不匹配时返回None
+        """
+        version = read_version(driver_path)
+        major = major_of(version)
+        if major is None:
+            logging.warning(f"无法识别驱动版本，未加入缓存: {driver_path}")
+            return None
+        if browser_major is not None and major != str(browser_major):
+            logging.warning(f"驱动主版本 {major} 与浏览器主版本 {browser_major} 不一致，未加入缓存: {driver_path}")
+            return None
+
+        target_dir = os.path.join(self.cache_dir, browser, major)
+        target = os.path.abspath(os.path.join(target_dir, os.path.basename(driver_path)))
+        with FileLock(self.lock_path):
+            index = self._load_index()
+            entry = index["drivers"].get(f"{browser}/{major}")
+            if entry and entry.get("version") == version and os.path.exists(entry["path"]):
+                return entry["path"]
+
+            os.makedirs(target_dir, exist_ok=True)
+            temp_path = f"{target}.{os.getpid()}.tmp"
+            shutil.copy2(driver_path, temp_path)
+            os.chmod(temp_path, 0o755)
+            os.replace(temp_path, target)
+            index["drivers"][f"{browser}/{major}"] = {"path": target, "version": version}
+            self._save_index(index)
+        logging.info(f"驱动已加入缓存: {browser} {version} -> {target}")
+        return target
+
+
+def cached_driver_path(browser="chrome"):
+    """查找缓存中可用的驱动，出错时返回None而不影响浏览器启动"""
+    try:
+        return DriverCache().lookup(browser)
+    except Exception as e:
+        logging.warning(f"读取驱动缓存失败: {e}")
+        return None
+
+
+def remember_driver(driver, browser="chrome"):
+    """
+    把浏览器实际使用的驱动（例如webdriver-manager下载的驱动）加入缓存，供之后离线使用
+
+    只缓存Chrome的驱动：查找时按本机Chrome的主版本号匹配，其他浏览器的驱动不会被错误地登记到Chrome的版本下。
+    驱动的主版本号需要与浏览器报告的版本一致。
+    """
+    capabilities = getattr(driver, "capabilities", None) or {}
+    if str(browser).lower() != "chrome" or str(capabilities.get("browserName", "chrome")).lower() != "chrome":
+        return
+    try:
+        driver_path = getattr(getattr(driver, "service", None), "path", None)
+        if driver_path and os.path.isfile(driver_path):
+            cache = DriverCache()
+            if cache.lookup(browser) is None:
+                cache.install(driver_path, browser, major_of(capabilities.get("browserVersion")))
+    except Exception as e:
+        logging.warning(f"写入驱动缓存失败: {e}")
+
+
+def parse_arguments():
+    """处理命令行参数"""
+    parser = argparse.ArgumentParser(description="管理本地浏览器驱动缓存，不带参数时列出缓存中的驱动")
+    parser.add_argument('--install', metavar='DRIVER', help='把驱动文件加入缓存')
+    parser.add_argument('--cache-dir', help='缓存目录')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+    driver_cache = DriverCache(args.cache_dir)
+    if args.install:
+        sys.exit(0 if driver_cache.install(args.install) else 1)
+    for key, entry in sorted(driver_cache._load_index()["drivers"].items()):
+        print(f"{key}\t{entry['version']}\t{entry['path']}")
+    print(f"当前浏览器主版本: {driver_cache.browser_major() or '未找到'}，"
+          f"匹配的驱动: {driver_cache.lookup() or '无'}")
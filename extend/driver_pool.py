@@ -0,0 +1,141 @@
+# coding = utf-8
+"""
+浏览器复用池
+
+测试之间复用已启动的浏览器，归还时快速重置状态（cookie、存储、多余窗口），
+避免每个用例都冷启动Chrome。无响应的浏览器会被淘汰，复用次数达到上限的浏览器会被回收重建。
+"""
+import logging
+import threading
+from extend.dependency_graph import clear_session
+
+
+class DriverPool:
+    """
+    WebDriver复用池
+
+    参数:
+        factory: 创建新WebDriver的无参函数
+        max_size: 池中最多保留的空闲浏览器数量
+        max_reuse: 单个浏览器最多复用的次数，达到后关闭重建（0表示不限制）
+        on_close: 浏览器被关闭时的回调，参数为driver
+    """
+
+    def __init__(self, factory, max_size=1, max_reuse=50, on_close=None):
+        self.factory = factory
+        self.max_size = max_size
+        self.max_reuse = max_reuse
+        self.on_close = on_close
+        self._idle = []  # [(driver, 已使用次数)]
+        self._use_count = {}
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """从池中取出一个健康的浏览器，没有可用浏览器时新建"""
+        while True:
+            with self._lock:
+                entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                break
+
+            driver, uses = entry
+            if self.is_healthy(driver):
+                self._use_count[id(driver)] = uses + 1
+                logging.info(f"复用浏览器实例（第 {uses + 1} 次使用）")
+                return driver
+
+            logging.warning("浏览器实例无响应，已从池中淘汰")
+            self._close(driver)
+
+        driver = self.factory()
+        self._use_count[id(driver)] = 1
+        return driver
+
+    def release(self, driver):
+        """归还浏览器：重置状态后放回池中，失败或达到复用上限则关闭"""
+        uses = self._use_count.pop(id(driver), 1)
+
+        if self.max_reuse and uses >= self.max_reuse:
+            logging.info(f"浏览器已复用 {uses} 次，达到上限，关闭后重建")
+            self._close(driver)
+            return
+
+        if not self.reset(driver):
+            self._close(driver)
+            return
+
+        with self._lock:
+            if len(self._idle) < self.max_size:
+                self._idle.append((driver, uses))
+                return
+        self._close(driver)
+
+    @staticmethod
+    def is_healthy(driver):
+        """健康检查：浏览器能正常执行脚本则认为可用"""
+        try:
+            return driver.execute_script("return 1;") == 1
+        except Exception as e:
+            logging.debug(f"浏览器健康检查失败: {e}")
+            return False
+
+    @staticmethod
+    def reset(driver):
+        """
+        快速重置浏览器状态
+
+        关闭多余窗口，清空所有源的cookie和存储（localStorage、IndexedDB、Service Worker等）
+        以及当前窗口的sessionStorage，最后打开about:blank。HTTP缓存不清理，复用的浏览器仍可以命中静态资源缓存。
+
+        返回:
+            bool: 重置是否成功
+        """
+        # 浏览器状态被清空，之前执行过的依赖（如登录）需要重新执行
+        clear_session(driver)
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.execute_script("window.onbeforeunload = function() {};")
+                driver.close()
+            driver.switch_to.window(handles[0])
+            driver.switch_to.default_content()
+
+            # sessionStorage属于当前窗口，脚本只能清理当前源，需要在跳转about:blank之前执行
+            try:
+                driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+            except Exception:
+                pass
+
+            # Chrome可以通过CDP清理所有源的存储和所有域名的cookie，其他浏览器只能清理当前源和当前域名
+            try:
+                driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": "*", "storageTypes": "all"})
+                driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            except Exception:
+                driver.delete_all_cookies()
+
+            driver.execute_script("window.onbeforeunload = function() {};")
+            driver.get("about:blank")
+            return True
+        except Exception as e:
+            logging.warning(f"重置浏览器状态失败，将关闭该实例: {e}")
+            return False
+
+    def close_all(self):
+        """关闭池中所有空闲浏览器"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for driver, _ in idle:
+            self._close(driver)
+
+    def _close(self, driver):
+        try:
+            driver.execute_script("window.onbeforeunload = function() {};")
+        except Exception:
+            pass
+        try:
+            driver.quit()
+        except Exception as e:
+            logging.debug(f"关闭浏览器时出现错误（通常可以忽略）: {e}")
+        if self.on_close:
+            self.on_close(driver)
@@ -0,0 +1,123 @@
+# coding = utf-8
+"""
+用例试运行
+
+不启动浏览器，用记录调用的模拟WebDriver执行完整的步骤流程（关键字解析、参数绑定、depends_on、先决条件），
+输出实际执行的调用记录。试运行期间：
+- 关键字模块（Keywords所在模块和 other/ 下的扩展关键字）中的 sleep 不真正等待，只记录到调用记录中，
+  其他模块和线程的 time.sleep 不受影响
+- 通过关键字注册表执行的关键字调用（步骤和先决条件中的登录）以 keyword 记录写入调用记录，
+  便于与WebDriver命令对应
+- 先决条件中的登录不读写登录状态缓存，避免模拟的登录状态污染真实缓存
+"""
+import os
+import sys
+import json
+import time
+import types
+import logging
+from extend.fake_driver import FakeDriver
+from extend.keyword_registry import KEYWORD_FIELD
+
+_active = False
+
+
+def is_active():
+    """当前是否处于试运行中"""
+    return _active
+
+
+class _TimeProxy(types.ModuleType):
+    """替代关键字模块中的 time 模块：sleep 改为记录，其余属性转发给真正的 time 模块"""
+
+    def __init__(self, sleep):
+        super().__init__("time")
+        self.sleep = sleep
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+class DryRun:
+    """
+    试运行上下文
+
+    参数:
+        registry: 执行用例使用的KeywordRegistry，试运行期间记录它绑定的每次关键字调用
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.driver = FakeDriver()
+        self._patched = {}  # 模块名 -> {属性名: 原来的值}
+
+    def _fake_sleep(self, seconds):
+        self.driver.execute("sleep", {"seconds": seconds})
+
+    def _patch_module(self, module_name):
+        """替换关键字模块中的 sleep（from time import sleep）和 time（import time），每个模块只替换一次"""
+        module = sys.modules.get(module_name)
+        if module is None or module_name in self._patched:
+            return
+        saved = self._patched[module_name] = {}
+        if vars(module).get("sleep") is time.sleep:
+            saved["sleep"] = module.sleep
+            module.sleep = self._fake_sleep
+        if vars(module).get("time") is time:
+            saved["time"] = module.time
+            module.time = _TimeProxy(self._fake_sleep)
+
+    def __enter__(self):
+        global _active
+        real_bind = self.registry.bind
+
+        def recording_bind(keyword, keywords):
+            func = real_bind(keyword, keywords)
+            # 扩展关键字的模块在解析时才加载，绑定时再替换
+            self._patch_module(keyword.func.__module__)
+
+            def call(**params):
+                args = {k: v for k, v in params.items() if k != KEYWORD_FIELD}
+                keywords.driver.execute("keyword", {"name": keyword.name, **args})
+                return func(**params)
+
+            return call
+
+        self._patch_module(self.registry.keywords_class.__module__)
+        self.registry.bind = recording_bind
+        _active = True
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active
+        for module_name, saved in self._patched.items():
+            module = sys.modules.get(module_name)
+            for name, value in saved.items():
+                setattr(module, name, value)
+        self._patched.clear()
+        # 去掉实例上的替换，恢复类方法
+        del self.registry.bind
+        _active = False
+        return False
+
+
+def trace_path(trace_dir, yaml_file_path):
+    """
+    调用记录文件路径：在 trace_dir 下保留用例的相对路径，不同目录下的同名用例不会互相覆盖
+
+    用例不在当前目录下时使用去掉根目录的绝对路径。
+    """
+    relative = os.path.relpath(os.path.abspath(yaml_file_path))
+    if relative.startswith(os.pardir):
+        relative = os.path.splitdrive(os.path.abspath(yaml_file_path))[1].lstrip("\\/")
+    return os.path.join(trace_dir, f"{os.path.splitext(relative)[0]}.trace.json")
+
+
+def write_trace(trace, trace_dir, yaml_file_path):
+    """把调用记录写入 trace_dir 下与用例对应的JSON文件，返回文件路径"""
+    path = trace_path(trace_dir, yaml_file_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(trace, f, ensure_ascii=False, indent=2, default=str)
+    logging.info(f"调用记录已写入: {path}")
+    return path
@@ -0,0 +1,309 @@
+# coding = utf-8
+"""
+模拟的WebDriver
+
+不启动浏览器，在进程内模拟 WebDriver 的常用接口，并记录收到的每一个调用。
+用于性能基准（只测框架本身的开销）和不启动浏览器的用例试运行。
+所有操作都经过 execute()，因此步骤耗时统计等对 driver.execute 的包装同样生效。
+"""
+import time
+import base64
+import itertools
+
+# 1x1 像素的PNG，作为截图结果
+BLANK_PNG = base64.b64decode(
+    "iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg=="
+)
+
+# 页面状态查询脚本的固定返回值（页面已加载完成并处于静止状态）
+_SCRIPT_RESULTS = (
+    ("document.readyState", "complete"),
+    ("window.__smartWait", {"ready": "complete", "pending": 0, "idle": 60000}),
+    ("return 1", 1),
+)
+
+
+class FakeAlert:
+    def __init__(self, driver):
+        self._driver = driver
+
+    @property
+    def text(self):
+        return self._driver.execute("getAlertText")["value"]
+
+    def accept(self):
+        self._driver.execute("acceptAlert")
+
+    def dismiss(self):
+        self._driver.execute("dismissAlert")
+
+    def send_keys(self, keys_to_send):
+        self._driver.execute("setAlertValue", {"text": keys_to_send})
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self._driver = driver
+
+    @property
+    def alert(self):
+        return FakeAlert(self._driver)
+
+    @property
+    def active_element(self):
+        return FakeElement(self._driver, "css selector", ":focus")
+
+    def window(self, window_name):
+        self._driver.execute("switchToWindow", {"handle": window_name})
+        if window_name in self._driver.window_handles:
+            self._driver.current_window_handle = window_name
+
+    def new_window(self, type_hint=None):
+        handle = f"window-{len(self._driver.window_handles)}"
+        self._driver.execute("newWindow", {"type": type_hint})
+        self._driver.window_handles.append(handle)
+        self._driver.current_window_handle = handle
+
+    def frame(self, frame_reference):
+        self._driver.execute("switchToFrame", {"id": getattr(frame_reference, "id", frame_reference)})
+
+    def default_content(self):
+        self._driver.execute("switchToFrame", {"id": None})
+
+    def parent_frame(self):
+        self._driver.execute("switchToParentFrame")
+
+
+class FakeElement:
+    """模拟的页面元素，所有元素都可见、可点击"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, driver, by, value):
+        self.parent = driver
+        self.id = f"element-{next(self._ids)}"
+        self.by = by
+        self.value = value
+
+    def _execute(self, command, params=None):
+        return self.parent.execute(command, dict(params or {}, id=self.id, using=self.by, locator=self.value))
+
+    @property
+    def text(self):
+        return self._execute("getElementText")["value"]
+
+    @property
+    def tag_name(self):
+        return self._execute("getElementTagName")["value"]
+
+    @property
+    def size(self):
+        return {"height": 20, "width": 100}
+
+    @property
+    def location(self):
+        return {"x": 0, "y": 0}
+
+    @property
+    def rect(self):
+        return {"x": 0, "y": 0, "height": 20, "width": 100}
+
+    @property
+    def screenshot_as_png(self):
+        return self._execute("elementScreenshot")["value"]
+
+    def is_displayed(self):
+        return True
+
+    def is_enabled(self):
+        return True
+
+    def is_selected(self):
+        return False
+
+    def click(self):
+        self._execute("clickElement")
+
+    def clear(self):
+        self._execute("clearElement")
+
+    def submit(self):
+        self._execute("submitElement")
+
+    def send_keys(self, *value):
+        self._execute("sendKeysToElement", {"text": "".join(str(v) for v in value)})
+
+    def get_attribute(self, name):
+        return self._execute("getElementAttribute", {"name": name})["value"]
+
+    get_dom_attribute = get_attribute
+    get_property = get_attribute
+
+    def value_of_css_property(self, property_name):
+        return self._execute("getElementValueOfCssProperty", {"propertyName": property_name})["value"]
+
+    def find_element(self, by="id", value=None):
+        self._execute("findChildElement", {"child_using": by, "child_value": value})
+        return FakeElement(self.parent, by, value)
+
+    def find_elements(self, by="id", value=None):
+        return [self.find_element(by, value)]
+
+    def screenshot(self, filename):
+        with open(filename, 'wb') as f:
+            f.write(self.screenshot_as_png)
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, FakeElement) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeDriver:
+    """
+    模拟的WebDriver
+
+    参数:
+        latency: 每个命令模拟的往返耗时（秒），默认为0，只测框架开销
+        record: 是否记录调用（长时间的基准测试可以关闭以节省内存）
+    """
+
+    _sessions = itertools.count(1)
+
+    def __init__(self, latency=0.0, record=True):
+        self.latency = latency
+        self.record = record
+        self.calls = []
+        self.session_id = f"fake-session-{next(self._sessions)}"
+        self.name = "chrome"
+        self.capabilities = {"browserName": "chrome", "browserVersion": "fake"}
+        self.current_url = "about:blank"
+        self.title = ""
+        self.window_handles = ["window-0"]
+        self.current_window_handle = "window-0"
+        self.switch_to = FakeSwitchTo(self)
+        self.service = None
+        self._started = time.perf_counter()
+        self._cookies = []
+
+    def execute(self, driver_command, params=None):
+        """所有命令的入口：记录调用并返回模拟结果"""
+        if self.record:
+            self.calls.append({
+                "t_ms": round((time.perf_counter() - self._started) * 1000, 3),
+                "command": driver_command,
+                "params": params or {},
+            })
+        if self.latency:
+            time.sleep(self.latency)
+        if driver_command in ("screenshot", "elementScreenshot"):
+            return {"value": BLANK_PNG}
+        return {"value": None}
+
+    def trace(self):
+        """调用记录（命令和参数）"""
+        return list(self.calls)
+
+    # 导航
+    def get(self, url):
+        self.execute("get", {"url": url})
+        self.current_url = url
+
+    def refresh(self):
+        self.execute("refresh")
+
+    def back(self):
+        self.execute("goBack")
+
+    def forward(self):
+        self.execute("goForward")
+
+    @property
+    def page_source(self):
+        return self.execute("getPageSource")["value"] or "<html></html>"
+
+    # 元素
+    def find_element(self, by="id", value=None):
+        self.execute("findElement", {"using": by, "value": value})
+        return FakeElement(self, by, value)
+
+    def find_elements(self, by="id", value=None):
+        self.execute("findElements", {"using": by, "value": value})
+        return [FakeElement(self, by, value)]
+
+    # 脚本
+    def execute_script(self, script, *args):
+        self.execute("executeScript", {"script": script, "args": list(args)})
+        for marker, result in _SCRIPT_RESULTS:
+            if marker in script:
+                return result
+        return None
+
+    def execute_async_script(self, script, *args):
+        self.execute("executeAsyncScript", {"script": script, "args": list(args)})
+        return None
+
+    def execute_cdp_cmd(self, cmd, cmd_args):
+        self.execute("executeCdpCommand", {"cmd": cmd, "params": cmd_args})
+        if cmd == "Network.getAllCookies":
+            return {"cookies": list(self._cookies)}
+        if cmd == "Performance.getMetrics":
+            return {"metrics": []}
+        return {}
+
+    # 截图
+    def get_screenshot_as_png(self):
+        return self.execute("screenshot")["value"]
+
+    def get_screenshot_as_base64(self):
+        return base64.b64encode(self.get_screenshot_as_png()).decode()
+
+    def get_screenshot_as_file(self, filename):
+        with open(filename, 'wb') as f:
+            f.write(self.get_screenshot_as_png())
+        return True
+
+    save_screenshot = get_screenshot_as_file
+
+    # Cookie
+    def get_cookies(self):
+        self.execute("getAllCookies")
+        return list(self._cookies)
+
+    def add_cookie(self, cookie_dict):
+        self.execute("addCookie", {"cookie": cookie_dict})
+        self._cookies.append(cookie_dict)
+
+    def delete_all_cookies(self):
+        self.execute("deleteAllCookies")
+        self._cookies = []
+
+    # 窗口和超时
+    def maximize_window(self):
+        self.execute("maximizeWindow")
+
+    def set_window_size(self, width, height, windowHandle="current"):
+        self.execute("setWindowRect", {"width": width, "height": height})
+
+    def get_window_size(self, windowHandle="current"):
+        return {"width": 1920, "height": 1080}
+
+    def implicitly_wait(self, time_to_wait):
+        self.execute("setTimeouts", {"implicit": time_to_wait})
+
+    def set_page_load_timeout(self, time_to_wait):
+        self.execute("setTimeouts", {"pageLoad": time_to_wait})
+
+    def set_script_timeout(self, time_to_wait):
+        self.execute("setTimeouts", {"script": time_to_wait})
+
+    def close(self):
+        self.execute("close")
+        if self.current_window_handle in self.window_handles and len(self.window_handles) > 1:
+            self.window_handles.remove(self.current_window_handle)
+            self.current_window_handle = self.window_handles[0]
+
+    def quit(self):
+        self.execute("quit")
@@ -0,0 +1,66 @@
+# coding = utf-8
+"""
+跨进程文件锁
+
+同一台机器上的多个worker共享缓存目录时，用它保证同一时间只有一个进程在读写同一份缓存。
+"""
+import os
+import sys
+import time
+
+if sys.platform.startswith('win'):
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """
+    基于锁文件的排他锁，可作为上下文管理器使用
+
+    参数:
+        lock_path: 锁文件路径，不存在时自动创建
+        timeout: 等待锁的最长时间（秒），None表示一直等待
+    """
+
+    def __init__(self, lock_path, timeout=None):
+        self.lock_path = lock_path
+        self.timeout = timeout
+        self._fd = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while True:
+            try:
+                if sys.platform.startswith('win'):
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._fd = fd
+                return self
+            except OSError:
+                if deadline is not None and time.monotonic() >= deadline:
+                    os.close(fd)
+                    raise TimeoutError(f"等待文件锁超时: {self.lock_path}")
+                time.sleep(0.05)
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if sys.platform.startswith('win'):
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
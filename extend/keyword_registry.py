@@ -0,0 +1,214 @@
+# coding = utf-8
+"""
+关键字注册表与步骤执行计划
+
+加载用例时把 steps 编译成执行计划：每个关键字（包括 other/ 目录下的扩展关键字）只解析一次，
+并按关键字的函数签名检查步骤参数。关键字拼写错误或缺少必填参数会在加载阶段报错，
+不用等到浏览器执行到该步骤才发现。扩展关键字的实例按浏览器缓存，同一浏览器内只创建一次。
+"""
+import os
+import sys
+import inspect
+import difflib
+import threading
+import weakref
+
+# 扩展关键字所在目录
+PLUGIN_DIR = "./other"
+
+# 步骤中指定关键字名称的字段
+KEYWORD_FIELD = "关键字"
+
+
+class KeywordError(ValueError):
+    """关键字不存在或步骤参数与关键字不匹配"""
+
+
+class Keyword:
+    """
+    已解析的关键字
+
+    参数:
+        name: 关键字名称
+        func: 关键字函数（未绑定实例）
+        plugin_class: 扩展关键字所属的类，内置关键字为None
+    """
+
+    def __init__(self, name, func, plugin_class=None):
+        self.name = name
+        self.func = func
+        self.plugin_class = plugin_class
+        self.signature = inspect.signature(func)
+
+    @property
+    def required_params(self):
+        """签名中没有默认值的参数名（不含self）"""
+        parameters = list(self.signature.parameters.values())[1:]  # 跳过self
+        return [p.name for p in parameters
+                if p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY) and p.default is p.empty]
+
+    def check_params(self, params):
+        """检查步骤参数是否满足关键字签名，返回错误描述列表"""
+        parameters = list(self.signature.parameters.values())[1:]  # 跳过self
+        accepts_any = any(p.kind == p.VAR_KEYWORD for p in parameters)
+        names = {p.name for p in parameters if p.kind in (p.POSITIONAL_OR_KEYWORD, p.KEYWORD_ONLY)}
+
+        errors = [f"缺少参数: {name}" for name in self.required_params if name not in params]
+        if not accepts_any:
+            for name in params:
+                if name not in names:
+                    errors.append(f"未知参数: {name}")
+        return errors
+
+
+class KeywordRegistry:
+    """
+    关键字注册表
+
+    参数:
+        keywords_class: 内置关键字类（extend.keywords.Keywords）
+        plugin_dir: 扩展关键字目录，每个扩展关键字是一个与关键字同名的模块，模块中有同名的类和方法
+    """
+
+    def __init__(self, keywords_class, plugin_dir=PLUGIN_DIR):
+        self.keywords_class = keywords_class
+        self.plugin_dir = plugin_dir
+        self._keywords = {}
+        self._plugins = weakref.WeakKeyDictionary()  # driver -> {插件类: 实例}
+        self._lock = threading.Lock()
+
+    def resolve(self, name):
+        """
+        解析关键字（结果会被缓存）
+
+        异常:
+            KeywordError: 关键字不存在
+        """
+        keyword = self._keywords.get(name)
+        if keyword is not None:
+            return keyword
+
+        with self._lock:
+            keyword = self._keywords.get(name)
+            if keyword is None:
+                keyword = self._load(name)
+                self._keywords[name] = keyword
+        return keyword
+
+    def _load(self, name):
+        func = getattr(self.keywords_class, name, None)
+        if callable(func) and not name.startswith('_'):
+            return Keyword(name, func)
+
+        # 不在Keywords类中，尝试从扩展目录加载同名模块
+        plugin_dir = os.path.abspath(self.plugin_dir)
+        if os.path.exists(os.path.join(plugin_dir, f"{name}.py")):
+            if plugin_dir not in sys.path:
+                sys.path.append(plugin_dir)
+            try:
+                module = __import__(name)
+            except ImportError as e:
+                raise KeywordError(f"加载扩展关键字失败: {name}: {e}")
+            plugin_class = getattr(module, name, None)
+            func = getattr(plugin_class, name, None)
+            if callable(func):
+                return Keyword(name, func, plugin_class)
+
+        message = f"关键字不存在: {name}"
+        suggestions = difflib.get_close_matches(name, self.names(), n=1)
+        if suggestions:
+            message += f"，是否是: {suggestions[0]}"
+        raise KeywordError(message)
+
+    def names(self):
+        """所有可用的关键字名称"""
+        names = {n for n in dir(self.keywords_class)
+                 if not n.startswith('_') and callable(getattr(self.keywords_class, n))}
+        if os.path.isdir(self.plugin_dir):
+            names.update(f[:-3] for f in os.listdir(self.plugin_dir)
+                         if f.endswith('.py') and not f.startswith('_'))
+        return sorted(names)
+
+    def bind(self, keyword, keywords):
+        """
+        把关键字绑定到执行对象上
+
+        参数:
+            keyword: 已解析的Keyword
+            keywords: 当前的Keywords实例
+
+        返回:
+            callable: 可直接以步骤参数调用的函数
+        """
+        if keyword.plugin_class is None:
+            return keyword.func.__get__(keywords)
+
+        driver = keywords.driver
+        with self._lock:
+            instances = self._plugins.setdefault(driver, {})
+            instance = instances.get(keyword.plugin_class)
+            if instance is None:
+                instance = instances[keyword.plugin_class] = keyword.plugin_class(driver)
+        return keyword.func.__get__(instance)
+
+
+class StepPlan:
+    """
+    编译后的单个步骤
+
+    参数:
+        name: 步骤名称
+        keyword: 已解析的Keyword
+        params: 调用关键字时传入的参数（与YAML中的步骤内容一致）
+    """
+
+    def __init__(self, name, keyword, params):
+        self.name = name
+        self.keyword = keyword
+        self.params = params
+
+    def __repr__(self):
+        return f"StepPlan({self.name!r}, {self.keyword.name!r})"
+
+
+def compile_steps(steps, registry, source=None):
+    """
+    把用例的 steps 编译成执行计划
+
+    参数:
+        steps: 用例中的步骤列表，每个步骤形如 {步骤名称: {关键字: ..., 参数...}}
+        registry: KeywordRegistry
+        source: 用例文件路径，用于错误信息
+
+    返回:
+        list: StepPlan列表
+
+    异常:
+        KeywordError: 存在无法解析的关键字或不匹配的参数，错误信息包含所有问题步骤
+    """
+    plan = []
+    errors = []
+    for index, step in enumerate(steps or [], start=1):
+        if not isinstance(step, dict) or len(step) != 1:
+            errors.append(f"第{index}步格式错误: {step}")
+            continue
+
+        step_name, params = next(iter(step.items()))
+        if not isinstance(params, dict) or KEYWORD_FIELD not in params:
+            errors.append(f"第{index}步 {step_name}: 缺少{KEYWORD_FIELD}")
+            continue
+
+        try:
+            keyword = registry.resolve(params[KEYWORD_FIELD])
+        except KeywordError as e:
+            errors.append(f"第{index}步 {step_name}: {e}")
+            continue
+
+        for error in keyword.check_params(params):
+            errors.append(f"第{index}步 {step_name}: {error}")
+        plan.append(StepPlan(step_name, keyword, params))
+
+    if errors:
+        prefix = f"{source}: " if source else ""
+        raise KeywordError(prefix + "; ".join(errors))
+    return plan
@@ -0,0 +1,154 @@
+# coding = utf-8
+"""
+Chrome启动选项与精简模式
+
+chrome_options() 统一生成 conftest.py 和 run_yaml.py 创建浏览器时使用的Chrome选项。
+精简模式（lean）下：
+- 使用新版无头模式（--headless=new），并关闭后台网络、同步、组件更新等与用例无关的功能
+- 通过Chrome DevTools Protocol（Network.setBlockedURLs）拦截统计脚本、第三方组件等URL，
+  以及字体、媒体、图片等资源类型，每次 open_browser 和页面跳转都不再下载这些资源
+
+用例config中可以配置：
+    lean: true                           # 使用默认的拦截规则
+    lean:
+      block_urls: ["*.example-cdn.com/*"]    # 追加拦截的URL模式（* 为通配符）
+      block_types: [font, media]             # 拦截的资源类型，默认为 font 和 media
+      page_load: eager                       # 页面加载策略，默认不修改
+未配置时读取环境变量 LEAN_BROWSER（run.py --lean 会设置）。
+拦截规则在每个用例开始时按该用例的配置设置，复用的浏览器会随用例切换或清除规则。
+"""
+import os
+import logging
+
+# 环境变量开关，run.py --lean 会设置该变量，子进程同样生效
+LEAN_BROWSER_ENV = "LEAN_BROWSER"
+
+# 所有模式通用的Chrome选项
+COMMON_ARGUMENTS = (
+    '--ignore-certificate-errors',
+    '--ignore-ssl-errors',
+    '--log-level=3',  # 仅显示致命错误
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--disable-gpu',
+    '--disable-extensions',
+)
+
+# 精简模式额外的Chrome选项
+LEAN_ARGUMENTS = (
+    '--disable-background-networking',
+    '--disable-component-update',
+    '--disable-default-apps',
+    '--disable-sync',
+    '--no-first-run',
+    '--mute-audio',
+)
+
+# 默认拦截的URL：统计、广告和常见的第三方组件
+DEFAULT_BLOCKED_URLS = (
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*hm.baidu.com*",
+    "*cnzz.com*",
+    "*connect.facebook.net*",
+    "*hotjar.com*",
+    "*clarity.ms*",
+    "*youtube.com/embed*",
+    "*player.vimeo.com*",
+)
+
+# 资源类型对应的URL模式（Network.setBlockedURLs 只能按URL拦截，资源类型按扩展名匹配）
+RESOURCE_TYPE_PATTERNS = {
+    "font": ("*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"),
+    "media": ("*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav", "*.m3u8", "*.flv"),
+    "image": ("*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp"),
+}
+
+DEFAULT_BLOCKED_TYPES = ("font", "media")
+
+
+def lean_config(config=None):
+    """
+    用例config中的lean优先，未配置时读取环境变量
+
+    返回:
+        dict: 精简模式配置，未开启时返回None
+    """
+    if config and "lean" in config:
+        value = config["lean"]
+    else:
+        value = os.environ.get(LEAN_BROWSER_ENV, "").lower() in ("1", "true", "yes")
+    if isinstance(value, dict):
+        return value
+    return {} if value else None
+
+
+def blocked_patterns(lean):
+    """精简模式配置对应的全部拦截URL模式"""
+    patterns = list(DEFAULT_BLOCKED_URLS) + list(lean.get("block_urls") or [])
+    for resource_type in lean.get("block_types", DEFAULT_BLOCKED_TYPES) or []:
+        extensions = RESOURCE_TYPE_PATTERNS.get(str(resource_type).lower())
+        if extensions is None:
+            logging.warning(f"不支持拦截的资源类型: {resource_type}，可选: {', '.join(RESOURCE_TYPE_PATTERNS)}")
+            continue
+        # 同时匹配带查询参数的地址
+        patterns += [p for ext in extensions for p in (ext, f"{ext}?*")]
+    return list(dict.fromkeys(patterns))
+
+
+def chrome_options(headless=False, lean=None):
+    """
+    创建Chrome选项
+
+    参数:
+        headless: 是否使用无头模式
+        lean: 精简模式配置（lean_config的返回值），为None时不开启
+    """
+    from selenium.webdriver.chrome.options import Options
+    options = Options()
+    if headless:
+        options.add_argument("--headless=new" if lean is not None else "--headless")
+    for argument in COMMON_ARGUMENTS:
+        options.add_argument(argument)
+    options.add_experimental_option('excludeSwitches', ['enable-logging'])
+    if lean is not None:
+        for argument in LEAN_ARGUMENTS:
+            options.add_argument(argument)
+        if lean.get("page_load"):
+            options.page_load_strategy = lean["page_load"]
+    return options
+
+
+def apply(driver, config=None):
+    """
+    按用例配置设置浏览器的请求拦截规则
+
+    上一个用例设置过规则而当前用例未开启精简模式时清除规则。
+
+    返回:
+        int: 生效的拦截规则数
+    """
+    lean = lean_config(config)
+    patterns = blocked_patterns(lean) if lean is not None else []
+    if not patterns and not getattr(driver, "_lean_blocked", None):
+        return 0
+    if getattr(driver, "_lean_blocked", None) == patterns:
+        return len(patterns)
+    if not hasattr(driver, "execute_cdp_cmd"):
+        logging.debug("当前浏览器不支持CDP，跳过请求拦截")
+        return 0
+
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+    except Exception as e:
+        logging.warning(f"设置请求拦截失败: {e}")
+        return 0
+    driver._lean_blocked = patterns
+    if patterns:
+        logging.info(f"精简模式：已拦截 {len(patterns)} 个URL模式")
+    else:
+        logging.info("已清除精简模式的请求拦截")
+    return len(patterns)
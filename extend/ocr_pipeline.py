@@ -0,0 +1,368 @@
+# coding = utf-8
+"""
+OCR识别流水线
+
+供验证码等图片识别关键字使用：
+- 预处理：OpenCV/NumPy 整图运算（灰度、小图放大、中值滤波、Otsu二值化、统一为白底黑字、四周留白），不逐像素循环
+- 缓存：按"图片内容哈希 + 语言 + 识别参数"缓存识别结果（内存LRU + 磁盘目录），相同的图片不再识别；
+  空结果不缓存，识别结果被证实错误时（如验证码校验失败）调用方可以用 invalidate 删除
+- 识别：常驻的tesseract工作线程池，短时间内提交的图片合并成一批，由一个tesseract进程按文件列表一次识别，
+  摊薄每次启动tesseract进程的开销；每个tesseract进程限制为单线程，避免多个worker抢占CPU；
+  tesseract进程超时后被结束，该批次的所有图片以异常返回
+
+用法:
+    text = get_pipeline().recognize(png_bytes)
+    texts = get_pipeline(config="--psm 8").recognize_many([png1, png2])
+"""
+import os
+import json
+import time
+import queue
+import atexit
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict
+from concurrent.futures import Future
+
+try:
+    import numpy as np
+    import cv2
+except ImportError:
+    np = None
+    cv2 = None
+
+# 磁盘缓存目录
+DEFAULT_CACHE_DIR = ".ocr_cache"
+
+# 内存缓存的条目数
+MEMORY_CACHE_SIZE = 1024
+
+# 默认识别语言和参数（--psm 7：单行文字，适合验证码）
+DEFAULT_LANG = "eng"
+DEFAULT_CONFIG = "--psm 7"
+
+# 合并成一批的等待时间（秒）和每批最多的图片数
+BATCH_WINDOW = 0.01
+MAX_BATCH = 32
+
+# 单个tesseract进程的最长执行时间（秒）
+TESSERACT_TIMEOUT = 30
+
+# 高度低于该值的图片先放大，tesseract对小字号的识别率很低
+MIN_HEIGHT = 40
+
+# 四周留白（像素）
+BORDER = 10
+
+# tesseract 用分页符分隔文件列表中每张图片的结果
+PAGE_SEPARATOR = "\f"
+
+
+def tesseract_cmd():
+    """tesseract命令路径，优先使用pytesseract中配置的路径"""
+    try:
+        import pytesseract
+        return pytesseract.pytesseract.tesseract_cmd
+    except ImportError:
+        return "tesseract"
+
+
+def preprocess(image):
+    """
+    预处理图片，返回白底黑字的二值图（numpy数组）
+
+    参数:
+        image: 图片的编码数据（PNG/JPEG等bytes）或已解码的numpy数组
+    """
+    if cv2 is None:
+        raise RuntimeError("OCR预处理需要安装 opencv-python 和 numpy")
+    if isinstance(image, (bytes, bytearray)):
+        gray = cv2.imdecode(np.frombuffer(image, np.uint8), cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise ValueError("无法解码图片数据")
+    elif image.ndim == 3:
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    else:
+        gray = image
+
+    if gray.shape[0] < MIN_HEIGHT:
+        scale = -(-MIN_HEIGHT // gray.shape[0])
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    gray = cv2.medianBlur(gray, 3)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # 背景（占多数的像素）为黑色时反转
+    if np.count_nonzero(binary) * 2 < binary.size:
+        binary = cv2.bitwise_not(binary)
+    return cv2.copyMakeBorder(binary, BORDER, BORDER, BORDER, BORDER, cv2.BORDER_CONSTANT, value=255)
+
+
+def image_key(data, lang=DEFAULT_LANG, config=DEFAULT_CONFIG):
+    """缓存键：图片内容哈希 + 语言 + 识别参数"""
+    digest = hashlib.sha1(bytes(data))
+    digest.update(f"\0{lang}\0{config}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class OcrCache:
+    """
+    识别结果缓存
+
+    参数:
+        cache_dir: 磁盘缓存目录，为None时只使用内存缓存
+        size: 内存缓存的条目数
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, size=MEMORY_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.size = size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """返回缓存的识别结果，没有时返回None"""
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                text = json.load(f)["text"]
+        except (OSError, ValueError, KeyError):
+            return None
+        self._remember(key, text)
+        return text
+
+    def put(self, key, text):
+        self._remember(key, text)
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"text": text}, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+
+    def invalidate(self, key):
+        """删除缓存的识别结果（内存和磁盘）"""
+        with self._lock:
+            self._memory.pop(key, None)
+        if not self.cache_dir:
+            return
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def _remember(self, key, text):
+        with self._lock:
+            self._memory[key] = text
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.size:
+                self._memory.popitem(last=False)
+
+
+class TesseractPool:
+    """
+    常驻的tesseract工作线程池
+
+    每个工作线程从队列中取出一批图片（等待 batch_window 秒收集后续提交，最多 max_batch 张），
+    写入临时目录后用一个tesseract进程按文件列表识别。
+
+    参数:
+        workers: 工作线程数，默认为CPU核数的一半
+        lang: 识别语言
+        config: tesseract参数，如 "--psm 7"
+        batch_window: 合并成一批的等待时间（秒）
+        max_batch: 每批最多的图片数，1表示每张图片单独启动进程
+        timeout: 单个tesseract进程的最长执行时间（秒）
+    """
+
+    def __init__(self, workers=None, lang=DEFAULT_LANG, config=DEFAULT_CONFIG, batch_window=BATCH_WINDOW,
+                 max_batch=MAX_BATCH, timeout=TESSERACT_TIMEOUT):
+        self.workers = workers or max(1, (os.cpu_count() or 2) // 2)
+        self.lang = lang
+        self.config = config
+        self.batch_window = batch_window
+        self.max_batch = max(1, max_batch)
+        self.timeout = timeout
+        self.cmd = tesseract_cmd()
+        self._queue = queue.Queue()
+        self._work_dir = tempfile.mkdtemp(prefix="ocr_")
+        self._env = dict(os.environ, OMP_THREAD_LIMIT="1")
+        self._threads = [threading.Thread(target=self._worker, name=f"ocr-worker-{i}", daemon=True)
+                         for i in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, image):
+        """
+        提交一张已预处理的图片
+
+        返回:
+            Future: 结果为识别出的文字
+        """
+        future = Future()
+        self._queue.put((image, future))
+        return future
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # 把退出信号放回队列，处理完当前批次后退出
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _worker(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                texts = self._recognize(image for image, _ in batch)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future), text in zip(batch, texts):
+                future.set_result(text)
+
+    def _run(self, source):
+        cmd = [self.cmd, source, "stdout", "-l", self.lang, *self.config.split()]
+        try:
+            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=self._env,
+                                    timeout=self.timeout)
+        except subprocess.TimeoutExpired:
+            # subprocess.run 已结束超时的进程，异常由工作线程设置到该批次的所有图片上
+            raise TimeoutError(f"tesseract执行超过 {self.timeout} 秒: {source}")
+        if result.returncode != 0:
+            raise RuntimeError(f"tesseract执行失败（退出码 {result.returncode}）: "
+                               f"{result.stderr.decode('utf-8', 'replace').strip()}")
+        return result.stdout.decode('utf-8', 'replace')
+
+    def _recognize(self, images):
+        batch_dir = tempfile.mkdtemp(dir=self._work_dir)
+        try:
+            paths = []
+            for index, image in enumerate(images):
+                path = os.path.join(batch_dir, f"{index}.png")
+                cv2.imwrite(path, image, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+                paths.append(path)
+            if len(paths) == 1:
+                return [self._run(paths[0]).strip()]
+
+            list_path = os.path.join(batch_dir, "images.txt")
+            with open(list_path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(paths) + "\n")
+            pages = self._run(list_path).split(PAGE_SEPARATOR)
+            if len(pages) < len(paths):
+                # 分页结果与图片数量不一致时逐张识别，保证结果对应
+                logging.warning(f"tesseract批量识别返回 {len(pages)} 页，图片 {len(paths)} 张，改为逐张识别")
+                return [self._run(path).strip() for path in paths]
+            return [page.strip() for page in pages[:len(paths)]]
+        finally:
+            shutil.rmtree(batch_dir, ignore_errors=True)
+
+    def close(self):
+        """停止工作线程并清理临时目录"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        shutil.rmtree(self._work_dir, ignore_errors=True)
+
+
+class OcrPipeline:
+    """
+    预处理 + 缓存 + 批量识别
+
+    参数:
+        pool: TesseractPool
+        cache: OcrCache，为None时不缓存
+    """
+
+    def __init__(self, pool, cache=None):
+        self.pool = pool
+        self.cache = cache
+
+    def _key(self, data):
+        return image_key(data, self.pool.lang, self.pool.config)
+
+    def invalidate(self, image):
+        """删除一张图片（编码数据bytes）的缓存结果，如验证码识别结果被证实错误时"""
+        if self.cache:
+            self.cache.invalidate(self._key(image))
+
+    def recognize(self, image):
+        """识别一张图片（编码数据bytes），返回文字"""
+        return self.recognize_many([image])[0]
+
+    def recognize_many(self, images):
+        """
+        识别多张图片：命中缓存的直接返回，其余全部提交后再等待，由线程池合并成批次；
+        识别结果为空时不缓存，下次重新识别
+
+        返回:
+            list: 与images顺序一致的文字列表
+        """
+        results = [None] * len(images)
+        pending = []
+        for index, data in enumerate(images):
+            key = self._key(data)
+            text = self.cache.get(key) if self.cache else None
+            if text is not None:
+                results[index] = text
+            else:
+                pending.append((index, key, self.pool.submit(preprocess(data))))
+        for index, key, future in pending:
+            results[index] = future.result()
+            if self.cache and results[index]:
+                self.cache.put(key, results[index])
+        return results
+
+    def close(self):
+        self.pool.close()
+
+
+# 进程内共享的流水线，按（语言, 参数）区分
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_pipeline(lang=DEFAULT_LANG, config=DEFAULT_CONFIG):
+    """返回进程内共享的OCR流水线，首次使用时创建，进程退出时关闭"""
+    with _pipelines_lock:
+        pipeline = _pipelines.get((lang, config))
+        if pipeline is None:
+            pipeline = OcrPipeline(TesseractPool(lang=lang, config=config), OcrCache())
+            _pipelines[(lang, config)] = pipeline
+    return pipeline
+
+
+@atexit.register
+def _close_pipelines():
+    with _pipelines_lock:
+        for pipeline in _pipelines.values():
+            pipeline.close()
+        _pipelines.clear()
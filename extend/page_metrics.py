@@ -0,0 +1,164 @@
+# coding = utf-8
+"""
+页面性能指标
+
+在 open_browser、切换窗口（switch_to_handle）以及触发页面跳转的 option_click 之后采集当前页面的性能指标：
+- Navigation Timing：首字节（ttfb）、DOMContentLoaded、load 完成时间、传输大小
+- Largest Contentful Paint（lcp）
+- CDP Performance.getMetrics：脚本、布局、样式计算耗时，JS堆大小，DOM节点数等
+指标以JSON附件写入Allure，并记录在driver上供 assert_load_time 关键字断言。
+时间单位均为毫秒，从页面开始导航算起。
+
+采集需要额外等待页面load完成，默认关闭；用例config中的 page_metrics: true 或环境变量 PAGE_METRICS=1
+（run.py --page-metrics 会设置）开启采集。
+"""
+import os
+import json
+import logging
+import weakref
+
+# 环境变量开关，默认关闭
+PAGE_METRICS_ENV = "PAGE_METRICS"
+
+# 采集后会记录指标的关键字；option_click 只在点击导致页面跳转时采集
+NAVIGATION_KEYWORDS = ("open_browser", "switch_to_handle")
+CLICK_KEYWORDS = ("option_click",)
+
+# 等待页面load完成的最长时间（毫秒）
+LOAD_TIMEOUT_MS = 10000
+
+# 等待页面加载完成后读取Navigation Timing和LCP（LCP只能通过buffered的PerformanceObserver读取）
+_COLLECT_JS = """
+var done = arguments[arguments.length - 1];
+var deadline = Date.now() + arguments[0];
+var lcp = null;
+try {
+    new PerformanceObserver(function (list) {
+        var entries = list.getEntries();
+        var last = entries[entries.length - 1];
+        lcp = last.renderTime || last.loadTime || last.startTime;
+    }).observe({type: 'largest-contentful-paint', buffered: true});
+} catch (e) {}
+(function poll() {
+    var nav = performance.getEntriesByType('navigation')[0];
+    if ((!nav || nav.loadEventEnd <= 0) && Date.now() < deadline) {
+        setTimeout(poll, 50);
+        return;
+    }
+    setTimeout(function () {
+        done({
+            url: location.href,
+            time_origin: performance.timeOrigin,
+            ttfb: nav ? nav.responseStart : null,
+            dom_content_loaded: nav ? nav.domContentLoadedEventEnd : null,
+            load: nav && nav.loadEventEnd > 0 ? nav.loadEventEnd : null,
+            transfer_size: nav ? nav.transferSize : null,
+            lcp: lcp
+        });
+    }, 20);
+})();
+"""
+
+_TIME_ORIGIN_JS = "return performance.timeOrigin;"
+
+# 每个driver最近一次采集的指标
+_latest = weakref.WeakKeyDictionary()
+
+# 每个driver当前页面的timeOrigin，用于判断点击后是否打开了新页面
+_origins = weakref.WeakKeyDictionary()
+
+
+def is_enabled(config=None):
+    """用例config中的page_metrics优先，未配置时读取环境变量（默认关闭）"""
+    if config and "page_metrics" in config:
+        return bool(config["page_metrics"])
+    return os.environ.get(PAGE_METRICS_ENV, "0").lower() in ("1", "true", "yes", "on")
+
+
+def _cdp_metrics(driver):
+    """通过CDP读取浏览器的性能计数，不支持CDP时返回空字典"""
+    if not hasattr(driver, "execute_cdp_cmd"):
+        return {}
+    try:
+        if not getattr(driver, "_performance_enabled", False):
+            driver.execute_cdp_cmd("Performance.enable", {})
+            driver._performance_enabled = True
+        result = driver.execute_cdp_cmd("Performance.getMetrics", {})
+    except Exception as e:
+        logging.debug(f"读取CDP性能指标失败: {e}")
+        return {}
+    return {metric["name"]: metric["value"] for metric in result.get("metrics", [])}
+
+
+def _round(value):
+    return round(value, 1) if isinstance(value, (int, float)) else value
+
+
+def collect(driver, trigger=None):
+    """
+    采集当前页面的性能指标并写入Allure附件
+
+    参数:
+        trigger: 触发采集的关键字，记录在指标中
+
+    返回:
+        dict: 指标，页面不支持时返回None
+    """
+    try:
+        timing = driver.execute_async_script(_COLLECT_JS, LOAD_TIMEOUT_MS)
+    except Exception as e:
+        logging.debug(f"读取页面性能指标失败: {e}")
+        return None
+    if not timing:
+        return None
+
+    metrics = {key: _round(value) for key, value in timing.items()}
+    metrics["trigger"] = trigger
+    metrics["cdp"] = _cdp_metrics(driver)
+    _latest[driver] = metrics
+    _origins[driver] = metrics.get("time_origin")
+    logging.info(f"页面性能 {metrics['url']}: 首字节 {metrics['ttfb']} ms，DOMContentLoaded "
+                 f"{metrics['dom_content_loaded']} ms，load {metrics['load']} ms，LCP {metrics['lcp']} ms")
+
+    try:
+        import allure
+        allure.attach(json.dumps(metrics, ensure_ascii=False, indent=2), name=f"页面性能: {metrics['url']}",
+                      attachment_type=allure.attachment_type.JSON)
+    except Exception as e:
+        logging.debug(f"写入页面性能附件失败: {e}")
+    return metrics
+
+
+def latest(driver):
+    """该driver最近一次采集的指标，没有时返回None"""
+    return _latest.get(driver)
+
+
+def after_step(driver, keyword):
+    """
+    关键字执行成功后调用：导航类关键字之后采集指标，点击只在页面发生跳转时采集
+
+    返回:
+        dict: 本次采集的指标，未采集时返回None
+    """
+    if keyword in NAVIGATION_KEYWORDS:
+        return collect(driver, keyword)
+    if keyword not in CLICK_KEYWORDS:
+        return None
+
+    # timeOrigin 随每次文档加载变化，与上次记录的不同说明点击后打开了新页面
+    try:
+        origin = driver.execute_script(_TIME_ORIGIN_JS)
+    except Exception as e:
+        logging.debug(f"检查页面跳转失败: {e}")
+        return None
+    if origin is None:
+        return None
+    previous = _origins.get(driver)
+    if previous is None:
+        # 还没有记录过页面（如复用的浏览器或未通过导航关键字打开的页面），只记录基准，不采集
+        _origins[driver] = _round(origin)
+        return None
+    if previous == _round(origin):
+        return None
+    return collect(driver, keyword)
@@ -0,0 +1,287 @@
+# coding = utf-8
+"""
+按运行记录浏览器进程
+
+每次运行（run.py 或单独的 pytest 会话）有一个运行ID，通过环境变量传给并行的worker进程。
+创建浏览器后记录 chromedriver 及其启动的 Chrome 进程（PID、启动时间、进程组），
+清理时只结束本次运行记录的进程，同一台机器上同时进行的其他运行不受影响。
+记录进程启动时间是为了避免PID被系统复用后误杀其他进程。
+进程信息优先通过psutil获取；未安装时Linux读取/proc、macOS调用ps，Windows按驱动进程PID用 taskkill /t
+结束整个进程树（无法确认进程是否仍是同一个）。
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import signal
+import shutil
+import logging
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# 运行ID所在的环境变量，子进程继承后登记到同一次运行下
+RUN_ID_ENV = "TEST_RUN_ID"
+
+# 进程登记目录
+REGISTRY_DIR = os.path.join(tempfile.gettempdir(), "test_project_runs")
+
+# 结束进程时等待其退出的时间（秒），超时后强制结束
+DEFAULT_TIMEOUT = 5
+
+
+def ensure_run_id():
+    """返回当前运行ID，没有时生成一个并写入环境变量"""
+    run_id = os.environ.get(RUN_ID_ENV)
+    if not run_id:
+        run_id = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        os.environ[RUN_ID_ENV] = run_id
+    return run_id
+
+
+def _run_dir(run_id=None):
+    return os.path.join(REGISTRY_DIR, run_id or ensure_run_id())
+
+
+def _start_time(pid):
+    """进程启动时间，用于确认PID仍然是同一个进程；进程已退出（包括僵尸进程）或无法获取时返回None"""
+    if psutil is not None:
+        try:
+            process = psutil.Process(pid)
+            return None if process.status() == psutil.STATUS_ZOMBIE else process.create_time()
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/stat", 'r') as f:
+            # 进程名可能包含空格和括号，从最后一个')'之后开始解析，第1个字段为状态，第20个为启动时间
+            fields = f.read().rsplit(")", 1)[1].split()
+        return None if fields[0] == "Z" else float(fields[19])
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _parent_pids():
+    """不使用psutil时获取 (PID, 父进程PID) 列表：Linux读取/proc，其他类Unix系统调用ps"""
+    if os.path.isdir("/proc"):
+        pairs = []
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat", 'r') as f:
+                    pairs.append((int(entry), int(f.read().rsplit(")", 1)[1].split()[1])))
+            except (OSError, IndexError, ValueError):
+                continue
+        return pairs
+    if sys.platform.startswith('win'):
+        return []
+    try:
+        output = subprocess.run(["ps", "-A", "-o", "pid=,ppid="], capture_output=True, text=True,
+                                timeout=DEFAULT_TIMEOUT).stdout
+    except (OSError, subprocess.SubprocessError):
+        return []
+    pairs = []
+    for line in output.splitlines():
+        try:
+            child, parent = (int(value) for value in line.split())
+        except ValueError:
+            continue
+        pairs.append((child, parent))
+    return pairs
+
+
+def _descendants(pid):
+    """进程的所有子孙进程PID"""
+    if psutil is not None:
+        try:
+            return [child.pid for child in psutil.Process(pid).children(recursive=True)]
+        except psutil.Error:
+            return []
+
+    children = {}
+    for child, parent in _parent_pids():
+        children.setdefault(parent, []).append(child)
+
+    result, stack = [], [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            result.append(child)
+            stack.append(child)
+    return result
+
+
+def _is_same_process(pid, start_time):
+    current = _start_time(pid)
+    if current is None:
+        # 无法获取启动时间的平台上只判断进程是否存在
+        return start_time is None and pid_exists(pid)
+    return start_time is not None and abs(current - start_time) < 0.01
+
+
+def pid_exists(pid):
+    """进程是否存在"""
+    if psutil is not None:
+        return psutil.pid_exists(pid)
+    if sys.platform.startswith('win'):
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _process_group(pid):
+    """进程独立的进程组ID；与当前进程同组或不支持进程组时返回None（不能按组结束）"""
+    if not hasattr(os, "getpgid"):
+        return None
+    try:
+        pgid = os.getpgid(pid)
+    except OSError:
+        return None
+    return None if pgid == os.getpgrp() else pgid
+
+
+def register_driver(driver):
+    """登记浏览器的驱动进程及其子进程，返回登记的PID列表"""
+    process = getattr(getattr(driver, "service", None), "process", None)
+    pid = getattr(process, "pid", None)
+    if pid is None:
+        logging.debug("无法获取驱动进程PID，未登记")
+        return []
+
+    pids = [pid] + _descendants(pid)
+    entry = {
+        "owner": os.getpid(),
+        "session_id": getattr(driver, "session_id", None),
+        "pgid": _process_group(pid),
+        "processes": [[p, _start_time(p)] for p in pids],
+    }
+    run_dir = _run_dir()
+    os.makedirs(run_dir, exist_ok=True)
+    path = os.path.join(run_dir, f"{pid}.json")
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(entry, f)
+    os.replace(f"{path}.tmp", path)
+    logging.debug(f"已登记浏览器进程: {pids}")
+    return pids
+
+
+def unregister_driver(driver):
+    """浏览器正常关闭后取消登记"""
+    process = getattr(getattr(driver, "service", None), "process", None)
+    pid = getattr(process, "pid", None)
+    if pid is not None:
+        try:
+            os.remove(os.path.join(_run_dir(), f"{pid}.json"))
+        except OSError:
+            pass
+
+
+def _load_entries(run_id=None, owner=None):
+    run_dir = _run_dir(run_id)
+    entries = []
+    for file in sorted(os.listdir(run_dir)) if os.path.isdir(run_dir) else []:
+        if not file.endswith(".json"):
+            continue
+        path = os.path.join(run_dir, file)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if owner is None or entry.get("owner") == owner:
+            entries.append((path, entry))
+    return entries
+
+
+def _terminate_entry(entry, timeout):
+    """结束一个浏览器登记的所有进程，先正常结束，超时后强制结束，返回结束的进程数"""
+    if sys.platform.startswith('win') and psutil is None:
+        # 没有psutil时无法确认进程是否存在，直接按驱动进程结束整个进程树
+        driver_pid = entry["processes"][0][0]
+        result = subprocess.run(["taskkill", "/t", "/f", "/pid", str(driver_pid)], capture_output=True,
+                                timeout=timeout)
+        return len(entry["processes"]) if result.returncode == 0 else 0
+
+    processes = [(pid, start) for pid, start in entry["processes"] if _is_same_process(pid, start)]
+    # 登记之后新启动的子进程（如新的渲染进程）
+    driver_pid = entry["processes"][0][0]
+    driver_alive = bool(processes) and processes[0][0] == driver_pid
+    if driver_alive:
+        known = {pid for pid, _ in processes}
+        processes += [(pid, _start_time(pid)) for pid in _descendants(driver_pid) if pid not in known]
+    if not processes:
+        return 0
+
+    if sys.platform.startswith('win'):
+        for pid, _ in processes:
+            subprocess.run(["taskkill", "/f", "/t", "/pid", str(pid)], capture_output=True, timeout=timeout)
+        return len(processes)
+
+    count = len(processes)
+    # 驱动进程已退出时进程组ID可能已被复用，只按PID结束
+    pgid = entry.get("pgid") if driver_alive else None
+    _signal(processes, pgid, signal.SIGTERM)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        processes = [(pid, start) for pid, start in processes if _is_same_process(pid, start)]
+        if not processes:
+            break
+        time.sleep(0.1)
+    if processes:
+        _signal(processes, pgid, signal.SIGKILL)
+    return count
+
+
+def _signal(processes, pgid, sig):
+    if pgid is not None:
+        try:
+            os.killpg(pgid, sig)
+        except OSError:
+            pass
+    for pid, _ in processes:
+        try:
+            os.kill(pid, sig)
+        except OSError:
+            pass
+
+
+def terminate_processes(run_id=None, owner=None, timeout=DEFAULT_TIMEOUT):
+    """
+    并行结束本次运行登记的浏览器进程
+
+    参数:
+        run_id: 运行ID，默认为当前运行
+        owner: 只结束该进程登记的浏览器（并行执行时每个worker只清理自己的浏览器），None表示全部
+        timeout: 每个浏览器的等待时间（秒）
+
+    返回:
+        int: 结束的进程数
+    """
+    entries = _load_entries(run_id, owner)
+    if not entries:
+        return 0
+
+    with ThreadPoolExecutor(max_workers=min(len(entries), 16)) as executor:
+        counts = list(executor.map(lambda item: _terminate_entry(item[1], timeout), entries))
+    for path, _ in entries:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    if owner is None:
+        shutil.rmtree(_run_dir(run_id), ignore_errors=True)
+
+    total = sum(counts)
+    if total:
+        logging.info(f"已结束本次运行的浏览器进程 {total} 个")
+    return total
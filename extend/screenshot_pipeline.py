@@ -0,0 +1,258 @@
+# coding = utf-8
+"""
+异步截图流水线
+
+按策略决定哪些步骤需要截图（每一步 / 仅失败时 / 每N步），主线程只负责从浏览器取回PNG，
+去重和写入allure-results放到后台线程完成，队列有上限，积压时丢弃新的步骤截图而不是阻塞用例；
+失败截图是定位问题的依据，积压时等待队列空出而不会丢弃。
+与上一张几乎相同的截图（缩略图像素差很小）会被跳过。
+流水线开启时接管关键字内部的自动截图（Keywords.jietu），截图只由流水线负责。
+"""
+import os
+import queue
+import hashlib
+import logging
+import threading
+from uuid import uuid4
+from extend.attachment_store import store_from_env
+
+# 环境变量中的默认截图策略，run.py --screenshot 会设置该变量
+SCREENSHOT_POLICY_ENV = "SCREENSHOT_POLICY"
+
+# 截图策略
+POLICY_EVERY = "every"
+POLICY_FAILURE = "failure"
+
+# 后台队列长度上限
+DEFAULT_QUEUE_SIZE = 32
+
+# 缩略图平均像素差低于该值（0~255）视为相同画面
+DEFAULT_DIFF_THRESHOLD = 1.0
+
+try:
+    import numpy as np
+    import cv2
+except ImportError:
+    np = None
+    cv2 = None
+
+
+def parse_policy(value):
+    """
+    解析截图策略
+
+    参数:
+        value: "every"、"failure"、整数N或 "every:N"，为空表示不由流水线截图
+
+    返回:
+        tuple: (策略, N)，策略为None表示关闭
+    """
+    if value in (None, "", False):
+        return None, 0
+    if isinstance(value, int) or str(value).isdigit():
+        return POLICY_EVERY, max(1, int(value))
+    value = str(value).strip().lower()
+    if value.startswith(POLICY_EVERY + ":"):
+        return POLICY_EVERY, max(1, int(value.split(":", 1)[1]))
+    if value in (POLICY_EVERY, POLICY_FAILURE):
+        return value, 1
+    raise ValueError(f"不支持的截图策略: {value}")
+
+
+def _allure_reporter():
+    """获取allure-pytest当前使用的reporter，未启用allure时返回None"""
+    try:
+        from allure_commons import plugin_manager
+    except ImportError:
+        return None
+    for plugin in plugin_manager.get_plugins():
+        reporter = getattr(plugin, "allure_logger", None)
+        if reporter is not None and hasattr(reporter, "get_last_item"):
+            return reporter
+    return None
+
+
+def _thumbnail(png):
+    """把PNG解码为灰度缩略图（解码时直接缩小到1/8），没有OpenCV时返回None"""
+    if cv2 is None:
+        return None
+    image = cv2.imdecode(np.frombuffer(png, np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    return None if image is None else image.astype(np.int16)
+
+
+class ScreenshotPipeline:
+    """
+    截图流水线
+
+    参数:
+        policy: 截图策略，见 parse_policy
+        queue_size: 后台队列长度上限
+        diff_threshold: 相邻截图去重的阈值
+        store: AttachmentStore，按内容命名并压缩附件；默认按环境变量配置，未配置时原样写入PNG
+    """
+
+    def __init__(self, policy=POLICY_EVERY, queue_size=DEFAULT_QUEUE_SIZE, diff_threshold=DEFAULT_DIFF_THRESHOLD,
+                 store=None):
+        self.policy, self.every_n = parse_policy(policy)
+        self.diff_threshold = diff_threshold
+        self.store = store if store is not None else store_from_env()
+        self.captured = 0
+        self.written = 0
+        self.skipped = 0
+        self.dropped = 0
+        self._step_index = 0
+        self._last_thumbnail = None
+        self._last_digest = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._worker, name="screenshot-pipeline", daemon=True)
+        self._thread.start()
+        self._keywords = None
+        self._saved_jietu = None
+
+    @property
+    def enabled(self):
+        return self.policy is not None
+
+    def take_over(self, keywords):
+        """
+        接管关键字内部的自动截图：在Keywords实例上用空操作覆盖jietu，close()时恢复
+
+        用例中显式的jietu步骤由关键字注册表绑定类上的方法执行，不受影响。
+        """
+        if not self.enabled or not hasattr(keywords, "jietu"):
+            return
+        self._keywords = keywords
+        self._saved_jietu = vars(keywords).get("jietu")
+        keywords.jietu = _skip_screenshot
+
+    def _release(self):
+        if self._keywords is None:
+            return
+        if self._saved_jietu is None:
+            vars(self._keywords).pop("jietu", None)
+        else:
+            self._keywords.jietu = self._saved_jietu
+        self._keywords = None
+        self._saved_jietu = None
+
+    def after_step(self, driver, step_name, failed=False):
+        """每个步骤结束后调用，按策略决定是否截图"""
+        if not self.enabled:
+            return
+        self._step_index += 1
+        if failed:
+            self.capture(driver, f"{step_name}-失败", dedupe=False, block=True)
+        elif self.policy == POLICY_EVERY and self._step_index % self.every_n == 0:
+            self.capture(driver, step_name)
+
+    def capture(self, driver, name, dedupe=True, block=False):
+        """
+        截图并交给后台线程处理（主线程只做截图本身）
+
+        参数:
+            driver: WebDriver实例
+            name: 附件名称
+            dedupe: 是否跳过与上一张几乎相同的截图
+            block: 队列已满时是否等待，为False时丢弃该截图
+
+        返回:
+            bool: 截图是否已进入队列
+        """
+        try:
+            png = driver.get_screenshot_as_png()
+        except Exception as e:
+            logging.warning(f"截图失败: {e}")
+            return False
+
+        reporter = _allure_reporter()
+        item = None
+        if reporter is not None:
+            from allure_commons.model2 import ExecutableItem
+            item = reporter.get_last_item(ExecutableItem)
+
+        try:
+            self._queue.put((png, name, item, dedupe), block=block)
+        except queue.Full:
+            self.dropped += 1
+            logging.warning(f"截图队列已满，丢弃截图: {name}")
+            return False
+        self.captured += 1
+        return True
+
+    def _worker(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                self._process(*task)
+            except Exception as e:
+                logging.warning(f"处理截图失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _is_duplicate(self, png):
+        digest = hashlib.sha1(png).digest()
+        thumbnail = _thumbnail(png)
+        duplicate = digest == self._last_digest
+        if not duplicate and thumbnail is not None and self._last_thumbnail is not None \
+                and thumbnail.shape == self._last_thumbnail.shape:
+            duplicate = float(np.abs(thumbnail - self._last_thumbnail).mean()) < self.diff_threshold
+        self._last_digest = digest
+        self._last_thumbnail = thumbnail
+        return duplicate
+
+    def _process(self, png, name, item, dedupe):
+        if self._is_duplicate(png) and dedupe:
+            self.skipped += 1
+            logging.debug(f"截图与上一张几乎相同，已跳过: {name}")
+            return
+        if self._write(png, name, item):
+            self.written += 1
+
+    def _write(self, png, name, item):
+        """写入allure-results，并登记到截图时所在的测试或步骤上（未启用allure时不写入）"""
+        if item is None:
+            return False
+        from allure_commons import plugin_manager
+        from allure_commons.model2 import Attachment, ATTACHMENT_PATTERN
+        from allure_commons.types import AttachmentType
+
+        if self.store is not None:
+            # 按内容命名，同一张截图只写入一次
+            file_name, body, mime_type = self.store.put(png)
+        else:
+            file_name = ATTACHMENT_PATTERN.format(prefix=uuid4(), ext=AttachmentType.PNG.extension)
+            body = png
+            mime_type = AttachmentType.PNG.mime_type
+
+        if body is not None:
+            plugin_manager.hook.report_attached_data(body=body, file_name=file_name)
+        item.attachments.append(Attachment(source=file_name, name=name, type=mime_type))
+        return True
+
+    def flush(self):
+        """等待队列中的截图全部处理完成，需要在测试结束前调用，保证附件写入测试结果"""
+        self._queue.join()
+
+    def close(self):
+        """处理完剩余截图后停止后台线程，并恢复关键字的自动截图"""
+        self._release()
+        self.flush()
+        self._queue.put(None)
+        self._thread.join()
+        logging.info(f"截图 {self.captured} 张，写入 {self.written} 张，"
+                     f"跳过重复 {self.skipped} 张，丢弃 {self.dropped} 张")
+
+
+def _skip_screenshot(*args, **kwargs):
+    """截图流水线开启时替代关键字内部的jietu，截图由流水线按策略完成"""
+    logging.debug("截图流水线已开启，跳过关键字自动截图")
+
+
+def pipeline_for(config=None):
+    """根据用例config中的screenshot或环境变量创建截图流水线，未配置时返回None"""
+    policy = (config or {}).get("screenshot", os.environ.get(SCREENSHOT_POLICY_ENV))
+    if parse_policy(policy)[0] is None:
+        return None
+    return ScreenshotPipeline(policy)
@@ -0,0 +1,195 @@
+# coding = utf-8
+"""
+登录状态缓存
+
+首次登录成功后按用户名保存cookie和localStorage，后续用例直接注入登录状态，跳过完整的登录流程。
+缓存有过期时间；注入后如果被网站重定向回登录页则视为已退出登录，缓存失效并回退到真实登录。
+缓存文件通过文件锁和原子替换写入，可以在同一台机器上的多个并行worker之间共享。
+缓存中保存的是登录凭据，默认关闭，通过 run.py --session-cache 或先决条件中的 session_cache: true 开启；
+缓存文件只有当前用户可读写（0600）。
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+from extend.file_lock import FileLock
+
+# 默认缓存目录和有效期（秒）
+DEFAULT_CACHE_DIR = ".session_cache"
+DEFAULT_TTL = 30 * 60
+
+# run.py --session-cache 通过该环境变量开启缓存
+SESSION_CACHE_ENV = "SESSION_CACHE"
+
+# CDP Network.setCookies 接受的cookie字段
+CDP_COOKIE_FIELDS = ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite", "expires")
+
+
+def is_enabled(prerequisite=None):
+    """先决条件中的session_cache优先，未配置时读取环境变量，默认关闭"""
+    if prerequisite and "session_cache" in prerequisite:
+        return bool(prerequisite["session_cache"])
+    return os.environ.get(SESSION_CACHE_ENV, "").lower() in ("1", "true", "yes")
+
+
+class SessionCache:
+    """
+    按用户名缓存登录状态
+
+    参数:
+        login_url: 登录页地址，注入状态后仍停留在该页面说明登录状态已失效
+        cache_dir: 缓存目录
+        ttl: 缓存有效期（秒）
+    """
+
+    def __init__(self, login_url, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL):
+        self.login_url = login_url
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _path(self, username):
+        name = hashlib.sha1(str(username).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.json")
+
+    def ensure_login(self, driver, username, login_flow):
+        """
+        确保浏览器处于已登录状态：优先注入缓存，失败时执行真实登录并更新缓存
+
+        同一用户名的检查和登录在文件锁内进行，并行worker中只有一个会执行真实登录。
+
+        参数:
+            driver: WebDriver实例
+            username: 用户名
+            login_flow: 执行真实登录流程的无参函数
+
+        返回:
+            bool: 是否通过缓存完成登录
+        """
+        with FileLock(self._path(username) + ".lock"):
+            if self.restore(driver, username):
+                return True
+            login_flow()
+            self.save(driver, username)
+            return False
+
+    def load(self, username):
+        """读取未过期的缓存，不存在或已过期时返回None"""
+        path = self._path(username)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if time.time() - snapshot.get("created", 0) > self.ttl:
+            logging.info(f"登录状态缓存已过期，用户名: {username}")
+            self.invalidate(username)
+            return None
+        return snapshot
+
+    def save(self, driver, username):
+        """保存当前浏览器的登录状态"""
+        try:
+            snapshot = {
+                "username": username,
+                "created": time.time(),
+                "url": driver.current_url,
+                "cookies": self._get_cookies(driver),
+                "local_storage": driver.execute_script(
+                    "var d = {}; for (var i = 0; i < localStorage.length; i++) {"
+                    " var k = localStorage.key(i); d[k] = localStorage.getItem(k); } return d;"
+                ) or {},
+            }
+        except Exception as e:
+            logging.warning(f"保存登录状态缓存失败: {e}")
+            return False
+
+        if snapshot["url"].startswith(self.login_url):
+            logging.warning("当前仍在登录页，不保存登录状态缓存")
+            return False
+
+        os.makedirs(self.cache_dir, mode=0o700, exist_ok=True)
+        path = self._path(username)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        # 创建时即限制为0600，避免cookie在写入过程中被其他用户读取
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(temp_path, path)
+        logging.info(f"已保存登录状态缓存，用户名: {username}")
+        return True
+
+    def restore(self, driver, username):
+        """
+        把缓存的登录状态注入浏览器
+
+        返回:
+            bool: 注入后是否处于已登录状态
+        """
+        snapshot = self.load(username)
+        if snapshot is None:
+            return False
+
+        try:
+            self._set_cookies(driver, snapshot["cookies"], snapshot["url"])
+            driver.get(snapshot["url"])
+            if snapshot["local_storage"]:
+                driver.execute_script(
+                    "var d = arguments[0]; for (var k in d) { localStorage.setItem(k, d[k]); }",
+                    snapshot["local_storage"]
+                )
+                driver.refresh()
+        except Exception as e:
+            logging.warning(f"注入登录状态缓存失败，回退到真实登录: {e}")
+            self.invalidate(username)
+            return False
+
+        # 被重定向回登录页，说明网站已使该会话退出登录
+        if driver.current_url.startswith(self.login_url):
+            logging.info(f"登录状态缓存已失效，回退到真实登录，用户名: {username}")
+            self.invalidate(username)
+            return False
+
+        logging.info(f"已通过缓存恢复登录状态，用户名: {username}")
+        return True
+
+    def invalidate(self, username):
+        """删除指定用户名的缓存"""
+        try:
+            os.remove(self._path(username))
+        except OSError:
+            pass
+
+    @staticmethod
+    def _get_cookies(driver):
+        # Chrome可以通过CDP获取所有域名的cookie，其他浏览器只能获取当前域名
+        try:
+            return driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+        except Exception:
+            return driver.get_cookies()
+
+    @staticmethod
+    def _set_cookies(driver, cookies, url):
+        try:
+            params = []
+            for cookie in cookies:
+                param = {k: v for k, v in cookie.items() if k in CDP_COOKIE_FIELDS}
+                # 会话cookie的expires为-1，不能原样传回
+                if cookie.get("session") or param.get("expires", 0) < 0:
+                    param.pop("expires", None)
+                params.append(param)
+            driver.execute_cdp_cmd("Network.setCookies", {"cookies": params})
+            return
+        except Exception:
+            pass
+
+        # 非Chrome浏览器只能在对应域名下逐个添加cookie
+        driver.get(url)
+        for cookie in cookies:
+            cookie = {k: v for k, v in cookie.items() if k in ("name", "value", "path", "domain", "secure",
+                                                                "httpOnly", "expiry", "sameSite")}
+            try:
+                driver.add_cookie(cookie)
+            except Exception as e:
+                logging.debug(f"添加cookie失败: {e}")
@@ -0,0 +1,163 @@
+# coding = utf-8
+"""
+智能等待
+
+开启后，wait_sleep 不再固定睡眠，而是在页面进入静止状态时提前结束：
+文档加载完成、没有未完成的 fetch/XHR 请求、DOM 在一段时间内没有变化。
+配置的等待时间仍作为上限。每次等待节省的时间会被统计，运行结束时输出汇总。
+"""
+import os
+import json
+import time
+import logging
+import threading
+
+# 环境变量开关，run.py --smart-wait 会设置该变量，子进程同样生效
+SMART_WAIT_ENV = "SMART_WAIT"
+
+# DOM 保持不变多久（毫秒）才认为页面已静止
+DEFAULT_STABLE_MS = 500
+
+# 轮询间隔（秒）
+POLL_INTERVAL = 0.1
+
+# 统计汇总文件，每次运行追加一行
+REPORT_FILE = "smart_wait_report.jsonl"
+
+# 记录未完成请求数和最后一次DOM变化时间，重复注入不会重复包装
+_INSTRUMENT_JS = """
+(function () {
+    if (window.__smartWait) { return; }
+    var state = window.__smartWait = {pending: 0, lastMutation: Date.now()};
+    var send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        state.pending++;
+        this.addEventListener('loadend', function () { state.pending--; });
+        return send.apply(this, arguments);
+    };
+    if (window.fetch) {
+        var fetch = window.fetch;
+        window.fetch = function () {
+            state.pending++;
+            return fetch.apply(this, arguments).finally(function () { state.pending--; });
+        };
+    }
+    var observe = function () {
+        new MutationObserver(function () { state.lastMutation = Date.now(); })
+            .observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    };
+    if (document.documentElement) { observe(); } else { document.addEventListener('DOMContentLoaded', observe); }
+})();
+"""
+
+_STATE_JS = _INSTRUMENT_JS + """
+var s = window.__smartWait;
+return {ready: document.readyState, pending: s.pending, idle: Date.now() - s.lastMutation};
+"""
+
+
+def is_enabled(config=None):
+    """用例config中的smart_wait优先，未配置时读取环境变量"""
+    if config and "smart_wait" in config:
+        return bool(config["smart_wait"])
+    return os.environ.get(SMART_WAIT_ENV, "").lower() in ("1", "true", "yes")
+
+
+class SmartWaitStats:
+    """智能等待的节省时间统计"""
+
+    def __init__(self):
+        self.waits = 0
+        self.configured = 0.0
+        self.actual = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, configured, actual):
+        with self._lock:
+            self.waits += 1
+            self.configured += configured
+            self.actual += actual
+
+    @property
+    def saved(self):
+        return max(0.0, self.configured - self.actual)
+
+    def summary(self):
+        return {
+            "waits": self.waits,
+            "configured_seconds": round(self.configured, 2),
+            "actual_seconds": round(self.actual, 2),
+            "saved_seconds": round(self.saved, 2),
+        }
+
+
+# 当前进程的统计
+stats = SmartWaitStats()
+
+# 已通过CDP注册新文档脚本的浏览器会话
+_instrumented_sessions = set()
+
+
+def _instrument(driver):
+    """在每个新文档加载前注入监控脚本（仅Chrome支持，其他浏览器在检查时注入）"""
+    session_id = getattr(driver, "session_id", None)
+    if session_id in _instrumented_sessions:
+        return
+    try:
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": _INSTRUMENT_JS})
+    except Exception:
+        pass
+    _instrumented_sessions.add(session_id)
+
+
+def is_quiescent(driver, stable_ms=DEFAULT_STABLE_MS):
+    """页面是否处于静止状态"""
+    try:
+        state = driver.execute_script(_STATE_JS)
+    except Exception as e:
+        # 页面正在跳转等情况下脚本可能执行失败，视为未静止
+        logging.debug(f"检查页面状态失败: {e}")
+        return False
+    return state["ready"] == "complete" and state["pending"] <= 0 and state["idle"] >= stable_ms
+
+
+def smart_sleep(driver, seconds, stable_ms=DEFAULT_STABLE_MS):
+    """
+    智能等待：页面静止后提前结束，最多等待seconds秒
+
+    参数:
+        driver: WebDriver实例
+        seconds: 配置的等待时间（秒），作为上限
+        stable_ms: DOM保持不变多久才认为页面已静止
+
+    返回:
+        float: 实际等待的时间（秒）
+    """
+    seconds = float(seconds)
+    _instrument(driver)
+
+    start = time.monotonic()
+    deadline = start + seconds
+    while time.monotonic() < deadline:
+        if is_quiescent(driver, stable_ms):
+            break
+        time.sleep(min(POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+    actual = time.monotonic() - start
+    stats.record(seconds, actual)
+    logging.info(f"智能等待结束，配置 {seconds:.1f} 秒，实际 {actual:.2f} 秒")
+    return actual
+
+
+def write_report(path=REPORT_FILE):
+    """输出本次运行的节省时间汇总，并追加到汇总文件中"""
+    if not stats.waits:
+        return None
+    summary = stats.summary()
+    summary["pid"] = os.getpid()
+    summary["time"] = time.strftime("%Y-%m-%d %H:%M:%S")
+    logging.info(f"智能等待共 {summary['waits']} 次，配置 {summary['configured_seconds']} 秒，"
+                 f"实际 {summary['actual_seconds']} 秒，节省 {summary['saved_seconds']} 秒")
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(summary, ensure_ascii=False) + "\n")
+    return summary
@@ -0,0 +1,130 @@
+# coding = utf-8
+"""
+步骤级重试
+
+步骤因瞬时错误（元素过期、点击被遮挡、元素暂不可交互）失败时，只重试该步骤，
+每次重试前按指数退避等待，不重新执行整个用例（包括 depends_on 中的登录和导航）。
+等待超时（TimeoutException）不重试：关键字已经等满了超时时间，重试只会成倍拉长失败用例的耗时。
+其他错误和重试次数用尽后的错误照常抛出，整个用例的重试只作为最后手段。
+每次失败的尝试都会记录到Allure中（附件和"step-retry"标签），便于找出不稳定的步骤。
+
+默认不重试，需要时在用例config中开启：
+    step_retry: 3                        # 最多执行3次，true同样为3次，0或false关闭
+    step_retry: {attempts: 3, backoff: 0.5, max_backoff: 5}
+未配置时读取环境变量 STEP_RETRY（run.py --step-retry 会设置）。
+"""
+import os
+import time
+import logging
+from extend import step_timing
+
+# 环境变量，run.py --step-retry 会设置该变量，子进程同样生效
+STEP_RETRY_ENV = "STEP_RETRY"
+
+# 默认最多执行次数（包括第一次），1表示不重试
+DEFAULT_ATTEMPTS = 1
+
+# 开启重试但未指定次数时（step_retry: true 或只配置了退避时间）的最多执行次数
+ENABLED_ATTEMPTS = 3
+
+# 第一次重试前的等待时间（秒），之后每次翻倍，不超过 MAX_BACKOFF
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 5.0
+
+# 视为瞬时错误的异常类名（selenium.common.exceptions 中的异常，按类名匹配以兼容不同版本）
+TRANSIENT_ERRORS = (
+    "StaleElementReferenceException",
+    "ElementClickInterceptedException",
+    "ElementNotInteractableException",
+)
+
+# Allure中标记发生过步骤重试的用例
+RETRY_TAG = "step-retry"
+
+
+class RetryPolicy:
+    """
+    步骤重试策略
+
+    参数:
+        attempts: 最多执行次数（包括第一次），1表示不重试
+        backoff: 第一次重试前的等待时间（秒）
+        max_backoff: 单次等待时间上限（秒）
+    """
+
+    def __init__(self, attempts=DEFAULT_ATTEMPTS, backoff=DEFAULT_BACKOFF, max_backoff=MAX_BACKOFF):
+        self.attempts = max(1, int(attempts))
+        self.backoff = float(backoff)
+        self.max_backoff = float(max_backoff)
+
+    def delay(self, attempt):
+        """第attempt次尝试失败后的等待时间"""
+        return min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+
+
+def policy_for(config=None):
+    """根据用例config中的step_retry或环境变量创建重试策略"""
+    value = (config or {}).get("step_retry", os.environ.get(STEP_RETRY_ENV, DEFAULT_ATTEMPTS))
+    if isinstance(value, dict):
+        return RetryPolicy(value.get("attempts", ENABLED_ATTEMPTS), value.get("backoff", DEFAULT_BACKOFF),
+                           value.get("max_backoff", MAX_BACKOFF))
+    if value is False or str(value).lower() in ("false", "no", "off"):
+        return RetryPolicy(1)
+    if value is True or str(value).lower() in ("true", "yes", "on"):
+        return RetryPolicy(ENABLED_ATTEMPTS)
+    try:
+        return RetryPolicy(int(value))
+    except (TypeError, ValueError):
+        logging.warning(f"无效的步骤重试配置: {value}，使用默认值 {DEFAULT_ATTEMPTS}")
+        return RetryPolicy()
+
+
+def is_transient(error):
+    """判断异常是否为可以通过重试恢复的瞬时错误"""
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+def _record_attempt(step_name, attempt, policy, error, delay):
+    """把失败的尝试记录到日志和Allure"""
+    message = (f"步骤 {step_name} 第{attempt}/{policy.attempts}次执行失败: "
+               f"{type(error).__name__}: {str(error).strip()}，{delay:.1f} 秒后重试")
+    logging.warning(message)
+    try:
+        import allure
+        allure.dynamic.tag(RETRY_TAG)
+        allure.attach(message, name=f"步骤重试: {step_name} 第{attempt}次",
+                      attachment_type=allure.attachment_type.TEXT)
+    except Exception as e:
+        logging.debug(f"记录步骤重试到Allure失败: {e}")
+
+
+def run_step(func, params, step_name, policy):
+    """
+    执行一个步骤，遇到瞬时错误时按策略重试
+
+    参数:
+        func: 已绑定的关键字函数
+        params: 步骤参数
+        step_name: 步骤名称，用于日志和Allure记录
+        policy: RetryPolicy
+
+    返回:
+        关键字的返回值
+    """
+    attempt = 1
+    while True:
+        try:
+            result = func(**params)
+        except Exception as e:
+            if attempt >= policy.attempts or not is_transient(e):
+                raise
+            delay = policy.delay(attempt)
+            _record_attempt(step_name, attempt, policy, e, delay)
+            step_timing.record_retry()
+            with step_timing.measure("wait"):
+                time.sleep(delay)
+            attempt += 1
+            continue
+        if attempt > 1:
+            logging.info(f"步骤 {step_name} 第{attempt}次执行成功")
+        return result
@@ -0,0 +1,347 @@
+# coding = utf-8
+"""
+步骤耗时统计
+
+记录每个步骤的总耗时，并拆分为：
+- wait: 元素等待（WebDriverWait）和 wait_sleep
+- webdriver: WebDriver命令的往返时间（等待和截图过程中的命令计入等待和截图）
+- screenshot: 截图
+- other: 其余时间（关键字本身的处理）
+同时按WebDriver命令统计次数和耗时。每个用例的数据作为附件写入Allure，并追加到JSON lines明细文件：
+每次运行一个目录，每个进程一个文件（并行的worker不会写同一个文件），只保留最近 KEEP_RUNS 次运行，
+仍有写入进程存活的运行（同一台机器上并发的其他运行）不会被清理；
+运行结束时按本次运行目录中的数据汇总生成Prometheus文本格式的指标文件。
+"""
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+from contextlib import contextmanager
+from extend.process_tracker import ensure_run_id, pid_exists
+
+# 明细目录：<TIMING_DIR>/<运行ID>/<进程ID>.jsonl，每个步骤一行
+TIMING_DIR = "step_timing"
+
+# 保留最近几次运行的明细
+KEEP_RUNS = 10
+
+# Prometheus文本格式的指标文件
+PROMETHEUS_FILE = "step_timing.prom"
+
+# 耗时分类
+PHASES = ("wait", "webdriver", "screenshot")
+
+# 计入截图耗时的WebDriver命令
+SCREENSHOT_COMMANDS = {"screenshot", "elementScreenshot"}
+
+_local = threading.local()
+_write_lock = threading.Lock()
+
+# 正在执行的步骤数，大于0时 WebDriverWait 的等待方法被替换为计时版本
+_wait_lock = threading.Lock()
+_wait_users = 0
+_wait_originals = {}
+
+
+class StepRecord:
+    """一个步骤的耗时记录"""
+
+    def __init__(self, name, keyword):
+        self.name = name
+        self.keyword = keyword
+        self.status = "passed"
+        self.phases = {phase: 0.0 for phase in PHASES}
+        self.commands = {}
+        self.duration = 0.0
+        self.retries = 0
+        self._stack = []
+        self._mark = None
+
+    def _switch(self, now):
+        if self._stack:
+            self.phases[self._stack[-1]] += now - self._mark
+        self._mark = now
+
+    def enter(self, phase):
+        # 按最内层的分类计时，外层分类在此期间暂停
+        self._switch(time.perf_counter())
+        self._stack.append(phase)
+
+    def exit(self):
+        self._switch(time.perf_counter())
+        self._stack.pop()
+
+    def add_command(self, command, elapsed):
+        stats = self.commands.setdefault(command, [0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed
+
+    def to_dict(self):
+        other = max(0.0, self.duration - sum(self.phases.values()))
+        return {
+            "step": self.name,
+            "keyword": self.keyword,
+            "status": self.status,
+            "duration_ms": round(self.duration * 1000, 1),
+            **{f"{phase}_ms": round(value * 1000, 1) for phase, value in self.phases.items()},
+            "other_ms": round(other * 1000, 1),
+            "retries": self.retries,
+            "commands": {name: {"count": count, "ms": round(elapsed * 1000, 1)}
+                         for name, (count, elapsed) in sorted(self.commands.items())},
+        }
+
+
+@contextmanager
+def measure(phase):
+    """把代码块的耗时计入当前步骤的某个分类，不在步骤中时不做任何事"""
+    record = getattr(_local, "record", None)
+    if record is None:
+        yield
+        return
+    record.enter(phase)
+    try:
+        yield
+    finally:
+        record.exit()
+
+
+def record_retry():
+    """当前步骤重试了一次（extend/step_retry.py 调用），不在步骤中时不做任何事"""
+    record = getattr(_local, "record", None)
+    if record is not None:
+        record.retries += 1
+
+
+def instrument(driver):
+    """包装driver.execute，记录每个WebDriver命令的往返时间（同一个driver只包装一次）"""
+    if getattr(driver, "_step_timing", False):
+        return
+    execute = driver.execute
+
+    def timed_execute(driver_command, params=None):
+        record = getattr(_local, "record", None)
+        if record is None:
+            return execute(driver_command, params)
+        # 在等待或截图过程中发出的命令计入外层分类
+        phase = "screenshot" if driver_command in SCREENSHOT_COMMANDS else None
+        if phase is None and not record._stack:
+            phase = "webdriver"
+        start = time.perf_counter()
+        if phase:
+            record.enter(phase)
+        try:
+            return execute(driver_command, params)
+        finally:
+            if phase:
+                record.exit()
+            record.add_command(driver_command, time.perf_counter() - start)
+
+    driver.execute = timed_execute
+    driver._step_timing = True
+
+
+@contextmanager
+def _timed_waits():
+    """步骤执行期间把 WebDriverWait.until/until_not 的耗时计入等待，没有步骤在执行时恢复原方法"""
+    global _wait_users
+    try:
+        from selenium.webdriver.support.wait import WebDriverWait
+    except ImportError:
+        yield
+        return
+    with _wait_lock:
+        if _wait_users == 0:
+            for name in ("until", "until_not"):
+                original = _wait_originals[name] = vars(WebDriverWait)[name]
+
+                def timed(self, *args, _original=original, **kwargs):
+                    with measure("wait"):
+                        return _original(self, *args, **kwargs)
+
+                setattr(WebDriverWait, name, timed)
+        _wait_users += 1
+    try:
+        yield
+    finally:
+        with _wait_lock:
+            _wait_users -= 1
+            if _wait_users == 0:
+                for name, original in _wait_originals.items():
+                    setattr(WebDriverWait, name, original)
+                _wait_originals.clear()
+
+
+def timing_path(run_id=None, timing_dir=TIMING_DIR):
+    """当前进程在本次运行中的明细文件路径"""
+    return os.path.join(timing_dir, run_id or ensure_run_id(), f"{os.getpid()}.jsonl")
+
+
+def _run_active(run_dir):
+    """运行目录中是否还有写入进程存活（明细文件以写入进程的PID命名）"""
+    try:
+        names = os.listdir(run_dir)
+    except OSError:
+        return False
+    pids = {name.split(".", 1)[0] for name in names}
+    return any(pid.isdigit() and pid_exists(int(pid)) for pid in pids)
+
+
+def prune_runs(timing_dir=TIMING_DIR, keep=KEEP_RUNS, current=None):
+    """只保留最近 keep 次运行的明细目录（当前运行和仍有进程存活的运行始终保留）"""
+    if not os.path.isdir(timing_dir):
+        return
+    runs = sorted((entry for entry in os.scandir(timing_dir) if entry.is_dir() and entry.name != current),
+                  key=lambda entry: entry.stat().st_mtime, reverse=True)
+    for entry in runs[max(0, keep - 1 if current else keep):]:
+        if _run_active(entry.path):
+            logging.debug(f"运行仍在进行，保留步骤耗时明细: {entry.path}")
+            continue
+        shutil.rmtree(entry.path, ignore_errors=True)
+
+
+class CaseTimer:
+    """
+    一个用例的步骤耗时
+
+    参数:
+        title: 用例标题
+        path: 用例文件路径
+    """
+
+    def __init__(self, title, path):
+        self.title = title
+        self.path = path
+        self.records = []
+
+    @contextmanager
+    def step(self, name, keyword):
+        """记录一个步骤，步骤抛出异常时状态记为failed"""
+        record = StepRecord(name, keyword)
+        _local.record = record
+        start = time.perf_counter()
+        try:
+            with _timed_waits():
+                yield record
+        except BaseException:
+            record.status = "failed"
+            raise
+        finally:
+            record.duration = time.perf_counter() - start
+            _local.record = None
+            self.records.append(record)
+            logging.info(f"步骤 {name} 耗时 {record.duration:.2f} 秒（" +
+                         "，".join(f"{phase} {value:.2f}" for phase, value in record.phases.items()) + "）")
+
+    def finish(self, path=None):
+        """把用例的步骤耗时写入Allure附件和明细文件（默认为当前进程在本次运行中的文件）"""
+        if not self.records:
+            return
+        run_id = ensure_run_id()
+        path = path or timing_path(run_id)
+        rows = [dict(record.to_dict(), run_id=run_id, case=self.title, file=self.path)
+                for record in self.records]
+
+        try:
+            import allure
+            allure.attach(json.dumps(rows, ensure_ascii=False, indent=2), name="步骤耗时",
+                          attachment_type=allure.attachment_type.JSON)
+        except Exception as e:
+            logging.debug(f"写入步骤耗时附件失败: {e}")
+
+        # 每个进程只写自己的文件，进程内的多个线程由锁保证一个用例的数据整体写入
+        data = "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with _write_lock, open(path, 'a', encoding='utf-8') as f:
+            f.write(data)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _read_rows(run_dir):
+    """读取一次运行目录中所有进程的明细"""
+    for file in sorted(os.listdir(run_dir)):
+        if not file.endswith(".jsonl"):
+            continue
+        with open(os.path.join(run_dir, file), 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def write_prometheus(path=PROMETHEUS_FILE, timing_dir=TIMING_DIR, run_id=None):
+    """
+    按本次运行的明细生成Prometheus文本格式的指标文件，并清理较早运行的明细
+
+    参数:
+        run_id: 统计该运行ID的数据，默认为当前运行
+    """
+    run_id = run_id or ensure_run_id()
+    prune_runs(timing_dir, current=run_id)
+    run_dir = os.path.join(timing_dir, run_id)
+    if not os.path.isdir(run_dir):
+        return False
+
+    keywords, commands, steps = {}, {}, {}
+    for row in _read_rows(run_dir):
+        stats = keywords.setdefault((row["keyword"], row["status"]), {"count": 0, "duration": 0.0})
+        stats["count"] += 1
+        stats["retries"] = stats.get("retries", 0) + row.get("retries", 0)
+        stats["duration"] += row["duration_ms"] / 1000
+        for phase in PHASES + ("other",):
+            stats[phase] = stats.get(phase, 0.0) + row[f"{phase}_ms"] / 1000
+        for command, value in row["commands"].items():
+            total = commands.setdefault(command, [0, 0.0])
+            total[0] += value["count"]
+            total[1] += value["ms"] / 1000
+        steps[(row["case"], row["step"])] = row["duration_ms"] / 1000
+
+    lines = [
+        "# HELP yaml_keyword_steps_total 执行的步骤数",
+        "# TYPE yaml_keyword_steps_total counter",
+    ]
+    lines += [f'yaml_keyword_steps_total{{keyword="{_label(k)}",status="{s}"}} {v["count"]}'
+              for (k, s), v in sorted(keywords.items())]
+    lines += [
+        "# HELP yaml_keyword_seconds_total 步骤耗时，按关键字和耗时分类统计",
+        "# TYPE yaml_keyword_seconds_total counter",
+    ]
+    for (keyword, status), stats in sorted(keywords.items()):
+        for phase in ("duration",) + PHASES + ("other",):
+            lines.append(f'yaml_keyword_seconds_total{{keyword="{_label(keyword)}",status="{status}",'
+                         f'phase="{phase}"}} {stats[phase]:.3f}')
+    lines += [
+        "# HELP yaml_keyword_step_retries_total 步骤因瞬时错误重试的次数",
+        "# TYPE yaml_keyword_step_retries_total counter",
+    ]
+    lines += [f'yaml_keyword_step_retries_total{{keyword="{_label(k)}",status="{s}"}} {v["retries"]}'
+              for (k, s), v in sorted(keywords.items())]
+    lines += [
+        "# HELP webdriver_commands_total WebDriver命令次数",
+        "# TYPE webdriver_commands_total counter",
+    ]
+    lines += [f'webdriver_commands_total{{command="{_label(c)}"}} {v[0]}' for c, v in sorted(commands.items())]
+    lines += [
+        "# HELP webdriver_command_seconds_total WebDriver命令往返耗时",
+        "# TYPE webdriver_command_seconds_total counter",
+    ]
+    lines += [f'webdriver_command_seconds_total{{command="{_label(c)}"}} {v[1]:.3f}'
+              for c, v in sorted(commands.items())]
+    lines += [
+        "# HELP yaml_step_duration_seconds 每个步骤最近一次执行的耗时",
+        "# TYPE yaml_step_duration_seconds gauge",
+    ]
+    lines += [f'yaml_step_duration_seconds{{case="{_label(c)}",step="{_label(s)}"}} {v:.3f}'
+              for (c, s), v in sorted(steps.items())]
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+    logging.info(f"步骤耗时指标已写入: {path}")
+    return True
@@ -0,0 +1,46 @@
+# coding = utf-8
+"""
+扩展关键字 assert_load_time：断言当前页面的加载耗时不超过预算
+
+    - 首页加载时间:
+        关键字: assert_load_time
+        数据内容: 3000          # 预算（毫秒）
+        指标: lcp               # 可选，默认为 load
+
+指标可以是 ttfb、dom_content_loaded、load、lcp，也可以是 CDP Performance.getMetrics 中的名称
+（如 ScriptDuration，单位与CDP一致）。使用最近一次 open_browser、切换窗口或页面跳转时采集的指标，
+当前页面还没有采集时立即采集。
+"""
+import logging
+from extend import page_metrics
+
+DEFAULT_METRIC = "load"
+
+
+class assert_load_time:
+
+    def __init__(self, driver):
+        self.driver = driver
+
+    def _current_metrics(self):
+        metrics = page_metrics.latest(self.driver)
+        try:
+            origin = self.driver.execute_script("return performance.timeOrigin;")
+        except Exception:
+            origin = None
+        if metrics is None or (origin is not None and metrics.get("time_origin") != round(origin, 1)):
+            metrics = page_metrics.collect(self.driver, "assert_load_time")
+        return metrics
+
+    def assert_load_time(self, 数据内容, 指标=DEFAULT_METRIC, **kwargs):
+        budget = float(数据内容)
+        metrics = self._current_metrics()
+        if metrics is None:
+            raise AssertionError("无法读取当前页面的性能指标")
+
+        value = metrics.get(指标, metrics.get("cdp", {}).get(指标))
+        if value is None:
+            raise AssertionError(f"页面 {metrics.get('url')} 没有性能指标 {指标}")
+        if value > budget:
+            raise AssertionError(f"页面 {metrics.get('url')} 的 {指标} 为 {value}，超过预算 {budget:g}")
+        logging.info(f"页面 {metrics.get('url')} 的 {指标} 为 {value}，在预算 {budget:g} 以内")
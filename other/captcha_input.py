@@ -0,0 +1,59 @@
+# coding = utf-8
+"""
+扩展关键字 captcha_input：识别验证码图片并输入到输入框
+
+    - 输入验证码:
+        关键字: captcha_input
+        定位方式: id
+        目标对象: captchaImg          # 验证码图片
+        目标定位方式: id
+        目标定位值: captcha           # 验证码输入框
+        识别参数: --psm 8             # 可选，tesseract参数，默认为 --psm 7（单行文字）
+
+识别使用 extend/ocr_pipeline.py 的共享流水线：相同的验证码图片命中缓存，不再重复识别。
+同一浏览器中再次出现上次已输入过的验证码图片时，说明上次的识别结果没有通过校验，先删除缓存再重新识别；
+也可以调用 invalidate() 删除上次识别结果的缓存。
+"""
+import logging
+from extend.ocr_pipeline import get_pipeline, DEFAULT_CONFIG
+
+# YAML中常用的定位方式简写
+_BY_ALIASES = {
+    "css": "css selector",
+    "class": "class name",
+    "tag": "tag name",
+    "link": "link text",
+    "partial_link": "partial link text",
+}
+
+
+class captcha_input:
+
+    def __init__(self, driver):
+        self.driver = driver
+        self._last = None  # (识别参数, 图片)：上次输入的验证码
+
+    def invalidate(self):
+        """删除上次输入的验证码的缓存识别结果（如提交后提示验证码错误）"""
+        if self._last is not None:
+            config, image = self._last
+            get_pipeline(config=config).invalidate(image)
+            self._last = None
+
+    def _find(self, by, value):
+        return self.driver.find_element(_BY_ALIASES.get(by, by), value)
+
+    def captcha_input(self, 定位方式, 目标对象, 目标定位方式, 目标定位值, 识别参数=DEFAULT_CONFIG, **kwargs):
+        image = self._find(定位方式, 目标对象).screenshot_as_png
+        if self._last == (识别参数, image):
+            logging.info("验证码与上次输入的相同，上次的识别结果未通过校验，重新识别")
+            self.invalidate()
+        text = "".join(get_pipeline(config=识别参数).recognize(image).split())
+        if not text:
+            raise AssertionError(f"未能识别验证码: {目标对象}")
+        logging.info(f"验证码识别结果: {text}")
+
+        target = self._find(目标定位方式, 目标定位值)
+        target.clear()
+        target.send_keys(text)
+        self._last = (识别参数, image)
@@ -0,0 +1,156 @@
+# coding = utf-8
+"""
+单文件YAML用例加载与编译缓存
+
+直接解析单个YAML文件（不再需要复制到临时目录再按目录读取），解析结果连同已解析的
+depends_on 路径一起缓存到磁盘。缓存按"路径 + 修改时间 + 内容哈希"判断是否有效：
+修改时间未变直接命中；修改时间变化但内容哈希相同时也复用解析结果，只有内容变化才重新解析。
+"""
+import os
+import copy
+import pickle
+import hashlib
+import logging
+import threading
+import yaml
+
+# 优先使用C实现的YAML解析器
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+# 默认缓存目录
+DEFAULT_CACHE_DIR = ".case_cache"
+
+# 缓存格式版本，编译结果结构变化时递增，使旧缓存失效
+CACHE_VERSION = 1
+
+
+class CaseLoadError(ValueError):
+    """YAML用例无法解析"""
+
+
+def resolve_depend_path(yaml_file_path, depend_file):
+    """依赖文件为相对路径时，相对于当前用例文件所在目录解析"""
+    if os.path.isabs(depend_file):
+        return os.path.normpath(depend_file)
+    return os.path.normpath(os.path.join(os.path.dirname(yaml_file_path), depend_file))
+
+
+class CaseCache:
+    """
+    编译后用例的缓存
+
+    参数:
+        cache_dir: 磁盘缓存目录，为None时只在内存中缓存
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self._memory = {}
+
+    def load(self, yaml_file_path):
+        """
+        加载单个YAML用例
+
+        返回:
+            dict: 编译结果，包含 case（用例内容）和 depends（已解析的依赖文件路径）
+
+        异常:
+            CaseLoadError: 文件内容不是合法的YAML用例
+        """
+        path = os.path.normpath(os.path.abspath(yaml_file_path))
+        stat = os.stat(path)
+
+        entry = self._memory.get(path) or self._read_entry(path)
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            self._memory[path] = entry
+            return entry
+
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha1(content).hexdigest()
+
+        if entry and entry["hash"] == digest:
+            # 文件被touch过但内容没变，只更新修改时间
+            entry = dict(entry, mtime_ns=stat.st_mtime_ns, size=stat.st_size)
+        else:
+            entry = {
+                "version": CACHE_VERSION,
+                "path": path,
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "hash": digest,
+                **compile_case(content, path),
+            }
+            logging.debug(f"已解析YAML文件: {path}")
+
+        self._memory[path] = entry
+        self._write_entry(path, entry)
+        return entry
+
+    def _entry_path(self, path):
+        name = hashlib.sha1(path.encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{name}.pickle")
+
+    def _read_entry(self, path):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._entry_path(path), 'rb') as f:
+                entry = pickle.load(f)
+        except Exception:
+            return None
+        if entry.get("version") != CACHE_VERSION or entry.get("path") != path:
+            return None
+        return entry
+
+    def _write_entry(self, path, entry):
+        if not self.cache_dir:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entry_path = self._entry_path(path)
+            temp_path = f"{entry_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp_path, entry_path)
+        except OSError as e:
+            logging.debug(f"写入用例缓存失败: {e}")
+
+
+def compile_case(content, yaml_file_path):
+    """
+    解析YAML内容并预先解析依赖文件路径
+
+    返回:
+        dict: {"case": 用例内容, "depends": 依赖文件路径列表}
+    """
+    try:
+        case = yaml.load(content, Loader=SafeLoader)
+    except yaml.YAMLError as e:
+        raise CaseLoadError(f"YAML格式错误: {yaml_file_path}: {e}")
+
+    # 兼容文件顶层为列表的写法，只取第一个用例
+    if isinstance(case, list):
+        case = case[0] if case else None
+    if not isinstance(case, dict):
+        raise CaseLoadError(f"YAML文件不是有效的测试用例: {yaml_file_path}")
+
+    depends = [resolve_depend_path(yaml_file_path, depend) for depend in case.get("depends_on") or []]
+    return {"case": case, "depends": depends}
+
+
+# 进程内共享的默认缓存
+_default_cache = CaseCache()
+
+
+def load_case(yaml_file_path):
+    """加载单个YAML用例，返回用例内容（dict）的副本，调用方修改不影响缓存"""
+    return copy.deepcopy(_default_cache.load(yaml_file_path)["case"])
+
+
+def load_depends(yaml_file_path):
+    """返回YAML用例已解析的依赖文件路径"""
+    return list(_default_cache.load(yaml_file_path)["depends"])
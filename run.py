@@ -30,20 +30,16 @@ def safe_exit():
     """确保在脚本退出时清理所有浏览器进程"""
     logging.info("正在安全退出，清理资源...")
     
-    # 强制结束所有chrome进程
+    # 结束本次运行（包括各worker进程）登记的浏览器进程，不影响同一台机器上的其他运行
     try:
-        if sys.platform.startswith('win'):
-            os.system('taskkill /f /im chromedriver.exe /t > nul 2>&1')
-            os.system('taskkill /f /im chrome.exe /t > nul 2>&1')
-        elif sys.platform.startswith('linux'):
-            os.system('pkill -f chrome > /dev/null 2>&1')
-            os.system('pkill -f chromedriver > /dev/null 2>&1')
-        elif sys.platform.startswith('darwin'):  # macOS
-            os.system('pkill -f "Google Chrome" > /dev/null 2>&1')
-            os.system('pkill -f chromedriver > /dev/null 2>&1')
+        process_tracker.terminate_processes()
     except:
         pass
 
+# 生成本次运行的ID，pytest和worker子进程继承后把启动的浏览器进程登记到同一次运行下
+from extend import process_tracker
+process_tracker.ensure_run_id()
+
 # 注册退出处理函数
 atexit.register(safe_exit)
 
@@ -144,6 +140,49 @@ def send_report_email(report_dir, excel_report_path=None, email_body=None):
         logging.error(f"发送邮件时出现错误: {e}")
         return False
 
+def queue_report_email(report_dir, excel_report_path=None, email_body=None, max_size_mb=20, link_base=None):
+    """
+    把测试报告邮件加入发送队列，由后台进程发送，不阻塞当前进程退出。
+    
+    Args:
+        report_dir (str): Allure报告目录，压缩为zip后作为附件。
+        excel_report_path (str, optional): Excel报告路径. Defaults to None.
+        email_body (str, optional): 邮件正文. Defaults to None.
+        max_size_mb (int, optional): 单个附件的大小上限(MB)，超过时压缩或改为链接. Defaults to 20.
+        link_base (str, optional): 报告下载地址前缀，附件过大时在正文中附上链接. Defaults to None.
+    """
+    try:
+        import tempfile
+        from datetime import datetime
+        from utils.mail_queue import (MailQueue, load_email_settings, prepare_attachments, build_message,
+                                      start_background_drain)
+        
+        settings = load_email_settings()
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        subject = f"{settings['subject_prefix']} - {current_time}"
+        
+        # 附件在入队前处理好，邮件内容完整保存在队列中
+        with tempfile.TemporaryDirectory(prefix="report_email_") as work_dir:
+            attachments, links = prepare_attachments(
+                [excel_report_path, report_dir], work_dir,
+                limit=int(max_size_mb * 1024 * 1024), link_base=link_base
+            )
+            message = build_message(settings['username'], settings['recipients'], subject,
+                                    email_body, attachments, links)
+        
+        queue = MailQueue()
+        queue.enqueue(message, settings['recipients'])
+        start_background_drain(queue.queue_dir)
+        logging.info(f"测试报告邮件已加入发送队列，收件人: {', '.join(settings['recipients'])}")
+        return True
+        
+    except ImportError as e:
+        logging.error(f"导入邮件模块失败: {e}")
+        return False
+    except Exception as e:
+        logging.error(f"加入邮件队列时出现错误: {e}")
+        return False
+
 def parse_arguments():
     """处理命令行参数"""
     parser = argparse.ArgumentParser(description="运行YAML测试用例")
@@ -153,8 +192,37 @@ def parse_arguments():
     parser.add_argument('--headless', action='store_true', help='使用无头模式运行浏览器')
     parser.add_argument('--report', action='store_true', help='生成Allure报告')
     parser.add_argument('--email', action='store_true', help='生成报告后发送邮件')
+    parser.add_argument('--email-queue', action='store_true', help='邮件加入队列由后台进程发送，不等待发送完成（默认通过EmailSender同步发送）')
+    parser.add_argument('--email-max-size', type=int, default=20, help='使用--email-queue时单个附件的大小上限(MB)，超过时压缩或改为链接，默认为20')
+    parser.add_argument('--email-link-base', default=os.environ.get('REPORT_LINK_BASE'), help='使用--email-queue时的报告下载地址前缀，附件过大时在邮件中附上链接')
+    parser.add_argument('--workers', type=int, default=1, help='并行执行的worker数量，每个worker使用独立的浏览器，默认为1')
+    parser.add_argument('--driver-pool', action='store_true', help='复用浏览器实例，用例之间只重置浏览器状态')
+    parser.add_argument('--max-reuse', type=int, default=50, help='复用池模式下单个浏览器的最大复用次数，默认为50')
+    parser.add_argument('--smart-wait', action='store_true', help='wait_sleep在页面静止后提前结束，配置的时间作为上限')
+    parser.add_argument('--lean', action='store_true', help='精简模式：新版无头模式，并通过CDP拦截统计脚本、字体和媒体等与用例无关的请求')
+    parser.add_argument('--session-cache', action='store_true', help='缓存登录状态（cookie和localStorage），后续用例注入缓存跳过登录流程')
+    parser.add_argument('--step-retry', type=int, help='步骤遇到瞬时错误（元素过期、点击被遮挡）时的最多执行次数，默认为1（不重试）')
+    parser.add_argument('--page-metrics', action='store_true', help='打开页面、切换窗口和点击跳转后采集页面性能指标并写入Allure')
+    parser.add_argument('--validate', action='store_true', help='只做用例静态检查（不启动浏览器），检查完成后退出')
+    parser.add_argument('--screenshot', help='步骤截图策略: every（每一步）、failure（仅失败时）、every:N（每N步）')
+    parser.add_argument('--attachment-format', choices=['png', 'jpeg', 'webp'], help='截图附件的编码格式，附件按内容哈希命名并去重')
+    parser.add_argument('--attachment-quality', type=int, default=80, help='jpeg/webp附件的编码质量，默认为80')
+    parser.add_argument('--attachment-max-width', type=int, help='截图附件的最大宽度，超过时等比缩小')
+    parser.add_argument('--incremental-report', action='store_true', help='增量生成报告，只处理上次生成后新增的结果（适用于重跑和分片执行）')
+    parser.add_argument('--order', choices=['file', 'history'], default='file', help='用例执行顺序: file（按文件顺序）、history（按历史结果，可能失败的用例优先，并行时耗时长的先分配）')
+    parser.add_argument('--fail-fast', type=int, default=0, help='失败用例数达到N个后停止执行剩余用例，默认为0（不停止）')
+    parser.add_argument('--shard', help='多节点分片执行，格式为 i/n（第i个分片，共n个），按历史耗时均衡分配，depends_on 中的依赖由各分片各自执行')
     
-    return parser.parse_args()
+    # 未识别的参数原样转发给pytest（例如 -k、-m 或额外的测试路径）
+    args, pytest_args = parser.parse_known_args()
+    args.pytest_args = pytest_args
+    if args.shard:
+        from utils.sharding import parse_shard
+        try:
+            parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    return args
 
 if __name__ == '__main__':
     try:
@@ -170,6 +238,44 @@ if __name__ == '__main__':
         # 是否使用无头模式
         headless = args.headless
         
+        # 静态检查模式：并行检查所有用例后直接退出
+        if args.validate:
+            from utils.parallel_runner import collect_yaml_files
+            from utils.case_validator import validate_suite
+            yaml_files = [yaml_file] if yaml_file else collect_yaml_files(args.directory)
+            sys.exit(validate_suite(yaml_files))
+        
+        # 开启智能等待，通过环境变量传递给pytest和worker进程
+        if args.smart_wait:
+            os.environ["SMART_WAIT"] = "1"
+        
+        # 精简模式，同样通过环境变量传递（用例config中的lean优先）
+        if args.lean:
+            os.environ["LEAN_BROWSER"] = "1"
+        
+        # 登录状态缓存，同样通过环境变量传递（先决条件中的session_cache优先）
+        if args.session_cache:
+            os.environ["SESSION_CACHE"] = "1"
+        
+        # 步骤重试次数，同样通过环境变量传递
+        if args.step_retry is not None:
+            os.environ["STEP_RETRY"] = str(args.step_retry)
+        
+        # 页面性能采集，同样通过环境变量传递
+        if args.page_metrics:
+            os.environ["PAGE_METRICS"] = "1"
+        
+        # 步骤截图策略，同样通过环境变量传递
+        if args.screenshot:
+            os.environ["SCREENSHOT_POLICY"] = args.screenshot
+        
+        # 附件压缩配置，同样通过环境变量传递
+        if args.attachment_format:
+            os.environ["ATTACHMENT_FORMAT"] = args.attachment_format
+        if args.attachment_max_width:
+            os.environ["ATTACHMENT_MAX_WIDTH"] = str(args.attachment_max_width)
+        os.environ["ATTACHMENT_QUALITY"] = str(args.attachment_quality)
+        
         # 基本命令
         if yaml_file:
             # 只运行指定的YAML文件
@@ -186,32 +292,114 @@ if __name__ == '__main__':
         if headless:
             cmd.append("--headless")
         
-        # 只添加未处理的位置参数，跳过已经作为选项值处理的参数
-        if len(sys.argv) > 1:
-            # 获取所有已处理的选项值
-            processed_values = []
-            if yaml_file:
-                processed_values.append(yaml_file)
-            if args.directory != 'examples':  # 只有非默认值才添加
-                processed_values.append(args.directory)
-                
-            # 只添加未处理的位置参数
-            additional_args = []
-            for arg in sys.argv[1:]:
-                if not arg.startswith('-') and '=' not in arg and arg not in processed_values:
-                    additional_args.append(arg)
-                    
-            cmd.extend(additional_args)
+        # 添加浏览器复用池参数
+        pool_args = ["--driver-pool", "--max-reuse", str(args.max_reuse)] if args.driver_pool else []
+        cmd.extend(pool_args)
+        
+        # 添加run.py未识别的参数，原样转发给pytest
+        cmd.extend(args.pytest_args)
+        
+        # 用例执行历史，只在按历史排序或分片执行时使用；allure-results 执行前会被清空，先记录上次运行的结果
+        shard = args.shard and not yaml_file
+        history = None
+        if args.order == 'history' or shard:
+            from utils.case_history import CaseHistory
+            from utils.parallel_runner import collect_yaml_files
+            history = CaseHistory()
+            history_files = [yaml_file] if yaml_file else collect_yaml_files(args.directory)
+            # 分片执行时各节点只使用共享的历史文件（由 utils/sharding.py merge 写入），保证分片结果一致
+            if not shard:
+                history.ingest("./allure-results", history_files)
         
         # 运行测试
-        logging.info(f"运行命令: pytest {' '.join(cmd)}")
-        pytest_exit_code = pytest.main(cmd)
+        if shard:
+            # 只执行本节点的分片
+            from utils.sharding import select_shard
+            from utils.parallel_runner import run_parallel
+            shard_files = select_shard(history_files, args.shard, history)
+            if shard_files:
+                worker_args = ["-sv" if verbose else "-s"]
+                if headless:
+                    worker_args.append("--headless")
+                worker_args.extend(pool_args)
+                worker_args.extend(args.pytest_args)
+                pytest_exit_code = run_parallel(
+                    args.directory,
+                    max(1, args.workers),
+                    pytest_args=worker_args,
+                    alluredir="./allure-results" if args.report else None,
+                    clean_alluredir=True,
+                    history=history if args.order == 'history' else None,
+                    fail_fast=args.fail_fast,
+                    yaml_files=shard_files
+                )
+            else:
+                logging.warning(f"分片 {args.shard} 没有分配到用例")
+                pytest_exit_code = 0
+            from extend import step_timing
+            step_timing.write_prometheus()
+        elif args.workers > 1 and not yaml_file:
+            # 多worker并行执行目录下的用例，并合并allure结果
+            from utils.parallel_runner import run_parallel
+            worker_args = ["-sv" if verbose else "-s"]
+            if headless:
+                worker_args.append("--headless")
+            worker_args.extend(pool_args)
+            worker_args.extend(args.pytest_args)
+            logging.info(f"使用 {args.workers} 个worker并行执行目录: {args.directory}")
+            pytest_exit_code = run_parallel(
+                args.directory,
+                args.workers,
+                pytest_args=worker_args,
+                alluredir="./allure-results" if args.report else None,
+                clean_alluredir=True,
+                history=history,
+                fail_fast=args.fail_fast
+            )
+            # 各worker只汇总了自己的步骤耗时，按全部worker的明细重新生成指标文件
+            from extend import step_timing
+            step_timing.write_prometheus()
+        else:
+            if args.fail_fast > 0:
+                cmd.append(f"--maxfail={args.fail_fast}")
+            yaml_list = None
+            if history is not None and not yaml_file:
+                # 单worker时仍在当前进程中执行，按历史排好的顺序通过 --yaml-list 传给pytest
+                import tempfile
+                from utils.case_history import order_cases
+                from utils.parallel_runner import write_yaml_list
+                fd, yaml_list = tempfile.mkstemp(prefix="yaml_list_", suffix=".txt")
+                os.close(fd)
+                write_yaml_list(order_cases(history_files, history), yaml_list)
+                cmd.extend(["--yaml-list", yaml_list])
+            logging.info(f"运行命令: pytest {' '.join(cmd)}")
+            try:
+                pytest_exit_code = pytest.main(cmd)
+            finally:
+                if yaml_list:
+                    os.remove(yaml_list)
         
         # 如果需要生成报告
         if args.report:
+            # 记录本次运行的结果和耗时（分片执行时由合并步骤统一记录）
+            if history is not None and not shard:
+                history.ingest("./allure-results", history_files)
+            
+            # 压缩截图附件并按内容去重全部附件（包括关键字自动截图产生的附件）
+            from extend.attachment_store import store_from_env, compact_results
+            attachment_store = store_from_env()
+            if attachment_store and os.path.isdir("./allure-results"):
+                compact_results("./allure-results", attachment_store)
+            
             # 生成报告
-            os.system("allure generate -c -o report")
-            logging.info("已生成Allure报告，可在report目录查看")
+            from utils.incremental_report import generate_report
+            report_exit_code = generate_report("./allure-results", "./report", incremental=args.incremental_report)
+            if report_exit_code == 0:
+                logging.info("已生成Allure报告，可在report目录查看")
+            else:
+                logging.error(f"生成Allure报告失败，退出码: {report_exit_code}")
+                if pytest_exit_code == 0:
+                    pytest_exit_code = report_exit_code
 
             excel_path = None
             email_body = None # 初始化邮件正文
@@ -229,8 +417,12 @@ if __name__ == '__main__':
                 except Exception as e:
                     logging.error(f"生成邮件正文失败: {e}")
 
-                logging.info("开始发送测试报告邮件...")
-                send_report_email("./report", excel_report_path=excel_path, email_body=email_body)
+                if args.email_queue:
+                    queue_report_email("./report", excel_report_path=excel_path, email_body=email_body,
+                                       max_size_mb=args.email_max_size, link_base=args.email_link_base)
+                else:
+                    logging.info("开始发送测试报告邮件...")
+                    send_report_email("./report", excel_report_path=excel_path, email_body=email_body)
         
         # 返回pytest的退出码
         sys.exit(pytest_exit_code)
@@ -2,11 +2,11 @@
 # Author: 李波
 import os
 import sys
+import time
 import logging
 import argparse
 import warnings
 from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
 
 # 忽略不需要的警告
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -23,10 +23,27 @@ logging.getLogger('urllib3').setLevel(logging.ERROR)
 logging.getLogger('selenium').setLevel(logging.WARNING)
 
 from extend.driver_manager import DriverManager
+from extend.driver_cache import cached_driver_path, remember_driver
+from extend import process_tracker
 from extend.keywords import Keywords
-from parse.YamlCase import read_yaml_file2
+from extend.keyword_registry import KeywordRegistry, KeywordError, compile_steps
+from extend.dependency_graph import (DependencyGraph, DependencyCycleError, is_executed, mark_executed,
+                                     clear_session)
+from extend import dry_run
+from extend import session_cache
+from extend.session_cache import SessionCache, DEFAULT_TTL
+from extend import lean_browser, page_metrics, smart_wait, step_retry, step_timing
+from extend.screenshot_pipeline import pipeline_for
+from parse.case_loader import load_case, CaseLoadError
 
-def execute_yaml_file(yaml_file_path, headless=False, driver=None, keywords=None, close_driver=True):
+# 登录页地址
+LOGIN_URL = "https://www.leadong.com/login.html"
+
+# 关键字注册表，进程内共享，每个关键字只解析一次
+registry = KeywordRegistry(Keywords)
+
+def execute_yaml_file(yaml_file_path, headless=False, driver=None, keywords=None, close_driver=True,
+                      resolve_depends=True):
     """
     执行单个YAML文件
     
@@ -36,6 +53,7 @@ def execute_yaml_file(yaml_file_path, headless=False, driver=None, keywords=None
         driver: 可选的WebDriver实例，如果提供则使用该实例
         keywords: 可选的Keywords实例，如果提供则使用该实例
         close_driver: 是否在执行结束后关闭driver（仅当driver是在函数内创建时有效）
+        resolve_depends: 是否先执行depends_on中的依赖（依赖本身由依赖图统一调度，不再递归解析）
     
     返回:
         tuple: (driver, keywords) 如果需要复用浏览器会话
@@ -47,50 +65,45 @@ def execute_yaml_file(yaml_file_path, headless=False, driver=None, keywords=None
         logging.error(f"文件不存在: {yaml_file_path}")
         return None, None
     
-    # 创建一个临时目录，只包含要执行的YAML文件
-    temp_dir = "temp_yaml"
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    # 复制YAML文件到临时目录
-    import shutil
-    yaml_filename = os.path.basename(yaml_file_path)
-    temp_yaml_path = os.path.join(temp_dir, yaml_filename)
-    shutil.copy(yaml_file_path, temp_yaml_path)
-    
-    # 从临时目录读取YAML文件
-    cases = read_yaml_file2(temp_dir)
-    
-    if not cases:
-        logging.error("未能从YAML文件解析出测试用例")
-        shutil.rmtree(temp_dir)
+    # 直接解析YAML文件（未修改的文件会命中编译缓存）
+    try:
+        case = load_case(yaml_file_path)
+    except CaseLoadError as e:
+        logging.error(f"未能从YAML文件解析出测试用例: {e}")
         return None, None
     
-    case = cases[0]  # 获取第一个测试用例
+    # 解析依赖图并检查循环依赖，把用例和依赖的步骤编译成执行计划，在启动浏览器之前发现问题
+    depend_order = []
+    try:
+        if resolve_depends:
+            depend_order = DependencyGraph().execution_order(yaml_file_path)
+            for depend_path in depend_order:
+                if os.path.exists(depend_path):
+                    compile_steps(load_case(depend_path).get("steps"), registry, depend_path)
+        plan = compile_steps(case.get("steps"), registry, yaml_file_path)
+    except (DependencyCycleError, CaseLoadError, KeywordError) as e:
+        logging.error(str(e))
+        return None, None
     
-    # 检查是否有依赖文件需要先执行
-    depends_on = case.get("depends_on", [])
-    if depends_on and (driver is None or keywords is None):
-        logging.info(f"检测到依赖文件: {depends_on}")
+    # 检查是否有依赖文件需要先执行（同一浏览器会话中已执行过的依赖会被跳过）
+    if depend_order and (driver is None or keywords is None or
+                         not all(is_executed(driver, path) for path in depend_order)):
+        logging.info(f"检测到依赖文件: {depend_order}")
         # 创建driver和keywords，用于执行依赖文件
         if driver is None:
             # 创建driver
             driver_manager = DriverManager()
-            options = Options()
-            if headless:
-                options.add_argument("--headless")
-            
-            # 添加通用选项
-            options.add_argument('--ignore-certificate-errors')
-            options.add_argument('--ignore-ssl-errors')
-            options.add_argument('--log-level=3')
-            options.add_experimental_option('excludeSwitches', ['enable-logging'])
-            options.add_argument('--disable-dev-shm-usage')
-            options.add_argument('--no-sandbox')
-            options.add_argument('--disable-gpu')
-            options.add_argument('--disable-extensions')
+            cached_path = cached_driver_path("chrome")
+            if cached_path:
+                driver_manager.set_local_driver_path("chrome", cached_path)
+            # 通用选项，用例开启精简模式时使用新版无头模式并关闭无关的后台功能
+            options = lean_browser.chrome_options(headless, lean_browser.lean_config(case.get("config")))
             
             driver = driver_manager.get_driver("chrome", options)
+            if not cached_path:
+                remember_driver(driver)
             driver.maximize_window()
+            process_tracker.register_driver(driver)
         
         # 获取默认超时时间
         config = case.get("config", {})
@@ -100,16 +113,15 @@ def execute_yaml_file(yaml_file_path, headless=False, driver=None, keywords=None
             # 创建keywords实例
             keywords = Keywords(driver, default_timeout=default_timeout)
         
-        # 依次执行依赖文件
-        for depend_file in depends_on:
-            depend_path = depend_file
-            if not os.path.isabs(depend_path):
-                # 如果是相对路径，则相对于当前文件的目录
-                depend_path = os.path.join(os.path.dirname(yaml_file_path), depend_file)
+        # 按拓扑顺序执行依赖文件
+        for depend_path in depend_order:
+            if is_executed(driver, depend_path):
+                logging.info(f"依赖文件已在当前浏览器会话中执行，跳过: {depend_path}")
+                continue
             
             logging.info(f"执行依赖文件: {depend_path}")
-            # 递归执行依赖文件，不关闭driver
-            execute_yaml_file(depend_path, headless, driver, keywords, False)
+            # 执行依赖文件，不关闭driver
+            execute_yaml_file(depend_path, headless, driver, keywords, False, resolve_depends=False)
     
     # 如果没有提供driver和keywords，则创建新的
     driver_created = False
@@ -117,22 +129,17 @@ def execute_yaml_file(yaml_file_path, headless=False, driver=None, keywords=None
         driver_created = True
         # 创建driver
         driver_manager = DriverManager()
-        options = Options()
-        if headless:
-            options.add_argument("--headless")
-        
-        # 添加通用选项
-        options.add_argument('--ignore-certificate-errors')
-        options.add_argument('--ignore-ssl-errors')
-        options.add_argument('--log-level=3')
-        options.add_experimental_option('excludeSwitches', ['enable-logging'])
-        options.add_argument('--disable-dev-shm-usage')
-        options.add_argument('--no-sandbox')
-        options.add_argument('--disable-gpu')
-        options.add_argument('--disable-extensions')
+        cached_path = cached_driver_path("chrome")
+        if cached_path:
+            driver_manager.set_local_driver_path("chrome", cached_path)
+        # 通用选项，用例开启精简模式时使用新版无头模式并关闭无关的后台功能
+        options = lean_browser.chrome_options(headless, lean_browser.lean_config(case.get("config")))
         
         driver = driver_manager.get_driver("chrome", options)
+        if not cached_path:
+            remember_driver(driver)
         driver.maximize_window()
+        process_tracker.register_driver(driver)
     
     # 获取默认超时时间
     config = case.get("config", {})
@@ -145,50 +152,85 @@ def execute_yaml_file(yaml_file_path, headless=False, driver=None, keywords=None
         # 更新超时时间
         keywords.default_timeout = default_timeout
     
+    # 按用例配置设置请求拦截（精简模式），复用的浏览器会随用例切换规则
+    lean_browser.apply(keywords.driver, config)
+    
+    # 记录每个步骤的耗时（等待、WebDriver命令、截图）
+    timer = step_timing.CaseTimer(case['title'], yaml_file_path)
+    step_timing.instrument(keywords.driver)
+    
+    screenshots = None
     try:
         logging.info(f"开始执行测试用例: {case['title']}")
-        logging.info(f"测试用例描述: {case['description']}")
+        logging.info(f"测试用例描述: {case.get('description')}")
+        
+        # 按用例配置的截图策略创建截图流水线（未配置时为None），开启时关键字不再自动截图
+        # 截图策略配置错误时在这里抛出，由finally关闭浏览器
+        screenshots = pipeline_for(config)
+        if screenshots:
+            screenshots.take_over(keywords)
         
         # 处理先决条件（如登录）
         handle_prerequisites(case, keywords)
         
-        # 执行测试步骤
-        for step in case["steps"]:
-            step_name = list(step.keys())[0]
-            step_value = list(step.values())[0]
-            key = step_value["关键字"]
-            
-            logging.info(f"执行步骤: {step_name}")
-            
-            try:
-                key_func = keywords.__getattribute__(key)
-            except AttributeError:
-                # 如果关键字不在Keywords类中，尝试从其他模块导入
-                sys.path.append("./other")
-                module = __import__(key)
-                class_ = getattr(module, key)
-                key_func = getattr(class_(keywords.driver), key)
+        # 是否使用智能等待替代固定的wait_sleep
+        use_smart_wait = smart_wait.is_enabled(config)
+        
+        # 步骤遇到瞬时错误时只重试该步骤
+        retry_policy = step_retry.policy_for(config)
+        
+        # 是否在导航类步骤之后采集页面性能指标
+        collect_metrics = page_metrics.is_enabled(config)
+        
+        # 按执行计划执行测试步骤
+        for step in plan:
+            logging.info(f"执行步骤: {step.name}")
             
             # 执行步骤
-            key_func(**step_value)
+            with timer.step(step.name, step.keyword.name):
+                try:
+                    if step.keyword.name == "wait_sleep":
+                        with step_timing.measure("wait"):
+                            if use_smart_wait:
+                                smart_wait.smart_sleep(keywords.driver, step.params.get("数据内容", 0))
+                            else:
+                                registry.bind(step.keyword, keywords)(**step.params)
+                    else:
+                        step_retry.run_step(registry.bind(step.keyword, keywords), step.params, step.name,
+                                            retry_policy)
+                except Exception:
+                    if screenshots:
+                        with step_timing.measure("screenshot"):
+                            screenshots.after_step(keywords.driver, step.name, failed=True)
+                    raise
+                
+                if screenshots:
+                    with step_timing.measure("screenshot"):
+                        screenshots.after_step(keywords.driver, step.name)
+            
+            # 页面性能采集需要显式开启，采集时等待页面加载的时间不计入步骤耗时
+            if collect_metrics:
+                page_metrics.after_step(keywords.driver, step.keyword.name)
             
-            logging.info(f"步骤 {step_name} 执行成功")
+            logging.info(f"步骤 {step.name} 执行成功")
         
         logging.info(f"测试用例 {case['title']} 执行完成")
+        mark_executed(driver, yaml_file_path)
         
     except Exception as e:
         logging.error(f"执行YAML文件时出错: {str(e)}")
     finally:
-        # 清理临时目录
-        try:
-            shutil.rmtree(temp_dir)
-        except:
-            pass
+        # 等待截图全部写入后再结束用例
+        if screenshots:
+            screenshots.close()
+        timer.finish()
         
         # 如果是我们创建的driver且需要关闭，则关闭它
         if driver_created and close_driver:
             try:
                 driver.quit()
+                # 正常关闭后取消登记，关闭失败时保留登记，由进程清理兜底
+                process_tracker.unregister_driver(driver)
             except:
                 pass
     
@@ -243,9 +285,42 @@ def execute_yaml_sequence(yaml_files, headless=False):
         if driver is not None:
             try:
                 driver.quit()
+                process_tracker.unregister_driver(driver)
             except:
                 pass
 
+def dry_run_yaml_file(yaml_file_path, trace_dir=None):
+    """
+    试运行单个YAML文件：用记录调用的模拟WebDriver执行完整流程（包括依赖和先决条件），不启动浏览器
+    
+    参数:
+        yaml_file_path: YAML文件路径
+        trace_dir: 调用记录的输出目录，为None时不写文件
+    
+    返回:
+        dict: 是否执行成功、耗时（毫秒）和按顺序记录的调用
+    """
+    with dry_run.DryRun(registry) as run:
+        driver = run.driver
+        start = time.perf_counter()
+        execute_yaml_file(yaml_file_path, driver=driver, keywords=Keywords(driver, default_timeout=10),
+                          close_driver=False)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    trace = {
+        "file": yaml_file_path,
+        "passed": is_executed(driver, yaml_file_path),
+        "elapsed_ms": round(elapsed_ms, 2),
+        "calls": driver.trace(),
+    }
+    clear_session(driver)
+    
+    status = "通过" if trace["passed"] else "失败"
+    logging.info(f"试运行{status}: {yaml_file_path}，{len(trace['calls'])} 个调用，耗时 {trace['elapsed_ms']} 毫秒")
+    if trace_dir:
+        dry_run.write_trace(trace, trace_dir, yaml_file_path)
+    return trace
+
 def handle_prerequisites(case, keywords):
     """处理测试用例的先决条件，例如登录操作"""
     prerequisites = case.get("prerequisites", [])
@@ -262,42 +337,66 @@ def handle_prerequisites(case, keywords):
         if prerequisite_type == "login":
             username = prerequisite.get("username")
             password = prerequisite.get("password")
-            logging.info(f"执行登录操作，用户名: {username}")
-            
-            # 执行登录操作
-            # 打开登录页面
-            keywords.open_browser(数据内容="https://www.leadong.com/login.html")
             
-            # 输入用户名
-            keywords.input_context(定位方式="id", 目标对象="loginName", 数据内容=username)
-            
-            # 输入密码
-            keywords.input_context(定位方式="id", 目标对象="password", 数据内容=password)
-            
-            # 点击登录按钮
-            keywords.option_click(定位方式="id", 目标对象="loginSubmit")
-            
-            # 等待登录完成
-            keywords.wait_sleep(数据内容="3")
+            # 登录状态缓存默认关闭，通过 run.py --session-cache 或 session_cache: true 开启；试运行时不使用缓存
+            if not session_cache.is_enabled(prerequisite) or dry_run.is_active():
+                login(keywords, username, password)
+                continue
             
-            # 尝试关闭可能出现的视频弹窗
-            try:
-                keywords.option_click(定位方式="xpath", 目标对象="//*[@id=\"app\"]/div[3]/div/div[1]")
-            except:
-                logging.info("没有找到视频弹窗，继续执行")
-                
-            logging.info(f"成功执行登录操作，用户名: {username}")
+            cache = SessionCache(LOGIN_URL, ttl=prerequisite.get("cache_ttl", DEFAULT_TTL))
+            cache.ensure_login(keywords.driver, username, lambda: login(keywords, username, password))
+
+def call_keyword(keywords, name, **params):
+    """通过关键字注册表调用关键字（试运行时会记录到调用记录中）"""
+    return registry.bind(registry.resolve(name), keywords)(**params)
+
+def login(keywords, username, password):
+    """执行完整的登录流程"""
+    logging.info(f"执行登录操作，用户名: {username}")
+    
+    # 打开登录页面
+    call_keyword(keywords, "open_browser", 数据内容=LOGIN_URL)
+    
+    # 输入用户名
+    call_keyword(keywords, "input_context", 定位方式="id", 目标对象="loginName", 数据内容=username)
+    
+    # 输入密码
+    call_keyword(keywords, "input_context", 定位方式="id", 目标对象="password", 数据内容=password)
+    
+    # 点击登录按钮
+    call_keyword(keywords, "option_click", 定位方式="id", 目标对象="loginSubmit")
+    
+    # 等待登录完成
+    call_keyword(keywords, "wait_sleep", 数据内容="3")
+    
+    # 尝试关闭可能出现的视频弹窗
+    try:
+        call_keyword(keywords, "option_click", 定位方式="xpath", 目标对象="//*[@id=\"app\"]/div[3]/div/div[1]")
+    except:
+        logging.info("没有找到视频弹窗，继续执行")
+        
+    logging.info(f"成功执行登录操作，用户名: {username}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="执行单个YAML文件或YAML文件序列")
     parser.add_argument("yaml_files", nargs='+', help="YAML文件路径或多个YAML文件路径")
     parser.add_argument("--headless", action="store_true", help="使用无头模式")
     parser.add_argument("--sequence", action="store_true", help="按顺序执行多个YAML文件，复用同一个浏览器会话")
+    parser.add_argument("--dry-run", action="store_true", help="试运行：使用模拟的WebDriver执行完整流程，不启动浏览器")
+    parser.add_argument("--trace-dir", help="试运行时把每个用例的调用记录写入该目录")
     
     args = parser.parse_args()
     
+    if args.dry_run:
+        # 试运行：不启动浏览器，任一用例失败时退出码为1
+        results = [dry_run_yaml_file(yaml_file, args.trace_dir) for yaml_file in args.yaml_files]
+        sys.exit(0 if all(result["passed"] for result in results) else 1)
+    
     if args.sequence and len(args.yaml_files) > 1:
         execute_yaml_sequence(args.yaml_files, args.headless)
     else:
         for yaml_file in args.yaml_files:
-            execute_yaml_file(yaml_file, args.headless) 
\ No newline at end of file
+            execute_yaml_file(yaml_file, args.headless)
+    
+    smart_wait.write_report()
+    step_timing.write_prometheus()
\ No newline at end of file
@@ -0,0 +1,59 @@
+# coding = utf-8
+import os
+import json
+from extend.attachment_store import AttachmentStore, compact_results, is_stored_name
+
+
+def _write_results(results_dir, attachments):
+    """attachments: [(文件名, 类型, 内容)]"""
+    for source, _, data in attachments:
+        (results_dir / source).write_bytes(data)
+    document = {"attachments": [{"name": source, "source": source, "type": mime_type}
+                                for source, mime_type, _ in attachments]}
+    (results_dir / "case-result.json").write_text(json.dumps(document), encoding="utf-8")
+
+
+def _sources(results_dir):
+    with open(results_dir / "case-result.json", encoding="utf-8") as f:
+        return [(a["source"], a["type"]) for a in json.load(f)["attachments"]]
+
+
+def test_compact_dedupes_all_types_and_is_idempotent(tmp_path):
+    _write_results(tmp_path, [
+        ("a-attachment.txt", "text/plain", b"log"),
+        ("b-attachment.txt", "text/plain", b"log"),
+        ("c-attachment.html", "text/html", b"<p>page</p>"),
+        ("d-attachment.png", "image/png", b"not really a png"),
+    ])
+    first = compact_results(str(tmp_path), AttachmentStore("png"))
+    assert first["attachments"] == 4 and first["files"] == 3
+    sources = _sources(tmp_path)
+    assert all(is_stored_name(source) for source, _ in sources)
+    assert sources[0] == sources[1] and sources[0][0].endswith(".txt") and sources[0][1] == "text/plain"
+    assert sources[2][1] == "text/html"
+
+    files = sorted(os.listdir(tmp_path))
+    second = compact_results(str(tmp_path), AttachmentStore("png"))
+    assert second["attachments"] == 0
+    assert sorted(os.listdir(tmp_path)) == files and _sources(tmp_path) == sources
+
+
+def test_store_name_is_stable():
+    store = AttachmentStore("jpg", quality=70)
+    assert store.fmt == "jpeg" and store.mime_type == "image/jpeg"
+    assert store.file_name(b"x") == store.file_name(b"x") != store.file_name(b"y")
+    assert is_stored_name(store.file_name(b"x"))
+
+
+def test_encode_failure_keeps_png_name_and_type(tmp_path):
+    # 内容无法解码（或没有安装图片库）时保持PNG，文件名和类型不能使用配置的jpeg
+    store = AttachmentStore("jpeg")
+    file_name, body, mime_type = store.put(b"not really a png")
+    assert file_name.endswith(".png") and mime_type == "image/png" and body == b"not really a png"
+    assert store.put(b"not really a png") == (file_name, None, "image/png")
+
+    _write_results(tmp_path, [("a-attachment.png", "image/png", b"not really a png")])
+    compact_results(str(tmp_path), AttachmentStore("jpeg"))
+    [(source, mime_type)] = _sources(tmp_path)
+    assert source.endswith(".png") and mime_type == "image/png"
+    assert (tmp_path / source).read_bytes() == b"not really a png"
@@ -0,0 +1,30 @@
+# coding = utf-8
+import os
+from utils.case_history import _match
+
+
+def _index(**cases):
+    """{键: 用例路径}，与 CaseHistory.ingest 中的 key_index 相同"""
+    index = {}
+    for path, title in cases.items():
+        for key in (os.path.normpath(f"{path}.yaml"), f"{path}.yaml", path, title):
+            index.setdefault(key, os.path.normpath(f"{path}.yaml"))
+    return index
+
+
+def test_parameter_path_wins_over_title():
+    # 两个用例标题相同，标题先出现的用例不能抢走另一个用例的结果
+    index = _index(login_admin="登录", login_guest="登录")
+    result = {"name": "登录", "parameters": [{"name": "yaml_file", "value": "'login_guest.yaml'"}]}
+    assert _match(result, index) == "login_guest.yaml"
+
+
+def test_unknown_parameter_does_not_fall_back_to_title():
+    index = _index(login_admin="登录")
+    result = {"name": "登录", "parameters": [{"name": "yaml_file", "value": "'other.yaml'"}]}
+    assert _match(result, index) is None
+
+
+def test_title_used_without_parameter():
+    index = _index(login_admin="登录")
+    assert _match({"name": "登录"}, index) == "login_admin.yaml"
@@ -0,0 +1,27 @@
+# coding = utf-8
+import os
+from parse import case_loader
+from parse.case_loader import CaseCache
+
+
+def test_load_case_returns_independent_copy(tmp_path, monkeypatch):
+    path = tmp_path / "case.yaml"
+    path.write_text("config: {name: demo}\nsteps:\n  - open: {url: a}\n", encoding="utf-8")
+    monkeypatch.setattr(case_loader, "_default_cache", CaseCache(cache_dir=None))
+    case = case_loader.load_case(str(path))
+    case["steps"][0]["open"]["url"] = "changed"
+    case["config"]["name"] = "changed"
+    again = case_loader.load_case(str(path))
+    assert again["steps"][0]["open"]["url"] == "a"
+    assert again["config"]["name"] == "demo"
+
+
+def test_depends_resolved_relative_to_case(tmp_path, monkeypatch):
+    path = tmp_path / "sub" / "case.yaml"
+    path.parent.mkdir()
+    path.write_text("depends_on: [../login.yaml]\nsteps: []\n", encoding="utf-8")
+    monkeypatch.setattr(case_loader, "_default_cache", CaseCache(cache_dir=None))
+    depends = case_loader.load_depends(str(path))
+    assert depends == [os.path.normpath(str(tmp_path / "login.yaml"))]
+    depends.clear()
+    assert case_loader.load_depends(str(path))
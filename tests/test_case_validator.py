@@ -0,0 +1,87 @@
+# coding = utf-8
+import pytest
+from extend.keyword_registry import KeywordRegistry
+from utils.case_validator import check_config, check_css, check_xpath, validate_case, validate_files
+
+
+class FakeKeywords:
+    def __init__(self, driver, default_timeout=10):
+        self.driver = driver
+
+    def open_browser(self, 数据内容, **kwargs):
+        pass
+
+    def input_context(self, 定位方式, 目标对象, 数据内容, 清空=True, **kwargs):
+        pass
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    # 用例缓存写在临时目录中
+    monkeypatch.chdir(tmp_path)
+    return KeywordRegistry(FakeKeywords, plugin_dir=str(tmp_path / "other"))
+
+
+def _case(tmp_path, text, name="case.yaml"):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_valid_case_passes(tmp_path, registry):
+    path = _case(tmp_path, """
+title: 登录
+config: {screenshot: "every:2", step_retry: {attempts: 3, backoff: 0.5}, lean: {block_types: [font]}}
+steps:
+  - 打开首页: {关键字: open_browser, 数据内容: "https://example.com"}
+  - 输入用户名: {关键字: input_context, 定位方式: xpath, 目标对象: "//input[@id='user']", 数据内容: admin}
+""")
+    assert validate_case(path, registry) == []
+    assert validate_files([path], registry=registry) == {}
+
+
+def test_step_errors_come_from_keyword_signature(tmp_path, registry):
+    path = _case(tmp_path, """
+title: 登录
+steps:
+  - 打开首页: {关键字: open_brower, 数据内容: "https://example.com"}
+  - 输入用户名: {关键字: input_context, 定位方式: xpath, 目标对象: "//input["}
+  - 输入密码: {关键字: input_context, 定位方式: id, 目标对象: "", 数据内容: secret}
+""")
+    errors = validate_case(path, registry)
+    assert errors[0] == "第1步 打开首页: 关键字不存在: open_brower，是否是: open_browser"
+    assert "第2步 输入用户名: 缺少参数: 数据内容" in errors
+    assert any(e.startswith("第2步 输入用户名: XPath语法错误") for e in errors)
+    assert "第3步 输入密码: 参数为空: 目标对象" in errors
+
+
+@pytest.mark.parametrize("config, message", [
+    ({"screenshot": "sometimes"}, "config.screenshot"),
+    ({"screenshot": "every:x"}, "config.screenshot"),
+    ({"step_retry": -1}, "config.step_retry"),
+    ({"step_retry": {"attempts": 0}}, "config.step_retry.attempts"),
+    ({"step_retry": {"tries": 3}}, "config.step_retry不支持的字段"),
+    ({"lean": "yes please"}, "config.lean"),
+    ({"lean": {"block_types": ["video"]}}, "config.lean.block_types"),
+    ({"lean": {"page_load": "lazy"}}, "config.lean.page_load"),
+])
+def test_check_config_rejects_invalid_values(config, message):
+    errors = check_config(config)
+    assert len(errors) == 1 and errors[0].startswith(message)
+
+
+def test_check_config_accepts_documented_values():
+    assert check_config({"screenshot": "failure", "step_retry": True, "lean": True}) == []
+    assert check_config({"screenshot": 3, "step_retry": 0, "lean": {"page_load": "eager"}}) == []
+
+
+def test_depends_on_missing_file(tmp_path, registry):
+    path = _case(tmp_path, "title: a\ndepends_on: [missing.yaml]\nsteps:\n  - s: {关键字: open_browser, 数据内容: x}\n")
+    assert any(e.startswith("依赖文件不存在") for e in validate_case(path, registry))
+
+
+def test_locator_syntax():
+    assert check_xpath("//div[@id='a']") is None
+    assert check_xpath("//div[") is not None
+    assert check_css("div > a") is None
+    assert check_css("div >") is not None
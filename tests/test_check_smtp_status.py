@@ -0,0 +1,34 @@
+# coding = utf-8
+import pytest
+import check_smtp_status
+from check_smtp_status import latency_stats, percentile, run_probe
+
+
+@pytest.mark.parametrize("percent, expected", [(0, 1), (10, 1), (11, 2), (50, 5), (95, 10), (99, 10), (100, 10)])
+def test_percentile_nearest_rank(percent, expected):
+    assert percentile(list(range(10, 0, -1)), percent) == expected
+
+
+def test_percentile_edge_cases():
+    assert percentile([], 50) is None
+    assert percentile([3.14159], 99) == 3.14
+    # 20个样本时p95是第19个值，而不是插值
+    assert percentile(list(range(1, 21)), 95) == 19
+
+
+def test_latency_stats():
+    assert latency_stats([]) is None
+    assert latency_stats([4.0, 1.0, 3.0, 2.0]) == {"min": 1.0, "p50": 2.0, "p95": 4.0, "p99": 4.0, "max": 4.0}
+
+
+def test_run_probe_aggregates_results(monkeypatch):
+    results = iter([
+        {"connect_ms": 10.0, "ehlo_ms": 1.0, "auth_ms": None, "error": None},
+        {"connect_ms": 30.0, "ehlo_ms": 3.0, "auth_ms": None, "error": None},
+        {"connect_ms": None, "ehlo_ms": None, "auth_ms": None, "error": "timeout: timed out"},
+    ])
+    monkeypatch.setattr(check_smtp_status, "probe_once", lambda *args: next(results))
+    report = run_probe("smtp.example.com", 465, concurrency=3)
+    assert report["succeeded"] == 2 and report["failed"] == 1
+    assert report["connect_ms"]["p50"] == 10.0 and report["connect_ms"]["max"] == 30.0
+    assert report["auth_ms"] is None and report["errors"] == ["timeout: timed out"]
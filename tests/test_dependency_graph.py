@@ -0,0 +1,38 @@
+# coding = utf-8
+import os
+import pytest
+from types import SimpleNamespace
+from extend import dependency_graph
+from extend.dependency_graph import DependencyCycleError, DependencyGraph
+
+
+def test_memo_matches_relative_and_absolute_paths(tmp_path, monkeypatch):
+    (tmp_path / "login.yaml").write_text("steps: []\n", encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+    driver = SimpleNamespace(session_id="memo-session")
+    try:
+        dependency_graph.mark_executed(driver, "login.yaml")
+        assert dependency_graph.is_executed(driver, os.path.join(str(tmp_path), "login.yaml"))
+        # 内容变化后需要重新执行
+        (tmp_path / "login.yaml").write_text("steps: [1]\n", encoding="utf-8")
+        assert not dependency_graph.is_executed(driver, "login.yaml")
+    finally:
+        dependency_graph.clear_session(driver)
+
+
+def test_clear_session_forgets_executed(tmp_path):
+    path = str(tmp_path / "login.yaml")
+    (tmp_path / "login.yaml").write_text("steps: []\n", encoding="utf-8")
+    driver = SimpleNamespace(session_id="clear-session")
+    dependency_graph.mark_executed(driver, path)
+    dependency_graph.clear_session(driver)
+    assert not dependency_graph.is_executed(driver, path)
+
+
+def test_cycle_detected(tmp_path):
+    a, b = str(tmp_path / "a.yaml"), str(tmp_path / "b.yaml")
+    for path in (a, b):
+        open(path, 'w').close()
+    graph = DependencyGraph(read_depends={a: [b], b: [a]}.get)
+    with pytest.raises(DependencyCycleError):
+        graph.add(a)
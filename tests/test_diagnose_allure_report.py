@@ -0,0 +1,29 @@
+# coding = utf-8
+import json
+import zipfile
+from diagnose_allure_report import check_json_files, package_report, verify_zip
+
+
+def test_package_report_round_trip(tmp_path):
+    report = tmp_path / "report"
+    (report / "data").mkdir(parents=True)
+    (report / "index.html").write_text("<div class='spinner'></div>" * 100)
+    (report / "data" / "shot.png").write_bytes(b"\x89PNG" + bytes(range(256)))
+    zip_path = str(tmp_path / "report.zip")
+
+    stats = package_report(str(report), zip_path, workers=2)
+    assert stats["file_count"] == 2
+    with zipfile.ZipFile(zip_path) as zipf:
+        assert zipf.getinfo("index.html").compress_type == zipfile.ZIP_DEFLATED
+        assert zipf.getinfo("data/shot.png").compress_type == zipfile.ZIP_STORED
+    result = verify_zip(zip_path)
+    assert result["valid"] and result["spinner"] and result["members"] == 2
+
+
+def test_check_json_files(tmp_path):
+    good, bad = tmp_path / "good.json", tmp_path / "bad.json"
+    good.write_text(json.dumps({"a": 1}))
+    bad.write_text("{")
+    results = check_json_files([str(good), str(bad), str(tmp_path / "missing.json")])
+    assert [r["valid"] for r in results] == [True, False, False]
+    assert results[2]["error"] == "缺失"
@@ -0,0 +1,56 @@
+# coding = utf-8
+import os
+import sys
+from types import SimpleNamespace
+import pytest
+from extend.driver_cache import cached_driver_path, remember_driver
+
+pytestmark = pytest.mark.skipif(sys.platform.startswith("win"), reason="用shell脚本模拟浏览器和驱动")
+
+
+def _executable(path, output):
+    path.write_text(f"#!/bin/sh\necho '{output}'\n")
+    os.chmod(path, 0o755)
+    return str(path)
+
+
+@pytest.fixture
+def chrome(tmp_path, monkeypatch):
+    """本机Chrome为121版本，驱动缓存在临时目录中"""
+    monkeypatch.setenv("DRIVER_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("CHROME_BINARY", _executable(tmp_path / "chrome", "Google Chrome 121.0.6167.85"))
+    return tmp_path
+
+
+def _driver(path, browser_name="chrome", version="121.0.6167.85"):
+    return SimpleNamespace(service=SimpleNamespace(path=path),
+                           capabilities={"browserName": browser_name, "browserVersion": version})
+
+
+def test_remember_then_lookup_same_major(chrome):
+    driver_path = _executable(chrome / "chromedriver", "ChromeDriver 121.0.6167.85 (abc)")
+    remember_driver(_driver(driver_path))
+    cached = cached_driver_path("chrome")
+    assert cached and cached != driver_path and os.path.exists(cached)
+
+
+def test_major_version_mismatch_is_not_used(chrome, monkeypatch):
+    driver_path = _executable(chrome / "chromedriver", "ChromeDriver 121.0.6167.85 (abc)")
+    remember_driver(_driver(driver_path))
+    # 浏览器升级到122后，121的驱动不再匹配
+    monkeypatch.setenv("CHROME_BINARY", _executable(chrome / "chrome-new", "Google Chrome 122.0.6261.57"))
+    assert cached_driver_path("chrome") is None
+
+
+def test_driver_not_matching_browser_is_not_remembered(chrome):
+    driver_path = _executable(chrome / "chromedriver", "ChromeDriver 120.0.6099.109 (abc)")
+    remember_driver(_driver(driver_path))
+    assert cached_driver_path("chrome") is None
+
+
+@pytest.mark.parametrize("browser, browser_name", [("firefox", "firefox"), ("chrome", "MicrosoftEdge")])
+def test_other_browsers_are_not_remembered(chrome, browser, browser_name):
+    driver_path = _executable(chrome / "driver", "geckodriver 121.0.0")
+    remember_driver(_driver(driver_path, browser_name), browser)
+    assert cached_driver_path("chrome") is None
+    assert not os.path.exists(chrome / "cache" / "chrome")
@@ -0,0 +1,67 @@
+# coding = utf-8
+from extend.driver_pool import DriverPool
+from extend.fake_driver import FakeDriver
+
+
+class BrokenResetDriver(FakeDriver):
+    """重置时无法跳转about:blank的浏览器"""
+
+    def get(self, url):
+        raise RuntimeError("chrome not reachable")
+
+
+def _pool(factory=FakeDriver, **kwargs):
+    closed = []
+    pool = DriverPool(factory, on_close=closed.append, **kwargs)
+    return pool, closed
+
+
+def _cdp_commands(driver):
+    return [c["params"]["cmd"] for c in driver.trace() if c["command"] == "executeCdpCommand"]
+
+
+def test_release_then_acquire_reuses_driver():
+    pool, closed = _pool()
+    driver = pool.acquire()
+    pool.release(driver)
+    assert pool.acquire() is driver
+    assert closed == []
+
+
+def test_reset_clears_all_origins():
+    driver = FakeDriver()
+    driver.window_handles.append("window-1")
+    assert DriverPool.reset(driver)
+    assert _cdp_commands(driver) == ["Storage.clearDataForOrigin", "Network.clearBrowserCookies"]
+    clear = [c for c in driver.trace() if c["params"].get("cmd") == "Storage.clearDataForOrigin"][0]
+    assert clear["params"]["params"]["origin"] == "*"
+    assert driver.window_handles == ["window-0"]
+    assert driver.current_url == "about:blank"
+
+
+def test_max_reuse_recycles_driver():
+    pool, closed = _pool(max_reuse=2)
+    first = pool.acquire()
+    pool.release(first)
+    assert pool.acquire() is first
+    pool.release(first)
+    assert closed == [first]
+    assert pool.acquire() is not first
+
+
+def test_failed_reset_evicts_driver():
+    pool, closed = _pool(factory=BrokenResetDriver)
+    driver = pool.acquire()
+    pool.release(driver)
+    assert closed == [driver]
+    assert pool.acquire() is not driver
+
+
+def test_extra_idle_drivers_are_closed():
+    pool, closed = _pool(max_size=1)
+    first, second = pool.acquire(), pool.acquire()
+    pool.release(first)
+    pool.release(second)
+    assert closed == [second]
+    pool.close_all()
+    assert closed == [second, first]
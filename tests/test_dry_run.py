@@ -0,0 +1,59 @@
+# coding = utf-8
+import os
+import sys
+import time
+import types
+from extend import dry_run
+from extend.keyword_registry import KeywordRegistry
+
+KEYWORDS_SOURCE = '''
+import time
+from time import sleep
+
+
+class Keywords:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def wait_sleep(self, 数据内容):
+        time.sleep(float(数据内容))
+
+    def pause(self, 数据内容):
+        sleep(float(数据内容))
+'''
+
+
+def _keywords_module():
+    module = types.ModuleType("dry_run_test_keywords")
+    exec(KEYWORDS_SOURCE, module.__dict__)
+    sys.modules[module.__name__] = module
+    return module
+
+
+def test_only_keyword_module_sleep_is_patched(tmp_path):
+    module = _keywords_module()
+    registry = KeywordRegistry(module.Keywords, plugin_dir=str(tmp_path))
+    real_sleep = time.sleep
+    with dry_run.DryRun(registry) as run:
+        keywords = module.Keywords(run.driver)
+        start = time.perf_counter()
+        registry.bind(registry.resolve("wait_sleep"), keywords)(数据内容="5")
+        registry.bind(registry.resolve("pause"), keywords)(数据内容="5")
+        assert time.perf_counter() - start < 1
+        assert time.sleep is real_sleep
+        assert dry_run.is_active()
+    assert module.time is time and module.sleep is real_sleep
+    assert not dry_run.is_active()
+    commands = [(call["command"], call["params"]) for call in run.driver.trace()]
+    assert commands == [("keyword", {"name": "wait_sleep", "数据内容": "5"}), ("sleep", {"seconds": 5.0}),
+                        ("keyword", {"name": "pause", "数据内容": "5"}), ("sleep", {"seconds": 5.0})]
+
+
+def test_trace_path_keeps_relative_directories(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    first = dry_run.trace_path("traces", os.path.join("examples", "a", "login.yaml"))
+    second = dry_run.trace_path("traces", os.path.join("examples", "b", "login.yaml"))
+    assert first == os.path.join("traces", "examples", "a", "login.trace.json")
+    assert first != second
+    outside = dry_run.trace_path("traces", os.path.join(os.path.dirname(str(tmp_path)), "x.yaml"))
+    assert outside.startswith("traces") and outside.endswith("x.trace.json")
@@ -0,0 +1,74 @@
+# coding = utf-8
+import csv
+import json
+from utils import incremental_report
+from utils.incremental_report import merge_csv, merge_list, merge_tree, merge_trend
+
+
+def test_merge_tree_replaces_rerun_case():
+    old = {"children": [{"name": "suite", "children": [{"name": "login", "uid": "old", "status": "failed"}]}]}
+    new = {"children": [{"name": "suite", "children": [{"name": "login", "uid": "new", "status": "passed"}]}]}
+    replaced = set()
+    merged = merge_tree(old, new, replaced)
+    assert replaced == {"old"}
+    assert merged["children"][0]["children"] == [{"name": "login", "uid": "new", "status": "passed"}]
+
+
+def test_merge_list_dedupes_entries_without_uid():
+    old = [{"name": "browser", "values": ["chrome"]}, {"uid": "a"}, {"uid": "b"}]
+    new = [{"name": "browser", "values": ["firefox"]}, {"uid": "c"}]
+    assert merge_list(old, new, {"b"}) == [{"name": "browser", "values": ["firefox"]}, {"uid": "a"}, {"uid": "c"}]
+    assert merge_list([{"type": "local"}], [{"type": "local"}], set()) == [{"type": "local"}]
+
+
+def _write_csv(path, rows):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows(rows)
+
+
+def test_merge_csv_keeps_latest_row_per_case(tmp_path):
+    header = ["Status", "Duration in ms", "Suite", "Name"]
+    old, new = tmp_path / "old.csv", tmp_path / "new.csv"
+    _write_csv(old, [header, ["failed", "10", "s", "login"], ["passed", "5", "s", "search"]])
+    _write_csv(new, [header, ["passed", "12", "s", "login"]])
+    merge_csv(str(old), str(new))
+    with open(old, encoding='utf-8', newline='') as f:
+        rows = list(csv.reader(f))
+    assert rows == [header, ["passed", "12", "s", "login"], ["passed", "5", "s", "search"]]
+
+
+def test_state_pruned_to_existing_results(tmp_path, monkeypatch):
+    results, report = tmp_path / "results", tmp_path / "report"
+    results.mkdir()
+    report.mkdir()
+    (report / "index.html").write_text("", encoding="utf-8")
+    (results / "b-result.json").write_text("{}", encoding="utf-8")
+    (report / incremental_report.STATE_FILE).write_text(json.dumps({"processed": ["a-result.json", "b-result.json"]}))
+    monkeypatch.setattr(incremental_report, "run_allure_generate", lambda *args: 1)
+    assert incremental_report.generate_report(str(results), str(report), incremental=True) == 0
+    assert incremental_report._load_state(str(report)) == {"processed": ["b-result.json"]}
+
+
+def test_merge_same_stage_twice_is_stable(tmp_path):
+    partial, report = tmp_path / "partial", tmp_path / "report"
+    (partial / "widgets").mkdir(parents=True)
+    (report / "widgets").mkdir(parents=True)
+    old_trend = [{"data": {"duration": 100}}, {"buildOrder": 1, "data": {"duration": 90}}]
+    new_trend = [{"data": {"duration": 120}}, {"buildOrder": 1, "data": {"duration": 90}}]
+    (report / "widgets" / "duration-trend.json").write_text(json.dumps(old_trend))
+    (partial / "widgets" / "duration-trend.json").write_text(json.dumps(new_trend))
+    (partial / "widgets" / "environment.json").write_text(json.dumps([{"name": "browser", "values": ["chrome"]}]))
+
+    incremental_report.merge_report(str(partial), str(report))
+    first = {f.name: f.read_text() for f in (report / "widgets").iterdir()}
+    incremental_report.merge_report(str(partial), str(report))
+    second = {f.name: f.read_text() for f in (report / "widgets").iterdir()}
+    assert first == second
+    assert json.loads(second["duration-trend.json"]) == new_trend
+
+
+def test_merge_trend_keeps_builds_only_in_old_report():
+    old = [{"data": {"duration": 1}}, {"buildOrder": 2, "data": {}}, {"buildOrder": 1, "data": {}}]
+    new = [{"data": {"duration": 2}}, {"buildOrder": 2, "data": {}}]
+    assert merge_trend(old, new) == [{"data": {"duration": 2}}, {"buildOrder": 2, "data": {}},
+                                     {"buildOrder": 1, "data": {}}]
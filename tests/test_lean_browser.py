@@ -0,0 +1,63 @@
+# coding = utf-8
+from extend import lean_browser
+from extend.fake_driver import FakeDriver
+from extend.lean_browser import DEFAULT_BLOCKED_URLS, apply, blocked_patterns, lean_config
+
+
+def _blocked_urls(driver):
+    return [c["params"]["params"]["urls"] for c in driver.trace()
+            if c["params"].get("cmd") == "Network.setBlockedURLs"]
+
+
+def test_default_patterns_cover_fonts_and_media():
+    patterns = blocked_patterns({})
+    assert patterns[:len(DEFAULT_BLOCKED_URLS)] == list(DEFAULT_BLOCKED_URLS)
+    assert "*.woff2" in patterns and "*.woff2?*" in patterns and "*.mp4" in patterns
+    assert "*.png" not in patterns
+
+
+def test_custom_patterns_are_deduplicated():
+    patterns = blocked_patterns({"block_urls": ["*cdn.example.com*", "*hotjar.com*"],
+                                 "block_types": ["image", "IMAGE", "unknown"]})
+    assert patterns.count("*hotjar.com*") == 1 and "*cdn.example.com*" in patterns
+    assert patterns.count("*.png") == 1 and "*.woff" not in patterns
+    assert blocked_patterns({"block_types": []}) == list(DEFAULT_BLOCKED_URLS)
+
+
+def test_lean_config_sources(monkeypatch):
+    monkeypatch.delenv(lean_browser.LEAN_BROWSER_ENV, raising=False)
+    assert lean_config({}) is None
+    assert lean_config({"lean": True}) == {}
+    assert lean_config({"lean": {"block_types": ["font"]}}) == {"block_types": ["font"]}
+    monkeypatch.setenv(lean_browser.LEAN_BROWSER_ENV, "1")
+    assert lean_config({}) == {} and lean_config({"lean": False}) is None
+
+
+def test_apply_switches_rules_on_reused_driver(monkeypatch):
+    monkeypatch.delenv(lean_browser.LEAN_BROWSER_ENV, raising=False)
+    driver = FakeDriver()
+    # 未开启精简模式的浏览器不发送任何CDP命令
+    assert apply(driver, {}) == 0 and _blocked_urls(driver) == []
+
+    count = apply(driver, {"lean": True})
+    assert count == len(blocked_patterns({}))
+    # 规则未变化时不重复设置
+    assert apply(driver, {"lean": True}) == count and len(_blocked_urls(driver)) == 1
+
+    apply(driver, {"lean": {"block_types": ["image"]}})
+    assert "*.png" in _blocked_urls(driver)[-1]
+
+    # 下一个用例未开启精简模式时清除规则
+    assert apply(driver, {}) == 0
+    assert _blocked_urls(driver)[-1] == [] and len(_blocked_urls(driver)) == 3
+    assert apply(driver, {}) == 0 and len(_blocked_urls(driver)) == 3
+
+
+def test_apply_failure_leaves_rules_unrecorded():
+    class BrokenDriver(FakeDriver):
+        def execute_cdp_cmd(self, cmd, cmd_args):
+            raise RuntimeError("cdp unavailable")
+
+    driver = BrokenDriver()
+    assert apply(driver, {"lean": True}) == 0
+    assert not getattr(driver, "_lean_blocked", None)
@@ -0,0 +1,155 @@
+# coding = utf-8
+import os
+import json
+import socket
+import smtplib
+import threading
+import pytest
+from utils import mail_queue
+from utils.mail_queue import MailQueue, SMTPDelivery, _is_transient, build_message, drain
+
+
+@pytest.mark.parametrize("error, transient", [
+    (smtplib.SMTPAuthenticationError(535, b"authentication failed"), False),
+    (smtplib.SMTPSenderRefused(550, b"sender rejected", "a@example.com"), False),
+    (smtplib.SMTPDataError(554, b"message rejected"), False),
+    (smtplib.SMTPDataError(451, b"try again later"), True),
+    (smtplib.SMTPConnectError(421, b"too many connections"), True),
+    (smtplib.SMTPConnectError(554, b"no service"), False),
+    (smtplib.SMTPRecipientsRefused({"a@example.com": (550, b"no such user")}), False),
+    (smtplib.SMTPRecipientsRefused({"a@example.com": (450, b"mailbox busy"),
+                                    "b@example.com": (550, b"no such user")}), True),
+    (smtplib.SMTPRecipientsRefused({}), False),
+    (smtplib.SMTPServerDisconnected("connection closed"), True),
+    (smtplib.SMTPNotSupportedError("no STARTTLS"), False),
+    (socket.timeout("timed out"), True),
+    (ConnectionRefusedError(111, "refused"), True),
+    (ValueError("bad address"), False),
+])
+def test_is_transient(error, transient):
+    assert _is_transient(error) is transient
+
+
+class SMTPStandIn:
+    """
+    本地SMTP测试服务器：依次处理连接，记录收到的邮件
+
+    参数:
+        data_replies: 依次用于DATA结束后的响应，用完后返回250
+        rcpt_replies: 收件人 -> RCPT TO 的响应，未配置的收件人返回250
+    """
+
+    def __init__(self, data_replies=(), rcpt_replies=None):
+        self.data_replies = list(data_replies)
+        self.rcpt_replies = rcpt_replies or {}
+        self.connections = 0
+        self.messages = []
+        self._sock = socket.socket()
+        self._sock.bind(("127.0.0.1", 0))
+        self._sock.listen()
+        self.port = self._sock.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def close(self):
+        self._sock.close()
+
+    def _serve(self):
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            self.connections += 1
+            with conn, conn.makefile('rb') as reader:
+                self._session(conn, reader)
+
+    def _session(self, conn, reader):
+        conn.sendall(b"220 localhost ESMTP\r\n")
+        recipients = []
+        for line in reader:
+            command = line.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                reply = "250 localhost"
+            elif verb == "MAIL":
+                recipients = []
+                reply = "250 OK"
+            elif verb == "RCPT":
+                address = command.split("<", 1)[1].split(">", 1)[0]
+                reply = self.rcpt_replies.get(address, "250 OK")
+                if reply.startswith("250"):
+                    recipients.append(address)
+            elif verb == "DATA":
+                conn.sendall(b"354 end with .\r\n")
+                data = b"".join(iter(lambda: reader.readline(), b".\r\n"))
+                reply = self.data_replies.pop(0) if self.data_replies else "250 OK"
+                if reply.startswith("250"):
+                    self.messages.append((recipients, data))
+            elif verb == "QUIT":
+                conn.sendall(b"221 bye\r\n")
+                return
+            else:
+                reply = "250 OK"
+            conn.sendall(f"{reply}\r\n".encode())
+
+
+@pytest.fixture
+def smtp_server():
+    servers = []
+
+    def start(**kwargs):
+        servers.append(SMTPStandIn(**kwargs))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.close()
+
+
+def _drain(tmp_path, server, recipients_list, monkeypatch, max_attempts=3):
+    sleeps = []
+    monkeypatch.setattr(mail_queue.time, "sleep", sleeps.append)
+    queue = MailQueue(str(tmp_path / "queue"))
+    for recipients in recipients_list:
+        queue.enqueue(build_message("ci@example.com", recipients, "report", "body"), recipients)
+    delivery = SMTPDelivery("127.0.0.1", server.port, use_ssl=False, timeout=5)
+    result = drain(queue, delivery, "ci@example.com", max_attempts=max_attempts, backoff=1.0)
+    return queue, result, sleeps
+
+
+def test_drain_reuses_one_connection(tmp_path, smtp_server, monkeypatch):
+    server = smtp_server()
+    recipients = [["a@example.com"], ["b@example.com"], ["c@example.com"]]
+    queue, result, sleeps = _drain(tmp_path, server, recipients, monkeypatch)
+    assert result == (3, 0)
+    assert server.connections == 1
+    assert [r for r, _ in server.messages] == recipients
+    assert queue.pending() == [] and sleeps == []
+
+
+def test_drain_retries_transient_failure_with_backoff(tmp_path, smtp_server, monkeypatch):
+    server = smtp_server(data_replies=["451 try again later", "451 try again later"])
+    queue, result, sleeps = _drain(tmp_path, server, [["a@example.com"]], monkeypatch)
+    assert result == (1, 0)
+    assert sleeps == [1.0, 2.0]
+    assert len(server.messages) == 1
+
+
+def test_drain_moves_permanent_failure_to_failed(tmp_path, smtp_server, monkeypatch):
+    server = smtp_server(data_replies=["554 message rejected"])
+    queue, result, sleeps = _drain(tmp_path, server, [["a@example.com"], ["b@example.com"]], monkeypatch)
+    assert result == (1, 1)
+    assert sleeps == []
+    assert len(os.listdir(queue.failed_dir)) == 2
+    assert [r for r, _ in server.messages] == [["b@example.com"]]
+
+
+def test_drain_retries_only_refused_recipients(tmp_path, smtp_server, monkeypatch):
+    server = smtp_server(rcpt_replies={"b@example.com": "550 no such user"})
+    queue, result, sleeps = _drain(tmp_path, server, [["a@example.com", "b@example.com"]], monkeypatch)
+    assert result == (0, 1)
+    # 已接受的收件人只投递一次，被永久拒绝的收件人记录在 failed/ 的元数据中
+    assert [r for r, _ in server.messages] == [["a@example.com"]]
+    meta_file = [f for f in os.listdir(queue.failed_dir) if f.endswith(".json")][0]
+    with open(os.path.join(queue.failed_dir, meta_file), encoding='utf-8') as f:
+        assert json.load(f)["recipients"] == ["b@example.com"]
@@ -0,0 +1,73 @@
+# coding = utf-8
+import sys
+from concurrent.futures import Future
+import pytest
+from extend import ocr_pipeline
+from extend.ocr_pipeline import OcrCache, OcrPipeline, TesseractPool, image_key
+
+
+class FakePool:
+    lang = "eng"
+    config = "--psm 7"
+
+    def __init__(self, texts):
+        self.texts = list(texts)
+        self.submitted = 0
+
+    def submit(self, image):
+        self.submitted += 1
+        future = Future()
+        future.set_result(self.texts.pop(0))
+        return future
+
+
+@pytest.fixture(autouse=True)
+def no_preprocess(monkeypatch):
+    monkeypatch.setattr(ocr_pipeline, "preprocess", lambda data: data)
+
+
+def test_cache_memory_and_disk(tmp_path):
+    cache = OcrCache(cache_dir=str(tmp_path), size=1)
+    cache.put("a" * 40, "AB12")
+    cache.put("b" * 40, "CD34")
+    # 内存中只保留一条，较早的结果从磁盘读取
+    assert cache.get("a" * 40) == "AB12"
+    cache.invalidate("a" * 40)
+    assert cache.get("a" * 40) is None
+    assert OcrCache(cache_dir=str(tmp_path)).get("b" * 40) == "CD34"
+
+
+def test_key_depends_on_config():
+    assert image_key(b"png") != image_key(b"png", config="--psm 8")
+
+
+def test_empty_results_are_not_cached():
+    pool = FakePool(["", "XY9Z"])
+    pipeline = OcrPipeline(pool, OcrCache(cache_dir=None))
+    assert pipeline.recognize(b"img") == ""
+    assert pipeline.recognize(b"img") == "XY9Z"
+    assert pipeline.recognize(b"img") == "XY9Z"
+    assert pool.submitted == 2
+
+
+def test_invalidate_forces_new_recognition():
+    pool = FakePool(["WR0NG", "RIGHT"])
+    pipeline = OcrPipeline(pool, OcrCache(cache_dir=None))
+    assert pipeline.recognize(b"img") == "WR0NG"
+    pipeline.invalidate(b"img")
+    assert pipeline.recognize(b"img") == "RIGHT"
+
+
+def test_tesseract_timeout_fails_the_whole_batch(tmp_path):
+    script = tmp_path / "slow.py"
+    script.write_text("import time\ntime.sleep(10)\n", encoding="utf-8")
+    pool = TesseractPool(workers=1, batch_window=0.2, timeout=0.5)
+    pool.cmd = sys.executable
+    pool._recognize = lambda images: [pool._run(str(script)) for _ in images]
+    try:
+        futures = [pool.submit(b"1"), pool.submit(b"2")]
+        for future in futures:
+            with pytest.raises(TimeoutError):
+                future.result(timeout=5)
+    finally:
+        pool.close()
@@ -0,0 +1,47 @@
+# coding = utf-8
+from extend import page_metrics
+from extend.fake_driver import FakeDriver
+
+
+class NavigatingDriver(FakeDriver):
+    """execute_script 返回可控的 timeOrigin，execute_async_script 返回页面计时"""
+
+    def __init__(self):
+        super().__init__()
+        self.origin = 1000.0
+
+    def execute_script(self, script, *args):
+        super().execute_script(script, *args)
+        return self.origin
+
+    def execute_async_script(self, script, *args):
+        super().execute_async_script(script, *args)
+        return {"url": "http://example.com", "time_origin": self.origin, "ttfb": 10, "load": 100,
+                "dom_content_loaded": 50, "transfer_size": 1, "lcp": 80}
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delenv(page_metrics.PAGE_METRICS_ENV, raising=False)
+    assert not page_metrics.is_enabled()
+    assert page_metrics.is_enabled({"page_metrics": True})
+    monkeypatch.setenv(page_metrics.PAGE_METRICS_ENV, "1")
+    assert page_metrics.is_enabled()
+    assert not page_metrics.is_enabled({"page_metrics": False})
+
+
+def test_first_click_only_records_baseline():
+    driver = NavigatingDriver()
+    assert page_metrics.after_step(driver, "option_click") is None
+    assert page_metrics.latest(driver) is None
+    # 同一页面内的点击不采集
+    assert page_metrics.after_step(driver, "option_click") is None
+    driver.origin = 2000.0
+    metrics = page_metrics.after_step(driver, "option_click")
+    assert metrics["load"] == 100 and metrics["trigger"] == "option_click"
+    assert page_metrics.after_step(driver, "option_click") is None
+
+
+def test_navigation_keywords_always_collect():
+    driver = NavigatingDriver()
+    assert page_metrics.after_step(driver, "open_browser")["trigger"] == "open_browser"
+    assert page_metrics.after_step(driver, "input_context") is None
@@ -0,0 +1,40 @@
+# coding = utf-8
+import os
+from types import SimpleNamespace
+from utils.parallel_runner import (FailFast, partition_cases, read_yaml_list, select_items,
+                                   write_yaml_list)
+
+
+def _item(yaml_file):
+    return SimpleNamespace(callspec=SimpleNamespace(params={"yaml_file": yaml_file}))
+
+
+def test_partition_cases_round_robin():
+    assert partition_cases(["a", "b", "c"], 2) == [["a", "c"], ["b"]]
+    assert partition_cases(["a"], 4) == [["a"]]
+
+
+def test_select_items_follows_list_order(tmp_path):
+    list_path = write_yaml_list(["cases/b.yaml", "cases/a.yaml"], str(tmp_path / "list.txt"))
+    a, b, c = _item("cases/a.yaml"), _item("cases/b.yaml"), _item("cases/c.yaml")
+    selected, deselected = select_items([a, b, c, SimpleNamespace()], read_yaml_list(list_path))
+    assert selected == [b, a]
+    assert len(deselected) == 2
+    assert read_yaml_list(list_path)[0] == os.path.abspath("cases/b.yaml")
+
+
+def test_fail_fast_shared_through_file(tmp_path):
+    path = str(tmp_path / "failures")
+    first, second = FailFast(2, path), FailFast(2, path)
+    first.record_failure()
+    assert not second.stopped
+    second.record_failure()
+    assert first.stopped and first.failures == 2
+
+
+def test_fail_fast_from_env(monkeypatch, tmp_path):
+    monkeypatch.delenv("FAIL_FAST_FILE", raising=False)
+    assert FailFast.from_env() is None
+    monkeypatch.setenv("FAIL_FAST_FILE", str(tmp_path / "failures"))
+    monkeypatch.setenv("FAIL_FAST_LIMIT", "3")
+    assert FailFast.from_env().limit == 3
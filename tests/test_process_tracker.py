@@ -0,0 +1,30 @@
+# coding = utf-8
+import os
+import sys
+import subprocess
+import pytest
+from extend import process_tracker
+
+
+@pytest.mark.skipif(sys.platform.startswith('win'), reason="需要类Unix系统")
+def test_descendants_without_psutil(monkeypatch):
+    monkeypatch.setattr(process_tracker, "psutil", None)
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+    try:
+        assert child.pid in process_tracker._descendants(os.getpid())
+        assert process_tracker._is_same_process(child.pid, process_tracker._start_time(child.pid))
+    finally:
+        child.kill()
+        child.wait()
+    assert not process_tracker._is_same_process(child.pid, None)
+
+
+def test_windows_without_psutil_kills_tree_by_driver_pid(monkeypatch):
+    calls = []
+    monkeypatch.setattr(process_tracker, "psutil", None)
+    monkeypatch.setattr(process_tracker.sys, "platform", "win32")
+    monkeypatch.setattr(process_tracker.subprocess, "run",
+                        lambda cmd, **kwargs: calls.append(cmd) or subprocess.CompletedProcess(cmd, 0))
+    entry = {"processes": [[1234, None], [1240, None]], "pgid": None}
+    assert process_tracker._terminate_entry(entry, timeout=1) == 2
+    assert calls == [["taskkill", "/t", "/f", "/pid", "1234"]]
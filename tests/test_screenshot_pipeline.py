@@ -0,0 +1,63 @@
+# coding = utf-8
+import threading
+import pytest
+from extend.screenshot_pipeline import ScreenshotPipeline, parse_policy
+
+
+class FakeKeywords:
+    def __init__(self):
+        self.shots = 0
+
+    def jietu(self, *args, **kwargs):
+        self.shots += 1
+
+    def click(self):
+        # 关键字内部的自动截图
+        self.jietu()
+
+
+def test_parse_policy():
+    assert parse_policy(None) == (None, 0)
+    assert parse_policy("failure") == ("failure", 1)
+    assert parse_policy("every:3") == ("every", 3)
+    assert parse_policy(2) == ("every", 2)
+    with pytest.raises(ValueError):
+        parse_policy("sometimes")
+
+
+def test_take_over_suppresses_keyword_screenshots():
+    keywords = FakeKeywords()
+    pipeline = ScreenshotPipeline("failure")
+    pipeline.take_over(keywords)
+    keywords.click()
+    # 显式的jietu步骤按类上的方法绑定执行
+    FakeKeywords.jietu.__get__(keywords)()
+    pipeline.close()
+    assert keywords.shots == 1
+    keywords.click()
+    assert keywords.shots == 2
+    assert "jietu" not in vars(keywords)
+
+
+def test_failure_frames_wait_for_full_queue():
+    from extend.fake_driver import FakeDriver
+    pipeline = ScreenshotPipeline("every", queue_size=1)
+    release, started, processed = threading.Event(), threading.Event(), []
+
+    def slow_process(png, name, item, dedupe):
+        started.set()
+        release.wait(5)
+        processed.append(name)
+
+    pipeline._process = slow_process
+    driver = FakeDriver()
+    assert pipeline.capture(driver, "step-1")
+    started.wait(5)
+    assert pipeline.capture(driver, "step-2")
+    # 队列已满：步骤截图被丢弃，失败截图等待队列空出
+    assert not pipeline.capture(driver, "step-3")
+    threading.Timer(0.05, release.set).start()
+    pipeline.after_step(driver, "step-4", failed=True)
+    pipeline.close()
+    assert pipeline.dropped == 1
+    assert processed == ["step-1", "step-2", "step-4-失败"]
@@ -0,0 +1,81 @@
+# coding = utf-8
+import os
+import stat
+import time
+import pytest
+from extend.fake_driver import FakeDriver
+from extend.session_cache import SessionCache, is_enabled
+
+LOGIN_URL = "https://example.com/login"
+HOME_URL = "https://example.com/home"
+
+
+class LoggedOutDriver(FakeDriver):
+    """网站已使会话退出登录：打开任何页面都被重定向回登录页"""
+
+    def get(self, url):
+        super().get(url)
+        self.current_url = LOGIN_URL
+
+
+def _cache(tmp_path, ttl=60):
+    return SessionCache(LOGIN_URL, cache_dir=str(tmp_path / "cache"), ttl=ttl)
+
+
+def _logged_in_driver():
+    driver = FakeDriver()
+    driver.current_url = HOME_URL
+    driver._cookies = [{"name": "sid", "value": "abc", "domain": "example.com", "path": "/", "expires": -1}]
+    return driver
+
+
+def test_disabled_by_default(monkeypatch):
+    monkeypatch.delenv("SESSION_CACHE", raising=False)
+    assert not is_enabled({"type": "login"})
+    monkeypatch.setenv("SESSION_CACHE", "1")
+    assert is_enabled({"type": "login"})
+    assert not is_enabled({"type": "login", "session_cache": False})
+
+
+def test_restore_injects_cached_state(tmp_path):
+    cache = _cache(tmp_path)
+    assert cache.save(_logged_in_driver(), "user")
+    assert stat.S_IMODE(os.stat(cache._path("user")).st_mode) == 0o600
+
+    driver = FakeDriver()
+    assert cache.restore(driver, "user")
+    assert driver.current_url == HOME_URL
+    set_cookies = [c for c in driver.trace() if c["params"].get("cmd") == "Network.setCookies"]
+    # 会话cookie的expires不传回
+    assert set_cookies[0]["params"]["params"]["cookies"] == [
+        {"name": "sid", "value": "abc", "domain": "example.com", "path": "/"}]
+
+
+def test_failed_restore_invalidates_and_logs_in(tmp_path):
+    cache = _cache(tmp_path)
+    cache.save(_logged_in_driver(), "user")
+
+    logins = []
+    assert not cache.ensure_login(LoggedOutDriver(), "user", lambda: logins.append("user"))
+    assert logins == ["user"]
+    # 重定向回登录页后不保存新的缓存，旧缓存已删除
+    assert not os.path.exists(cache._path("user"))
+
+
+def test_expired_cache_is_removed(tmp_path):
+    cache = _cache(tmp_path, ttl=60)
+    cache.save(_logged_in_driver(), "user")
+    path = cache._path("user")
+    assert cache.load("user") is not None
+
+    cache.ttl = 0
+    time.sleep(0.01)
+    assert cache.load("user") is None
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize("url", [LOGIN_URL, LOGIN_URL + "?next=/home"])
+def test_not_saved_on_login_page(tmp_path, url):
+    driver = _logged_in_driver()
+    driver.current_url = url
+    assert not _cache(tmp_path).save(driver, "user")
@@ -0,0 +1,48 @@
+# coding = utf-8
+import os
+import pytest
+from utils.case_history import CaseHistory
+from utils.sharding import assign_shards, dependency_chain, parse_shard, select_shard
+
+
+def _write(path, depends=()):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    lines = ["title: case"]
+    if depends:
+        lines.append("depends_on: [" + ", ".join(depends) + "]")
+    lines.append("steps: []")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    for spec in ("0/2", "3/2", "a/b", "1"):
+        with pytest.raises(ValueError):
+            parse_shard(spec)
+
+
+def test_shared_login_cases_spread_across_shards(tmp_path):
+    _write(tmp_path / "common" / "login.yaml")
+    cases = [_write(tmp_path / "cases" / f"case{i}.yaml", ["../common/login.yaml"]) for i in range(6)]
+    shards = assign_shards(cases, 3, CaseHistory(str(tmp_path / "history.json")))
+    assert [len(shard) for shard in shards] == [2, 2, 2]
+    assert sorted(f for shard in shards for f in shard) == sorted(cases)
+
+
+def test_dependency_chain_uses_absolute_paths(tmp_path, monkeypatch):
+    login = _write(tmp_path / "login.yaml")
+    _write(tmp_path / "menu.yaml", ["login.yaml"])
+    case = _write(tmp_path / "sub" / "case.yaml", ["../menu.yaml", "../login.yaml"])
+    monkeypatch.chdir(tmp_path)
+    chain = dependency_chain(os.path.join("sub", "case.yaml"))
+    assert sorted(chain) == sorted([os.path.abspath(login), os.path.join(str(tmp_path), "menu.yaml")])
+    assert dependency_chain(case) == chain
+
+
+def test_shards_do_not_overlap_and_are_deterministic(tmp_path):
+    cases = [_write(tmp_path / f"case{i}.yaml") for i in range(7)]
+    history = CaseHistory(str(tmp_path / "history.json"))
+    selected = [select_shard(cases, f"{i}/3", history) for i in range(1, 4)]
+    assert sorted(f for shard in selected for f in shard) == sorted(cases)
+    assert selected == [select_shard(cases, f"{i}/3", history) for i in range(1, 4)]
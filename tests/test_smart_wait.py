@@ -0,0 +1,86 @@
+# coding = utf-8
+import json
+import pytest
+from extend import smart_wait
+from extend.fake_driver import FakeDriver
+from extend.smart_wait import SmartWaitStats, is_enabled, is_quiescent, smart_sleep, write_report
+
+QUIET = {"ready": "complete", "pending": 0, "idle": 1000}
+
+
+class ScriptedDriver(FakeDriver):
+    """依次返回给定的页面状态，用完后保持最后一个状态"""
+
+    def __init__(self, *states):
+        super().__init__()
+        self.states = list(states)
+        self.checks = 0
+
+    def execute_script(self, script, *args):
+        self.checks += 1
+        state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        if isinstance(state, Exception):
+            raise state
+        return state
+
+
+@pytest.fixture(autouse=True)
+def fresh_stats(monkeypatch):
+    monkeypatch.setattr(smart_wait, "stats", SmartWaitStats())
+    monkeypatch.setattr(smart_wait, "POLL_INTERVAL", 0.001)
+
+
+@pytest.mark.parametrize("state, quiet", [
+    (QUIET, True),
+    (dict(QUIET, ready="interactive"), False),
+    (dict(QUIET, pending=1), False),
+    (dict(QUIET, idle=100), False),
+])
+def test_is_quiescent(state, quiet):
+    assert is_quiescent(ScriptedDriver(state)) is quiet
+
+
+def test_script_error_counts_as_busy():
+    assert not is_quiescent(ScriptedDriver(RuntimeError("navigating")))
+
+
+def test_returns_once_page_settles():
+    driver = ScriptedDriver(dict(QUIET, pending=2), RuntimeError("navigating"), QUIET)
+    actual = smart_sleep(driver, 5)
+    assert driver.checks == 3
+    assert actual < 1
+    assert smart_wait.stats.waits == 1 and smart_wait.stats.saved > 4
+
+
+def test_configured_time_is_upper_bound():
+    actual = smart_sleep(ScriptedDriver(dict(QUIET, pending=1)), 0.05)
+    assert 0.05 <= actual < 1
+    assert smart_wait.stats.saved < 0.05
+
+
+def test_instrumented_once_per_session():
+    driver = ScriptedDriver(QUIET)
+    smart_sleep(driver, 1)
+    smart_sleep(driver, 1)
+    cdp = [c for c in driver.trace() if c["params"].get("cmd") == "Page.addScriptToEvaluateOnNewDocument"]
+    assert len(cdp) == 1
+
+
+def test_saved_time_accounting(tmp_path):
+    stats = SmartWaitStats()
+    stats.record(5, 1.5)
+    stats.record(2, 2.5)  # 轮询略微超出配置时间
+    assert stats.summary() == {"waits": 2, "configured_seconds": 7.0, "actual_seconds": 4.0, "saved_seconds": 3.0}
+
+    path = tmp_path / "report.jsonl"
+    assert write_report(str(path)) is None
+    smart_wait.stats.record(3, 1)
+    write_report(str(path))
+    assert json.loads(path.read_text(encoding="utf-8"))["saved_seconds"] == 2.0
+
+
+def test_config_overrides_environment(monkeypatch):
+    monkeypatch.setenv("SMART_WAIT", "1")
+    assert is_enabled({}) and not is_enabled({"smart_wait": False})
+    monkeypatch.delenv("SMART_WAIT")
+    assert not is_enabled() and is_enabled({"smart_wait": True})
@@ -0,0 +1,69 @@
+# coding = utf-8
+import pytest
+from extend import step_retry
+from extend.step_retry import RetryPolicy, is_transient, policy_for, run_step
+
+
+class StaleElementReferenceException(Exception):
+    pass
+
+
+class TimeoutException(Exception):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def no_env(monkeypatch):
+    monkeypatch.delenv(step_retry.STEP_RETRY_ENV, raising=False)
+    monkeypatch.setattr(step_retry.time, "sleep", lambda seconds: None)
+
+
+def test_policy_defaults_to_no_retry():
+    assert policy_for().attempts == 1
+    assert policy_for({}).attempts == 1
+
+
+@pytest.mark.parametrize("value, attempts", [
+    (3, 3), ("2", 2), (True, 3), ("on", 3), (False, 1), ("off", 1), (0, 1), ("bogus", 1),
+    ({"backoff": 1}, 3), ({"attempts": 5, "backoff": 0.1}, 5),
+])
+def test_policy_from_config(value, attempts):
+    assert policy_for({"step_retry": value}).attempts == attempts
+
+
+def test_policy_from_env(monkeypatch):
+    monkeypatch.setenv(step_retry.STEP_RETRY_ENV, "4")
+    assert policy_for().attempts == 4
+    assert policy_for({"step_retry": 2}).attempts == 2
+
+
+def test_backoff_is_capped():
+    policy = RetryPolicy(5, backoff=1, max_backoff=3)
+    assert [policy.delay(n) for n in range(1, 5)] == [1, 2, 3, 3]
+
+
+def test_timeout_is_not_transient():
+    assert is_transient(StaleElementReferenceException())
+    assert not is_transient(TimeoutException())
+
+
+def test_run_step_retries_transient_errors_only():
+    calls = []
+
+    def flaky(**params):
+        calls.append(params)
+        if len(calls) < 3:
+            raise StaleElementReferenceException()
+        return "ok"
+
+    assert run_step(flaky, {"x": 1}, "点击", RetryPolicy(3, backoff=0)) == "ok"
+    assert len(calls) == 3
+
+    def timeout(**params):
+        calls.append(params)
+        raise TimeoutException()
+
+    calls.clear()
+    with pytest.raises(TimeoutException):
+        run_step(timeout, {}, "等待", RetryPolicy(3, backoff=0))
+    assert len(calls) == 1
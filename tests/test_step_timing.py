@@ -0,0 +1,58 @@
+# coding = utf-8
+import os
+import time
+import pytest
+from extend import step_timing
+from extend.step_timing import CaseTimer, prune_runs, write_prometheus
+
+
+def _run_case(tmp_path, run_id, title):
+    timer = CaseTimer(title, f"{title}.yaml")
+    with timer.step("打开页面", "open_url"):
+        with step_timing.measure("wait"):
+            pass
+    timer.finish(step_timing.timing_path(run_id, str(tmp_path / "timing")))
+
+
+def test_prometheus_counts_only_current_run(tmp_path):
+    _run_case(tmp_path, "run-1", "old")
+    _run_case(tmp_path, "run-2", "new")
+    output = str(tmp_path / "metrics.prom")
+    assert write_prometheus(output, str(tmp_path / "timing"), run_id="run-2")
+    with open(output, encoding='utf-8') as f:
+        metrics = f.read()
+    assert 'yaml_keyword_steps_total{keyword="open_url",status="passed"} 1' in metrics
+    assert 'case="new"' in metrics and 'case="old"' not in metrics
+
+
+def test_each_process_writes_own_file(tmp_path):
+    path = step_timing.timing_path("run-1", str(tmp_path))
+    assert path == os.path.join(str(tmp_path), "run-1", f"{os.getpid()}.jsonl")
+
+
+def test_prune_keeps_recent_runs_and_current(tmp_path):
+    for index in range(4):
+        os.makedirs(tmp_path / f"run-{index}")
+        os.utime(tmp_path / f"run-{index}", (time.time() + index, time.time() + index))
+    prune_runs(str(tmp_path), keep=2, current="run-0")
+    assert sorted(os.listdir(tmp_path)) == ["run-0", "run-3"]
+
+
+def test_prune_skips_runs_with_live_writers(tmp_path):
+    for index in range(3):
+        os.makedirs(tmp_path / f"run-{index}")
+        os.utime(tmp_path / f"run-{index}", (time.time() + index, time.time() + index))
+    # 并发的另一次运行：最早的目录，但写入进程仍存活
+    (tmp_path / "run-0" / f"{os.getpid()}.jsonl").write_text("")
+    (tmp_path / "run-1" / "999999999.jsonl").write_text("")
+    prune_runs(str(tmp_path), keep=1)
+    assert sorted(os.listdir(tmp_path)) == ["run-0", "run-2"]
+
+
+def test_wait_patch_only_active_during_step():
+    wait = pytest.importorskip("selenium.webdriver.support.wait")
+    original = wait.WebDriverWait.until
+    timer = CaseTimer("case", "case.yaml")
+    with timer.step("等待", "wait_element"):
+        assert wait.WebDriverWait.until is not original
+    assert wait.WebDriverWait.until is original
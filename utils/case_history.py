@@ -0,0 +1,207 @@
+# coding = utf-8
+"""
+用例执行历史与执行顺序
+
+每次运行结束后从 allure-results 中读取每个YAML用例的结果和耗时，追加到本地历史文件
+（allure-results 每次运行前会被清空，所以需要单独保存）。根据历史：
+- 计算每个用例的失败概率（最近的结果权重更高，结果反复变化的不稳定用例额外加权）
+- 估算每个用例的耗时（最近几次的中位数）
+据此把最可能失败的用例排在前面，并在并行执行时按耗时从长到短分配，缩短整体耗时。
+"""
+import os
+import json
+import heapq
+import logging
+import statistics
+from extend.file_lock import FileLock
+from parse.case_loader import load_case, CaseLoadError
+
+# 历史文件
+HISTORY_FILE = ".case_history.json"
+
+# 每个用例保留的最近结果数
+MAX_RUNS = 20
+
+# 越早的结果权重越低
+DECAY = 0.7
+
+# 没有历史的用例：失败概率和耗时（秒）的默认值
+NEW_CASE_RISK = 0.3
+DEFAULT_DURATION = 60.0
+
+# 失败概率高于该值的用例优先执行
+RISK_THRESHOLD = 0.2
+
+FAILED_STATUSES = ("failed", "broken")
+
+# allure结果中记录用例文件路径的参数（pytest参数化的参数名）
+YAML_FILE_PARAM = "yaml_file"
+
+
+def case_keys(yaml_file_path):
+    """用于在allure结果中识别用例的字符串：路径、文件名和用例标题"""
+    keys = [os.path.normpath(yaml_file_path), os.path.basename(yaml_file_path),
+            os.path.splitext(os.path.basename(yaml_file_path))[0]]
+    try:
+        title = load_case(yaml_file_path).get("title")
+        if title:
+            keys.append(str(title))
+    except (OSError, CaseLoadError):
+        pass
+    return keys
+
+
+def _result_strings(result):
+    """
+    allure结果中用于识别用例的字段
+
+    记录了yaml_file参数时只使用该参数，同名标题的不同用例不会互相混淆；
+    没有记录参数时才使用名称、标题等字段。
+    """
+    strings = [p.get("value") for p in result.get("parameters") or [] if p.get("name") == YAML_FILE_PARAM]
+    if not strings:
+        strings = [result.get("name"), result.get("fullName")]
+        strings += [p.get("value") for p in result.get("parameters") or []]
+        strings += [l.get("value") for l in result.get("labels") or []
+                    if l.get("name") in ("story", "feature", "suite")]
+    return [str(s).strip("'\"") for s in strings if s]
+
+
+def _match(result, key_index):
+    """按从具体到宽泛的顺序匹配用例：完整路径、文件名、标题"""
+    strings = _result_strings(result)
+    for value in strings:
+        normalized = os.path.normpath(value)
+        if normalized in key_index:
+            return key_index[normalized]
+        for candidate in (os.path.basename(normalized), os.path.splitext(os.path.basename(normalized))[0]):
+            if candidate in key_index:
+                return key_index[candidate]
+    return None
+
+
+class CaseHistory:
+    """
+    用例执行历史
+
+    参数:
+        path: 历史文件路径
+    """
+
+    def __init__(self, path=HISTORY_FILE):
+        self.path = path
+        self.cases = self._load()
+        self._default_duration = None
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f).get("cases", {})
+        except (OSError, ValueError):
+            return {}
+
+    def save(self):
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({"cases": self.cases}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+    def ingest(self, results_dir, yaml_files):
+        """
+        从allure结果目录读取本次运行的结果并写入历史（同一结果重复读取不会重复记录）
+
+        返回:
+            int: 新记录的结果数
+        """
+        if not os.path.isdir(results_dir):
+            return 0
+        key_index = {}
+        for yaml_file in yaml_files:
+            for key in case_keys(yaml_file):
+                key_index.setdefault(key, os.path.normpath(yaml_file))
+
+        added = 0
+        with FileLock(f"{self.path}.lock"):
+            self.cases = self._load()
+            for file in sorted(os.listdir(results_dir)):
+                if not file.endswith("-result.json"):
+                    continue
+                try:
+                    with open(os.path.join(results_dir, file), 'r', encoding='utf-8') as f:
+                        result = json.load(f)
+                except (OSError, ValueError):
+                    continue
+                case = _match(result, key_index)
+                if case is None or not result.get("start"):
+                    continue
+                runs = self.cases.setdefault(case, [])
+                if any(run["start"] == result["start"] for run in runs):
+                    continue
+                runs.append({
+                    "start": result["start"],
+                    "status": result.get("status", "unknown"),
+                    "duration": max(0, result.get("stop", result["start"]) - result["start"]) / 1000,
+                })
+                runs.sort(key=lambda run: run["start"])
+                del runs[:-MAX_RUNS]
+                added += 1
+            self.save()
+        self._default_duration = None
+        if added:
+            logging.info(f"已记录 {added} 条用例执行历史")
+        return added
+
+    def _runs(self, yaml_file):
+        return self.cases.get(os.path.normpath(yaml_file), [])
+
+    def failure_probability(self, yaml_file):
+        """按时间衰减加权的失败率，结果反复变化（不稳定）的用例额外加权"""
+        runs = self._runs(yaml_file)
+        if not runs:
+            return NEW_CASE_RISK
+        weights = [DECAY ** age for age in range(len(runs))]
+        failures = [run["status"] in FAILED_STATUSES for run in reversed(runs)]
+        rate = sum(w for w, failed in zip(weights, failures) if failed) / sum(weights)
+        flips = sum(1 for a, b in zip(failures, failures[1:]) if a != b)
+        flakiness = flips / (len(runs) - 1) if len(runs) > 1 else 0.0
+        return min(1.0, rate + 0.5 * flakiness * (1 - rate))
+
+    def duration(self, yaml_file):
+        """最近几次执行耗时的中位数（秒），没有历史时使用已知用例耗时的中位数"""
+        runs = self._runs(yaml_file)
+        if runs:
+            return statistics.median(run["duration"] for run in runs[-5:])
+        if self._default_duration is None:
+            known = [statistics.median(run["duration"] for run in r[-5:]) for r in self.cases.values() if r]
+            self._default_duration = statistics.median(known) if known else DEFAULT_DURATION
+        return self._default_duration
+
+
+def order_cases(yaml_files, history):
+    """
+    按失败概率从高到低排序，失败概率相近时耗时短的在前，尽快得到失败反馈
+
+    返回:
+        list: 排序后的YAML文件列表
+    """
+    return sorted(yaml_files, key=lambda f: (-round(history.failure_probability(f), 1), history.duration(f), f))
+
+
+def partition_by_duration(yaml_files, workers, history):
+    """
+    按历史耗时分配用例：耗时长的先分配给当前总耗时最少的worker（最长处理时间优先）
+
+    返回:
+        list: 每个worker的用例列表（不包含空列表）；每个列表内失败概率高的用例在前，其余按耗时从长到短
+    """
+    workers = max(1, workers)
+    heap = [(0.0, index) for index in range(workers)]
+    buckets = [[] for _ in range(workers)]
+    for yaml_file in sorted(yaml_files, key=lambda f: (-history.duration(f), f)):
+        load, index = heapq.heappop(heap)
+        buckets[index].append(yaml_file)
+        heapq.heappush(heap, (load + history.duration(yaml_file), index))
+
+    for bucket in buckets:
+        bucket.sort(key=lambda f: (history.failure_probability(f) < RISK_THRESHOLD, -history.duration(f), f))
+    return [bucket for bucket in buckets if bucket]
@@ -0,0 +1,307 @@
+# coding = utf-8
+"""
+YAML用例静态检查
+
+在启动浏览器之前用进程池并行检查目录下的所有YAML用例（只导入关键字模块，不启动浏览器）：
+- 结构检查：title、steps、config
+- config中 screenshot、step_retry、lean 的取值
+- 关键字是否存在、参数是否满足关键字的函数签名（通过关键字注册表解析，与执行时的检查一致）
+- 必填参数是否为空，如 定位方式/目标对象
+- XPath/CSS 定位表达式的语法
+- depends_on 指向的文件是否存在、是否存在循环依赖
+"""
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+from parse.case_loader import CaseCache, CaseLoadError
+from extend.dependency_graph import DependencyGraph, DependencyCycleError
+from extend.keyword_registry import KEYWORD_FIELD, PLUGIN_DIR, KeywordError, KeywordRegistry
+from extend.lean_browser import RESOURCE_TYPE_PATTERNS
+from extend.screenshot_pipeline import parse_policy
+
+# 定位方式与Selenium By取值的对应关系
+LOCATOR_TYPES = {
+    "id", "xpath", "name", "css", "css selector", "class", "class name",
+    "tag", "tag name", "link text", "partial link text",
+}
+
+# 成对出现的定位方式/表达式参数
+LOCATOR_PARAMS = [("定位方式", "目标对象"), ("目标定位方式", "目标定位值")]
+
+# step_retry 字典形式和 lean 字典形式支持的字段
+STEP_RETRY_FIELDS = ("attempts", "backoff", "max_backoff")
+LEAN_FIELDS = ("block_urls", "block_types", "page_load")
+
+# Selenium支持的页面加载策略
+PAGE_LOAD_STRATEGIES = ("normal", "eager", "none")
+
+# 进程池中每个worker进程各自创建的关键字注册表
+_registry = None
+
+
+def default_registry(plugin_dir=PLUGIN_DIR):
+    """创建与执行用例时相同的关键字注册表"""
+    from extend.keywords import Keywords
+    return KeywordRegistry(Keywords, plugin_dir)
+
+
+def _init_worker():
+    global _registry
+    _registry = default_registry()
+
+
+def _check_number(value, name, minimum=0):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < minimum:
+        return f"{name}必须是不小于{minimum}的数字: {value}"
+    return None
+
+
+def _check_step_retry(value):
+    """step_retry: 布尔值、执行次数或 {attempts, backoff, max_backoff}"""
+    if isinstance(value, bool):
+        return []
+    if isinstance(value, str) and (value.isdigit() or value.lower() in ("true", "false", "yes", "no", "on", "off")):
+        return []
+    if isinstance(value, dict):
+        errors = [f"config.step_retry不支持的字段: {key}" for key in value if key not in STEP_RETRY_FIELDS]
+        for key in STEP_RETRY_FIELDS:
+            if key in value:
+                error = _check_number(value[key], f"config.step_retry.{key}", 1 if key == "attempts" else 0)
+                if error:
+                    errors.append(error)
+        return errors
+    error = _check_number(value, "config.step_retry")
+    return [error] if error else []
+
+
+def _check_lean(value):
+    """lean: 布尔值或 {block_urls, block_types, page_load}"""
+    if isinstance(value, bool):
+        return []
+    if not isinstance(value, dict):
+        return [f"config.lean必须是布尔值或字典: {value}"]
+    errors = [f"config.lean不支持的字段: {key}" for key in value if key not in LEAN_FIELDS]
+    for key in ("block_urls", "block_types"):
+        if value.get(key) is not None and not isinstance(value[key], list):
+            errors.append(f"config.lean.{key}必须是列表")
+    block_types = value.get("block_types")
+    for resource_type in block_types if isinstance(block_types, list) else []:
+        if str(resource_type).lower() not in RESOURCE_TYPE_PATTERNS:
+            errors.append(f"config.lean.block_types不支持的资源类型: {resource_type}，"
+                          f"可选: {', '.join(RESOURCE_TYPE_PATTERNS)}")
+    if value.get("page_load") and value["page_load"] not in PAGE_LOAD_STRATEGIES:
+        errors.append(f"config.lean.page_load不支持: {value['page_load']}，可选: {', '.join(PAGE_LOAD_STRATEGIES)}")
+    return errors
+
+
+def check_config(config):
+    """检查config中 screenshot、step_retry、lean 的取值，返回错误描述列表"""
+    errors = []
+    if "screenshot" in config:
+        try:
+            parse_policy(config["screenshot"])
+        except ValueError as e:
+            errors.append(f"config.screenshot: {e}")
+    if "step_retry" in config:
+        errors.extend(_check_step_retry(config["step_retry"]))
+    if "lean" in config:
+        errors.extend(_check_lean(config["lean"]))
+    return errors
+
+
+def _check_balanced(expression):
+    """检查括号和引号是否配对，返回错误描述或None"""
+    pairs = {')': '(', ']': '['}
+    stack = []
+    quote = None
+    for char in expression:
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ('"', "'"):
+            quote = char
+        elif char in '([':
+            stack.append(char)
+        elif char in ')]':
+            if not stack or stack.pop() != pairs[char]:
+                return f"括号不匹配: {char}"
+    if quote:
+        return f"引号未闭合: {quote}"
+    if stack:
+        return f"括号未闭合: {stack[-1]}"
+    return None
+
+
+def check_xpath(expression):
+    """离线检查XPath语法，安装了lxml时使用lxml编译，否则做基础语法检查"""
+    try:
+        from lxml import etree
+    except ImportError:
+        etree = None
+    if etree is not None:
+        try:
+            etree.XPath(expression)
+            return None
+        except etree.XPathSyntaxError as e:
+            return f"XPath语法错误: {e}"
+
+    error = _check_balanced(expression)
+    if error:
+        return f"XPath语法错误: {error}"
+    stripped = expression.strip()
+    if "[]" in stripped.replace(" ", "") or "///" in stripped:
+        return "XPath语法错误: 存在空谓词或多余的斜杠"
+    if stripped.endswith(("/", "[", "(", "@", "::")) and stripped != "/":
+        return "XPath语法错误: 表达式不完整"
+    return None
+
+
+def check_css(expression):
+    """离线检查CSS选择器语法，安装了cssselect时使用cssselect解析，否则做基础语法检查"""
+    try:
+        import cssselect
+    except ImportError:
+        cssselect = None
+    if cssselect is not None:
+        try:
+            cssselect.parse(expression)
+            return None
+        except cssselect.SelectorSyntaxError as e:
+            return f"CSS选择器语法错误: {e}"
+
+    error = _check_balanced(expression)
+    if error:
+        return f"CSS选择器语法错误: {error}"
+    stripped = expression.strip()
+    if stripped.endswith((">", "+", "~", ",")) or stripped.startswith((">", "+", "~", ",")):
+        return "CSS选择器语法错误: 组合符位置错误"
+    return None
+
+
+def validate_case(yaml_file_path, registry):
+    """
+    检查单个YAML用例
+
+    参数:
+        yaml_file_path: YAML文件路径
+        registry: KeywordRegistry，用于解析关键字和检查参数
+
+    返回:
+        list: 错误描述列表，为空表示检查通过
+    """
+    try:
+        entry = CaseCache().load(yaml_file_path)
+    except (OSError, CaseLoadError) as e:
+        return [str(e)]
+
+    case = entry["case"]
+    errors = []
+
+    # 结构检查
+    if not case.get("title"):
+        errors.append("缺少title")
+    if "config" in case and not isinstance(case["config"], dict):
+        errors.append("config必须是字典")
+    elif case.get("config"):
+        errors.extend(check_config(case["config"]))
+    steps = case.get("steps")
+    if not isinstance(steps, list) or not steps:
+        errors.append("缺少steps或steps不是列表")
+        steps = []
+
+    # 步骤检查
+    for index, step in enumerate(steps, start=1):
+        if not isinstance(step, dict) or len(step) != 1:
+            errors.append(f"第{index}步格式错误")
+            continue
+        step_name, params = next(iter(step.items()))
+        prefix = f"第{index}步 {step_name}"
+        if not isinstance(params, dict) or KEYWORD_FIELD not in params:
+            errors.append(f"{prefix}: 缺少{KEYWORD_FIELD}")
+            continue
+
+        try:
+            keyword = registry.resolve(params[KEYWORD_FIELD])
+        except KeywordError as e:
+            errors.append(f"{prefix}: {e}")
+            continue
+
+        errors.extend(f"{prefix}: {error}" for error in keyword.check_params(params))
+        for param in keyword.required_params:
+            if param in params and params[param] in (None, ""):
+                errors.append(f"{prefix}: 参数为空: {param}")
+
+        for by_param, value_param in LOCATOR_PARAMS:
+            by = params.get(by_param)
+            value = params.get(value_param)
+            if by is None or value is None:
+                continue
+            by = str(by).lower()
+            if by not in LOCATOR_TYPES:
+                errors.append(f"{prefix}: 不支持的{by_param}: {by}")
+            elif by == "xpath":
+                error = check_xpath(str(value))
+                if error:
+                    errors.append(f"{prefix}: {error}")
+            elif by in ("css", "css selector"):
+                error = check_css(str(value))
+                if error:
+                    errors.append(f"{prefix}: {error}")
+
+    # 依赖检查
+    for depend in entry["depends"]:
+        if not os.path.exists(depend):
+            errors.append(f"依赖文件不存在: {depend}")
+    try:
+        DependencyGraph().add(yaml_file_path)
+    except (DependencyCycleError, CaseLoadError) as e:
+        errors.append(str(e))
+
+    return errors
+
+
+def _validate_worker(yaml_file_path):
+    return yaml_file_path, validate_case(yaml_file_path, _registry)
+
+
+def validate_files(yaml_files, workers=None, registry=None):
+    """
+    用进程池并行检查多个YAML用例
+
+    参数:
+        yaml_files: YAML文件路径列表
+        workers: 进程数，默认为CPU核数
+        registry: 关键字注册表，指定时在当前进程中依次检查；默认每个进程各自创建与执行时相同的注册表
+
+    返回:
+        dict: {文件路径: 错误描述列表}，只包含检查未通过的文件
+    """
+    workers = workers or os.cpu_count() or 1
+
+    if registry is not None or workers == 1 or len(yaml_files) < 2:
+        registry = registry or default_registry()
+        results = ((path, validate_case(path, registry)) for path in yaml_files)
+        return {path: errors for path, errors in results if errors}
+
+    chunksize = max(1, len(yaml_files) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as executor:
+        results = executor.map(_validate_worker, yaml_files, chunksize=chunksize)
+        return {path: errors for path, errors in results if errors}
+
+
+def validate_suite(yaml_files, workers=None):
+    """
+    检查用例并输出结果
+
+    返回:
+        int: 退出码，全部通过为0，否则为1
+    """
+    failures = validate_files(yaml_files, workers)
+    for path in sorted(failures):
+        logging.error(f"用例检查未通过: {path}")
+        for error in failures[path]:
+            logging.error(f"  - {error}")
+
+    logging.info(f"共检查 {len(yaml_files)} 个用例，{len(yaml_files) - len(failures)} 个通过，{len(failures)} 个未通过")
+    return 1 if failures else 0
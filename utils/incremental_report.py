@@ -0,0 +1,346 @@
+# coding = utf-8
+"""
+增量生成Allure报告
+
+记录已经生成到报告中的结果文件，重跑或分片执行后只对新增的结果文件运行 allure generate，
+再把生成的数据合并进已有的 report/：用例明细和附件直接复制，suites/behaviors 等树形数据按名称合并
+（同名用例以新结果为准），列表组件和CSV导出按条目合并，趋势组件按构建合并，汇总数据重新统计，
+history/ 沿用已有报告的历史并追加本次结果。状态文件只保留结果目录中仍然存在的结果文件。
+所有步骤都返回 allure 命令的真实退出码。
+"""
+import os
+import csv
+import json
+import shutil
+import logging
+import tempfile
+import subprocess
+
+# 报告目录中记录已处理结果文件的状态文件
+STATE_FILE = ".incremental.json"
+
+# 用例状态
+STATUSES = ("failed", "broken", "skipped", "passed", "unknown")
+
+# CSV导出中每次执行都会变化的列，合并时不作为用例的标识
+CSV_RESULT_COLUMNS = ("Status", "Start Time", "Stop Time", "Duration in ms")
+
+# 趋势组件：每个条目对应一次构建，按构建合并
+TREND_WIDGETS = ("duration-trend.json", "categories-trend.json", "retry-trend.json")
+
+
+def run_allure_generate(results_dir, report_dir):
+    """
+    执行 allure generate 并返回退出码
+
+    返回:
+        int: allure命令的退出码，找不到allure命令时返回127
+    """
+    cmd = ["allure", "generate", "-c", results_dir, "-o", report_dir]
+    logging.info(f"运行命令: {' '.join(cmd)}")
+    try:
+        return subprocess.run(cmd, shell=(os.name == 'nt')).returncode
+    except FileNotFoundError:
+        logging.error("未找到allure命令，请确认已安装allure并加入PATH")
+        return 127
+
+
+def _result_files(results_dir):
+    return sorted(f for f in os.listdir(results_dir) if f.endswith("-result.json"))
+
+
+def _load_state(report_dir):
+    try:
+        with open(os.path.join(report_dir, STATE_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_state(report_dir, processed):
+    with open(os.path.join(report_dir, STATE_FILE), 'w', encoding='utf-8') as f:
+        json.dump({"processed": sorted(processed)}, f)
+
+
+def _read_json(path, default=None):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def _referenced_files(results_dir, result_file):
+    """结果文件引用的附件"""
+    sources = []
+
+    def walk(node):
+        if isinstance(node, dict):
+            for attachment in node.get("attachments") or []:
+                if attachment.get("source"):
+                    sources.append(attachment["source"])
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(_read_json(os.path.join(results_dir, result_file), {}))
+    return sources
+
+
+def merge_tree(old, new, replaced):
+    """
+    合并树形数据（suites.json、behaviors.json等）
+
+    分组节点按名称合并，同一分组下同名的用例以新结果为准，被替换的用例uid记录到replaced中。
+    """
+    children = list(old.get("children") or [])
+    index = {child.get("name"): i for i, child in enumerate(children)}
+    for child in new.get("children") or []:
+        name = child.get("name")
+        if name not in index:
+            index[name] = len(children)
+            children.append(child)
+            continue
+        current = children[index[name]]
+        if "children" in current and "children" in child:
+            children[index[name]] = merge_tree(current, child, replaced)
+        else:
+            if current.get("uid") and current.get("uid") != child.get("uid"):
+                replaced.add(current["uid"])
+            children[index[name]] = child
+    return dict(new, children=children)
+
+
+def _item_key(item):
+    """列表组件条目的标识：用例按uid，环境信息等按name，其他按内容"""
+    if isinstance(item, dict):
+        for field in ("uid", "name"):
+            if item.get(field) is not None:
+                return field, str(item[field])
+    return "content", json.dumps(item, sort_keys=True, ensure_ascii=False)
+
+
+def merge_list(old, new, replaced):
+    """
+    合并列表形式的组件数据（environment.json、executors.json等）
+
+    同一标识的条目以新结果为准，去掉被替换的用例，保持原有顺序。
+    """
+    merged = {}
+    for item in old:
+        if not (isinstance(item, dict) and item.get("uid") in replaced):
+            merged[_item_key(item)] = item
+    for item in new:
+        merged[_item_key(item)] = item
+    return list(merged.values())
+
+
+def _trend_key(item):
+    """趋势条目的标识：历史构建按buildOrder，当前构建没有buildOrder"""
+    if isinstance(item, dict):
+        for field in ("buildOrder", "uid"):
+            if item.get(field) is not None:
+                return field, str(item[field])
+    return "current", ""
+
+
+def merge_trend(old, new):
+    """
+    合并趋势组件数据（duration-trend.json等）
+
+    同一次构建的条目以新结果为准，保持新结果的顺序，旧报告中独有的构建排在后面；
+    条目数量不超过合并前的最大值，同一份结果重复合并时结果不变。
+    """
+    merged = {_trend_key(item): item for item in new}
+    for item in old:
+        merged.setdefault(_trend_key(item), item)
+    return list(merged.values())[:max(len(old), len(new))]
+
+
+def merge_csv(old_path, new_path):
+    """合并CSV导出（suites.csv等）：同一用例的行以新结果为准"""
+    with open(new_path, 'r', encoding='utf-8', newline='') as f:
+        new_rows = list(csv.reader(f))
+    if not new_rows:
+        return
+    try:
+        with open(old_path, 'r', encoding='utf-8', newline='') as f:
+            old_rows = list(csv.reader(f))
+    except OSError:
+        old_rows = []
+    header = new_rows[0]
+    if old_rows and old_rows[0] != header:
+        old_rows = []
+    identity = [i for i, column in enumerate(header) if column not in CSV_RESULT_COLUMNS]
+    rows = {}
+    for row in old_rows[1:] + new_rows[1:]:
+        rows[tuple(row[i] for i in identity if i < len(row))] = row
+    with open(old_path, 'w', encoding='utf-8', newline='') as f:
+        csv.writer(f).writerows([header, *rows.values()])
+
+
+def _tree_leaves(node):
+    for child in node.get("children") or []:
+        if "children" in child:
+            yield from _tree_leaves(child)
+        else:
+            yield child
+
+
+def _merge_summary(old, new, suites):
+    """按合并后的用例重新统计summary.json"""
+    statistic = {status: 0 for status in STATUSES}
+    for leaf in _tree_leaves(suites):
+        status = leaf.get("status", "unknown")
+        statistic[status if status in statistic else "unknown"] += 1
+    statistic["total"] = sum(statistic.values())
+
+    old_time, new_time = old.get("time") or {}, new.get("time") or {}
+    time = dict(new_time)
+    if old_time.get("start") and new_time.get("start"):
+        time["start"] = min(old_time["start"], new_time["start"])
+        time["stop"] = max(old_time.get("stop", 0), new_time.get("stop", 0))
+        time["duration"] = time["stop"] - time["start"]
+        time["sumDuration"] = old_time.get("sumDuration", 0) + new_time.get("sumDuration", 0)
+        time["minDuration"] = min(old_time.get("minDuration", 0), new_time.get("minDuration", 0))
+        time["maxDuration"] = max(old_time.get("maxDuration", 0), new_time.get("maxDuration", 0))
+    return dict(new, statistic=statistic, time=time)
+
+
+def merge_report(partial_dir, report_dir):
+    """把只包含新增结果的报告合并到已有报告中"""
+    replaced = set()
+
+    # 树形数据按名称合并
+    for relative in ("data/suites.json", "data/behaviors.json", "data/packages.json",
+                     "data/timeline.json", "data/categories.json"):
+        new = _read_json(os.path.join(partial_dir, relative))
+        if new is None:
+            continue
+        old = _read_json(os.path.join(report_dir, relative), {})
+        _write_json(os.path.join(report_dir, relative), merge_tree(old, new, replaced))
+
+    # 用例明细和附件直接复制，删除被替换的旧用例
+    for relative in ("data/test-cases", "data/attachments"):
+        source = os.path.join(partial_dir, relative)
+        if os.path.isdir(source):
+            shutil.copytree(source, os.path.join(report_dir, relative), dirs_exist_ok=True)
+    for uid in replaced:
+        try:
+            os.remove(os.path.join(report_dir, "data", "test-cases", f"{uid}.json"))
+        except OSError:
+            pass
+
+    # CSV导出按用例合并
+    data_dir = os.path.join(partial_dir, "data")
+    for file in sorted(os.listdir(data_dir)) if os.path.isdir(data_dir) else []:
+        if file.endswith(".csv"):
+            merge_csv(os.path.join(report_dir, "data", file), os.path.join(data_dir, file))
+
+    # 列表形式的组件数据：按条目合并，去掉被替换的用例
+    widgets_dir = os.path.join(partial_dir, "widgets")
+    for file in sorted(os.listdir(widgets_dir)) if os.path.isdir(widgets_dir) else []:
+        path = os.path.join(report_dir, "widgets", file)
+        new = _read_json(os.path.join(widgets_dir, file))
+        old = _read_json(path)
+        if file == "summary.json":
+            suites = _read_json(os.path.join(report_dir, "data", "suites.json"), {})
+            merged = _merge_summary(old or {}, new or {}, suites)
+        elif isinstance(new, list) and isinstance(old, list) and file in TREND_WIDGETS:
+            merged = merge_trend(old, new)
+        elif isinstance(new, list) and isinstance(old, list) and file not in ("history-trend.json",):
+            merged = merge_list(old, new, replaced)
+        elif isinstance(new, dict) and isinstance(old, dict) and "items" in new and "items" in old:
+            merged = dict(new, items=merge_list(old["items"], new["items"], replaced))
+        else:
+            merged = new
+        _write_json(path, merged)
+
+    # 历史数据：沿用旧历史，追加本次结果
+    history = _read_json(os.path.join(report_dir, "history", "history.json"), {})
+    history.update(_read_json(os.path.join(partial_dir, "history", "history.json"), {}))
+    _write_json(os.path.join(report_dir, "history", "history.json"), history)
+
+    summary = _read_json(os.path.join(report_dir, "widgets", "summary.json"), {})
+    trend = _read_json(os.path.join(partial_dir, "history", "history-trend.json"), [])
+    if trend and summary.get("statistic"):
+        trend[0] = dict(trend[0], data=summary["statistic"])
+        for relative in ("history/history-trend.json", "widgets/history-trend.json"):
+            _write_json(os.path.join(report_dir, relative), trend)
+
+    logging.info(f"已合并增量报告，替换重跑用例 {len(replaced)} 个")
+
+
+def generate_report(results_dir="./allure-results", report_dir="./report", incremental=False):
+    """
+    生成Allure报告
+
+    参数:
+        results_dir: allure结果目录
+        report_dir: 报告输出目录
+        incremental: 是否只处理上次生成之后新增的结果文件
+
+    返回:
+        int: 退出码，0表示成功
+    """
+    if not os.path.isdir(results_dir):
+        logging.error(f"allure结果目录不存在: {results_dir}")
+        return 1
+
+    all_results = _result_files(results_dir)
+    state = _load_state(report_dir) if incremental else None
+
+    # 首次生成或未开启增量模式时完整生成
+    if state is None or not os.path.exists(os.path.join(report_dir, "index.html")):
+        exit_code = run_allure_generate(results_dir, report_dir)
+        if exit_code == 0 and incremental:
+            _save_state(report_dir, all_results)
+        return exit_code
+
+    processed = set(state.get("processed", []))
+    new_results = [f for f in all_results if f not in processed]
+    if not new_results:
+        logging.info("没有新增的测试结果，报告无需更新")
+        if processed != set(all_results):
+            _save_state(report_dir, set(all_results))
+        return 0
+
+    logging.info(f"发现 {len(new_results)} 个新增结果文件，增量更新报告")
+    with tempfile.TemporaryDirectory(prefix="allure_incremental_") as temp_dir:
+        partial_results = os.path.join(temp_dir, "results")
+        partial_report = os.path.join(temp_dir, "report")
+        os.makedirs(partial_results)
+
+        # 只复制新增结果、其引用的附件，以及容器和环境信息
+        files = set(new_results)
+        for result_file in new_results:
+            files.update(_referenced_files(results_dir, result_file))
+        files.update(f for f in os.listdir(results_dir)
+                     if f.endswith("-container.json") or f in ("environment.properties", "categories.json",
+                                                               "executor.json"))
+        for file in files:
+            source = os.path.join(results_dir, file)
+            if os.path.isfile(source):
+                shutil.copy2(source, os.path.join(partial_results, file))
+
+        # 带上已有的历史，使趋势数据连续
+        history_dir = os.path.join(report_dir, "history")
+        if os.path.isdir(history_dir):
+            shutil.copytree(history_dir, os.path.join(partial_results, "history"))
+
+        exit_code = run_allure_generate(partial_results, partial_report)
+        if exit_code != 0:
+            return exit_code
+        merge_report(partial_report, report_dir)
+
+    # 只记录结果目录中仍然存在的结果文件，清空结果目录后状态文件不会无限增长
+    _save_state(report_dir, set(all_results))
+    return 0
@@ -0,0 +1,373 @@
+# coding = utf-8
+"""
+测试报告邮件投递队列
+
+邮件先写入本地队列目录，再由独立的后台进程发送，CI任务不用等待SMTP服务器。
+后台进程复用同一个已认证的SMTP连接依次发送队列中的邮件，临时性错误按指数退避重试，
+永久性错误的邮件移到 failed/ 目录；部分收件人被拒绝时只对被拒绝的收件人重试。
+超过大小阈值的附件会先压缩，仍然过大时改为发送下载链接。
+
+单独运行（例如对接本地的SMTP测试服务器）:
+    python -m utils.mail_queue --drain --host 127.0.0.1 --port 1025 --no-ssl
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import smtplib
+import logging
+import zipfile
+import argparse
+import mimetypes
+import subprocess
+from email.message import EmailMessage
+
+# 默认队列目录
+DEFAULT_QUEUE_DIR = ".mail_queue"
+
+# 附件大小阈值（字节），超过时压缩或改为链接
+DEFAULT_ATTACHMENT_LIMIT = 20 * 1024 * 1024
+
+# 重试参数
+DEFAULT_MAX_ATTEMPTS = 5
+DEFAULT_BACKOFF = 2.0
+
+# 已经压缩过的文件类型
+COMPRESSED_EXTENSIONS = {'.zip', '.gz', '.xlsx', '.png', '.jpg', '.jpeg', '.webp'}
+
+
+def load_email_settings():
+    """
+    读取发件配置（优先使用环境变量配置，其次是配置文件）
+
+    返回:
+        dict: {smtp_server, smtp_port, use_ssl, username, password, recipients, subject_prefix}
+
+    异常:
+        ValueError: 配置有误
+    """
+    from config.email_config import get_email_config, get_smtp_config, validate_email_config
+
+    try:
+        from config.email_env import get_email_config_from_env
+        email_config = get_email_config_from_env()
+        logging.info("使用环境变量配置")
+    except ImportError:
+        email_config = get_email_config()
+        logging.info("使用默认配置文件")
+
+    errors = validate_email_config()
+    if errors:
+        raise ValueError("邮件配置错误: " + "; ".join(errors))
+
+    sender_config = email_config['sender']
+    smtp_config = get_smtp_config(sender_config['email_type'])
+    if not smtp_config:
+        raise ValueError(f"不支持的邮箱类型: {sender_config['email_type']}")
+
+    return {
+        "smtp_server": smtp_config['smtp_server'],
+        "smtp_port": smtp_config['smtp_port'],
+        "use_ssl": smtp_config['use_ssl'],
+        "username": sender_config['username'],
+        "password": sender_config['password'],
+        "recipients": email_config['recipients'],
+        "subject_prefix": email_config['content']['subject_prefix'],
+    }
+
+
+def _zip_path(source_path, output_dir):
+    """把文件或目录压缩为zip，返回zip文件路径"""
+    name = os.path.basename(os.path.normpath(source_path))
+    zip_path = os.path.join(output_dir, f"{name}.zip")
+    if os.path.isdir(source_path):
+        from diagnose_allure_report import package_report
+        package_report(source_path, zip_path)
+    else:
+        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
+            zipf.write(source_path, name)
+    return zip_path
+
+
+def prepare_attachments(paths, work_dir, limit=DEFAULT_ATTACHMENT_LIMIT, link_base=None):
+    """
+    处理附件：目录和超过阈值的文件先压缩，压缩后仍超过阈值的改为链接
+
+    返回:
+        tuple: (附件文件路径列表, 链接列表[(名称, 地址)])
+    """
+    attachments, links = [], []
+    for path in paths:
+        if not path or not os.path.exists(path):
+            continue
+        if os.path.isdir(path) or (os.path.getsize(path) > limit
+                                   and os.path.splitext(path)[1].lower() not in COMPRESSED_EXTENSIONS):
+            path = _zip_path(path, work_dir)
+
+        if os.path.getsize(path) <= limit:
+            attachments.append(path)
+        elif link_base:
+            links.append((os.path.basename(path), f"{link_base.rstrip('/')}/{os.path.basename(path)}"))
+        else:
+            logging.warning(f"附件超过 {limit / 1024 / 1024:.0f} MB 且未配置下载地址，已跳过: {path}")
+    return attachments, links
+
+
+def build_message(sender, recipients, subject, body=None, attachments=(), links=()):
+    """构造邮件"""
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = ", ".join(recipients)
+    message["Subject"] = subject
+
+    body = body or "测试已执行完成，详见附件中的测试报告。"
+    if links:
+        body += "".join(f"\n{name}: {url}" for name, url in links)
+    if body.lstrip().startswith("<"):
+        message.set_content("请使用支持HTML的邮件客户端查看测试报告。")
+        message.add_alternative(body, subtype="html")
+    else:
+        message.set_content(body)
+
+    for path in attachments:
+        mime_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        maintype, subtype = mime_type.split("/", 1)
+        with open(path, 'rb') as f:
+            message.add_attachment(f.read(), maintype=maintype, subtype=subtype, filename=os.path.basename(path))
+    return message
+
+
+class MailQueue:
+    """
+    基于目录的邮件队列
+
+    参数:
+        queue_dir: 队列目录，每封邮件保存为一个 .eml 文件和一个 .json 元数据文件
+    """
+
+    def __init__(self, queue_dir=DEFAULT_QUEUE_DIR):
+        self.queue_dir = queue_dir
+        self.failed_dir = os.path.join(queue_dir, "failed")
+
+    def enqueue(self, message, recipients):
+        """把邮件写入队列，返回邮件ID"""
+        os.makedirs(self.queue_dir, exist_ok=True)
+        message_id = f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+        self._write(f"{message_id}.eml", message.as_bytes())
+        # 元数据最后写入，出现元数据文件即表示邮件已完整入队
+        meta = {"recipients": list(recipients), "attempts": 0}
+        self._write(f"{message_id}.json", json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+        logging.info(f"邮件已加入发送队列: {message_id}")
+        return message_id
+
+    def _write(self, name, data):
+        path = os.path.join(self.queue_dir, name)
+        with open(f"{path}.tmp", 'wb') as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+
+    def pending(self):
+        """队列中的邮件ID（按入队顺序）"""
+        if not os.path.isdir(self.queue_dir):
+            return []
+        return sorted(f[:-5] for f in os.listdir(self.queue_dir) if f.endswith(".json"))
+
+    def load(self, message_id):
+        with open(os.path.join(self.queue_dir, f"{message_id}.json"), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(os.path.join(self.queue_dir, f"{message_id}.eml"), 'rb') as f:
+            return meta, f.read()
+
+    def update(self, message_id, meta):
+        self._write(f"{message_id}.json", json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+
+    def done(self, message_id):
+        for ext in (".json", ".eml"):
+            try:
+                os.remove(os.path.join(self.queue_dir, message_id + ext))
+            except OSError:
+                pass
+
+    def fail(self, message_id):
+        os.makedirs(self.failed_dir, exist_ok=True)
+        for ext in (".eml", ".json"):
+            os.replace(os.path.join(self.queue_dir, message_id + ext), os.path.join(self.failed_dir, message_id + ext))
+
+
+class SMTPDelivery:
+    """
+    复用同一个已认证连接的SMTP发送器
+
+    参数:
+        host, port: SMTP服务器
+        username, password: 认证信息，username为空时不认证（本地测试服务器）
+        use_ssl: 是否使用SMTP_SSL，否则在服务器支持时使用STARTTLS
+        timeout: 连接和命令的超时时间（秒）
+    """
+
+    def __init__(self, host, port, username=None, password=None, use_ssl=True, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+        self._smtp = None
+
+    def _connection(self):
+        if self._smtp is not None:
+            try:
+                if self._smtp.noop()[0] == 250:
+                    return self._smtp
+            except (smtplib.SMTPException, OSError):
+                pass
+            self.close()
+
+        if self.use_ssl:
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            smtp.ehlo()
+            if smtp.has_extn("starttls"):
+                smtp.starttls()
+                smtp.ehlo()
+        if self.username:
+            smtp.login(self.username, self.password)
+        self._smtp = smtp
+        return smtp
+
+    def send(self, raw_message, sender, recipients):
+        """
+        发送一封邮件
+
+        返回:
+            dict: 被拒绝的收件人 {收件人: (响应码, 响应内容)}，全部接受时为空
+        """
+        return self._connection().sendmail(sender, recipients, raw_message)
+
+    def close(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._smtp = None
+
+
+def _is_transient(error):
+    """
+    4xx响应和连接类错误可以重试，5xx响应（如认证失败、收件人不存在）等视为永久性错误
+
+    SMTPException 是 OSError 的子类，必须先按SMTP响应码判断，最后才按网络错误处理。
+    """
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return bool(codes) and 400 <= min(codes) < 500
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    if isinstance(error, smtplib.SMTPException):
+        return False
+    return isinstance(error, (socket.timeout, OSError))
+
+
+def drain(queue, delivery, sender, max_attempts=DEFAULT_MAX_ATTEMPTS, backoff=DEFAULT_BACKOFF):
+    """
+    发送队列中的所有邮件，失败时按指数退避重试
+
+    返回:
+        tuple: (发送成功数, 最终失败数)
+    """
+    from extend.file_lock import FileLock
+
+    sent = failed = 0
+    os.makedirs(queue.queue_dir, exist_ok=True)
+    # 同一时间只允许一个进程发送，避免重复投递
+    with FileLock(os.path.join(queue.queue_dir, "drain.lock")):
+        try:
+            for message_id in queue.pending():
+                meta, raw = queue.load(message_id)
+                while True:
+                    try:
+                        refused = delivery.send(raw, sender, meta["recipients"])
+                        if refused:
+                            # 部分收件人被拒绝：已接受的收件人不再重发，只对被拒绝的收件人按响应码重试或放弃
+                            logging.warning(f"部分收件人被拒绝: {message_id}: {refused}")
+                            meta["recipients"] = list(refused)
+                            raise smtplib.SMTPRecipientsRefused(refused)
+                        queue.done(message_id)
+                        sent += 1
+                        logging.info(f"邮件发送成功: {message_id}")
+                        break
+                    except Exception as e:
+                        meta["attempts"] += 1
+                        meta["last_error"] = str(e)
+                        delivery.close()
+                        if not _is_transient(e) or meta["attempts"] >= max_attempts:
+                            queue.update(message_id, meta)
+                            queue.fail(message_id)
+                            failed += 1
+                            logging.error(f"邮件发送失败（已重试 {meta['attempts']} 次）: {message_id}: {e}")
+                            break
+                        delay = backoff * 2 ** (meta["attempts"] - 1)
+                        queue.update(message_id, meta)
+                        logging.warning(f"邮件发送失败，{delay:.0f} 秒后重试: {message_id}: {e}")
+                        time.sleep(delay)
+        finally:
+            delivery.close()
+    return sent, failed
+
+
+def start_background_drain(queue_dir=DEFAULT_QUEUE_DIR):
+    """启动独立的后台进程发送队列中的邮件，当前进程无需等待即可退出"""
+    project_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.makedirs(queue_dir, exist_ok=True)
+    log_file = open(os.path.join(queue_dir, "delivery.log"), 'ab')
+    kwargs = {"cwd": project_dir, "stdout": log_file, "stderr": subprocess.STDOUT, "stdin": subprocess.DEVNULL}
+    if sys.platform.startswith('win'):
+        kwargs["creationflags"] = subprocess.DETACHED_PROCESS | subprocess.CREATE_NEW_PROCESS_GROUP
+    else:
+        kwargs["start_new_session"] = True
+    process = subprocess.Popen([sys.executable, "-m", "utils.mail_queue", "--drain",
+                                "--queue-dir", os.path.abspath(queue_dir)], **kwargs)
+    log_file.close()
+    logging.info(f"已启动后台邮件发送进程: {process.pid}")
+    return process
+
+
+def parse_arguments():
+    """处理命令行参数"""
+    parser = argparse.ArgumentParser(description="发送邮件队列中的测试报告邮件")
+    parser.add_argument('--drain', action='store_true', help='发送队列中的所有邮件')
+    parser.add_argument('--queue-dir', default=DEFAULT_QUEUE_DIR, help='队列目录')
+    parser.add_argument('--host', help='SMTP服务器，默认读取邮件配置')
+    parser.add_argument('--port', type=int, help='SMTP端口，默认读取邮件配置')
+    parser.add_argument('--no-ssl', action='store_true', help='不使用SMTP_SSL（本地测试服务器）')
+    parser.add_argument('--no-auth', action='store_true', help='不进行SMTP认证（本地测试服务器）')
+    parser.add_argument('--sender', help='发件人地址，默认为配置中的用户名')
+    parser.add_argument('--max-attempts', type=int, default=DEFAULT_MAX_ATTEMPTS, help='每封邮件的最大尝试次数')
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_arguments()
+    if not args.drain:
+        sys.exit(0)
+
+    settings = {}
+    if not (args.host and args.port and (args.no_auth or args.sender)):
+        settings = load_email_settings()
+    delivery = SMTPDelivery(
+        host=args.host or settings.get("smtp_server"),
+        port=args.port or settings.get("smtp_port"),
+        username=None if args.no_auth else settings.get("username"),
+        password=None if args.no_auth else settings.get("password"),
+        use_ssl=False if args.no_ssl else settings.get("use_ssl", True),
+    )
+    sent, failed = drain(MailQueue(args.queue_dir), delivery, args.sender or settings.get("username"),
+                         max_attempts=args.max_attempts)
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,255 @@
+# coding = utf-8
+"""
+并行执行YAML用例
+
+把目录下的用例分配给多个worker，每个worker启动一个pytest进程执行分到的全部用例（通过
+--yaml-list 传入用例列表，进程内可以复用浏览器和 depends_on 的执行记录），执行结束后把各worker
+的allure结果合并到同一个目录。
+"""
+import os
+import sys
+import shutil
+import logging
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from extend.file_lock import FileLock
+from utils.case_history import order_cases, partition_by_duration
+
+# 支持的YAML文件后缀
+YAML_SUFFIXES = ('.yaml', '.yml')
+
+# pytest测试执行器
+TEST_RUNNER = "./test_case/test_runner3.py"
+
+# 各worker进程共享的失败计数文件和失败用例数上限，由 run_parallel 设置
+FAIL_FAST_FILE_ENV = "FAIL_FAST_FILE"
+FAIL_FAST_LIMIT_ENV = "FAIL_FAST_LIMIT"
+
+
+def collect_yaml_files(yaml_dir):
+    """
+    递归收集目录下的所有YAML文件
+
+    参数:
+        yaml_dir: YAML用例目录
+
+    返回:
+        list: 按路径排序的YAML文件列表，保证每次分配结果一致
+    """
+    yaml_files = []
+    for root, dirs, files in os.walk(yaml_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if file.lower().endswith(YAML_SUFFIXES):
+                yaml_files.append(os.path.join(root, file))
+    return yaml_files
+
+
+def partition_cases(yaml_files, workers):
+    """
+    把用例轮流分配给各个worker
+
+    参数:
+        yaml_files: YAML文件列表
+        workers: worker数量
+
+    返回:
+        list: 每个worker分到的YAML文件列表（不包含空列表）
+    """
+    buckets = [[] for _ in range(max(1, workers))]
+    for index, yaml_file in enumerate(yaml_files):
+        buckets[index % len(buckets)].append(yaml_file)
+    return [bucket for bucket in buckets if bucket]
+
+
+def write_yaml_list(yaml_files, path):
+    """把用例列表写入文件（每行一个路径），供pytest的 --yaml-list 参数读取"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("".join(f"{yaml_file}\n" for yaml_file in yaml_files))
+    return path
+
+
+def read_yaml_list(path):
+    """读取 --yaml-list 文件，返回绝对路径列表（保持文件中的顺序）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [os.path.abspath(line.strip()) for line in f if line.strip()]
+
+
+def item_yaml_file(item):
+    """返回pytest用例参数中的YAML文件绝对路径，没有时返回None"""
+    callspec = getattr(item, "callspec", None)
+    for value in (callspec.params.values() if callspec else ()):
+        if isinstance(value, (str, os.PathLike)) and str(value).lower().endswith(YAML_SUFFIXES):
+            return os.path.abspath(value)
+    return None
+
+
+def select_items(items, yaml_files):
+    """
+    按用例列表筛选并排序pytest收集到的用例
+
+    参数:
+        items: pytest收集到的用例
+        yaml_files: read_yaml_list 返回的列表
+
+    返回:
+        tuple: (按列表顺序排列的选中用例, 未选中的用例)
+    """
+    order = {path: index for index, path in enumerate(yaml_files)}
+    selected, deselected = [], []
+    for item in items:
+        (selected if item_yaml_file(item) in order else deselected).append(item)
+    selected.sort(key=lambda item: order[item_yaml_file(item)])
+    return selected, deselected
+
+
+class FailFast:
+    """
+    各worker进程共享的失败计数，失败用例数达到上限后不再开始新的用例
+
+    每个失败在计数文件中追加一个字节，文件大小即失败数，写入时加文件锁。
+
+    参数:
+        limit: 失败用例数上限，0表示不限制
+        path: 计数文件路径
+    """
+
+    def __init__(self, limit, path):
+        self.limit = limit
+        self.path = path
+
+    @classmethod
+    def from_env(cls):
+        """根据 run_parallel 设置的环境变量创建，未设置时返回None"""
+        path = os.environ.get(FAIL_FAST_FILE_ENV)
+        limit = int(os.environ.get(FAIL_FAST_LIMIT_ENV) or 0)
+        return cls(limit, path) if path and limit > 0 else None
+
+    def record_failure(self):
+        with FileLock(f"{self.path}.lock"):
+            with open(self.path, 'ab') as f:
+                f.write(b"x")
+
+    @property
+    def failures(self):
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return 0
+
+    @property
+    def stopped(self):
+        return self.limit > 0 and self.failures >= self.limit
+
+
+def _run_worker(worker_id, yaml_files, pytest_args, alluredir, yaml_dir, env=None):
+    """
+    在一个pytest进程中执行worker分配到的全部用例
+
+    用例列表写入临时文件，通过 --yaml-list 传给pytest，按列表顺序执行；
+    进程内的driver夹具创建自己的浏览器，开启复用池时在用例之间复用。
+
+    返回:
+        int: pytest进程的退出码
+    """
+    fd, list_path = tempfile.mkstemp(prefix=f"worker-{worker_id}-", suffix=".txt")
+    os.close(fd)
+    try:
+        write_yaml_list(yaml_files, list_path)
+        cmd = [sys.executable, "-m", "pytest", *pytest_args, TEST_RUNNER,
+               "--yaml-dir", yaml_dir, "--yaml-list", list_path]
+        if alluredir:
+            cmd.extend(["--alluredir", alluredir])
+
+        logging.info(f"[worker-{worker_id}] 执行 {len(yaml_files)} 个用例")
+        result = subprocess.run(cmd, env=env)
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        logging.error(f"[worker-{worker_id}] 用例执行失败 (退出码 {result.returncode})")
+    return result.returncode
+
+
+def merge_allure_results(worker_dirs, target_dir):
+    """
+    把各worker的allure结果合并到目标目录
+
+    allure结果文件名基于uuid，不会冲突；environment.properties等同名文件以后者为准。
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    merged = 0
+    for worker_dir in worker_dirs:
+        if not os.path.isdir(worker_dir):
+            continue
+        for file in os.listdir(worker_dir):
+            shutil.move(os.path.join(worker_dir, file), os.path.join(target_dir, file))
+            merged += 1
+        shutil.rmtree(worker_dir, ignore_errors=True)
+    logging.info(f"已合并 {merged} 个allure结果文件到: {target_dir}")
+    return merged
+
+
+def run_parallel(yaml_dir, workers, pytest_args=None, alluredir=None, clean_alluredir=False, history=None,
+                 fail_fast=0, yaml_files=None):
+    """
+    使用多个worker并行执行目录下的YAML用例
+
+    参数:
+        yaml_dir: YAML用例目录
+        workers: worker数量
+        pytest_args: 传递给每个pytest进程的额外参数，如 ["-s", "--headless"]
+        alluredir: allure结果目录，为None时不收集allure结果
+        clean_alluredir: 执行前是否清空allure结果目录
+        history: CaseHistory，提供时按历史安排顺序（可能失败的用例优先，并行时耗时长的先分配），否则按文件顺序轮流分配
+        fail_fast: 各worker的失败用例数合计达到该值后不再开始新的用例，0表示不限制
+        yaml_files: 要执行的YAML文件列表（如分片后的用例），默认为目录下的全部用例
+
+    返回:
+        int: 退出码（全部成功为0）
+    """
+    pytest_args = list(pytest_args or [])
+    if yaml_files is None:
+        yaml_files = collect_yaml_files(yaml_dir)
+    if not yaml_files:
+        logging.error(f"目录中没有找到YAML用例: {yaml_dir}")
+        return 5  # 与pytest的"没有收集到用例"退出码保持一致
+
+    if history is None:
+        buckets = partition_cases(yaml_files, workers)
+    elif workers > 1:
+        buckets = partition_by_duration(yaml_files, workers, history)
+    else:
+        buckets = [order_cases(yaml_files, history)]
+    logging.info(f"共 {len(yaml_files)} 个用例，分配给 {len(buckets)} 个worker并行执行")
+
+    if alluredir and clean_alluredir and os.path.isdir(alluredir):
+        shutil.rmtree(alluredir, ignore_errors=True)
+
+    # 每个worker写入独立的临时结果目录，结束后再合并
+    worker_dirs = []
+    if alluredir:
+        worker_dirs = [os.path.join(alluredir, f".worker-{i}") for i in range(len(buckets))]
+
+    env = dict(os.environ)
+    counter_dir = None
+    if fail_fast > 0:
+        counter_dir = tempfile.mkdtemp(prefix="fail_fast_")
+        env[FAIL_FAST_FILE_ENV] = os.path.join(counter_dir, "failures")
+        env[FAIL_FAST_LIMIT_ENV] = str(fail_fast)
+    try:
+        with ThreadPoolExecutor(max_workers=len(buckets)) as executor:
+            futures = [
+                executor.submit(_run_worker, i, bucket, pytest_args, worker_dirs[i] if worker_dirs else None,
+                                yaml_dir, env)
+                for i, bucket in enumerate(buckets)
+            ]
+            exit_codes = [future.result() for future in futures]
+    finally:
+        if counter_dir:
+            shutil.rmtree(counter_dir, ignore_errors=True)
+
+    if alluredir:
+        merge_allure_results(worker_dirs, alluredir)
+
+    return next((code for code in exit_codes if code != 0), 0)
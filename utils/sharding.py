@@ -0,0 +1,154 @@
+# coding = utf-8
+"""
+多节点分片执行
+
+把YAML用例分成n个分片，由n台机器分别执行（run.py --shard i/n）：
+- 每个用例单独分配；depends_on 中的依赖（如公共的登录用例）由各分片在执行用例时各自执行，
+  不会把依赖同一个文件的用例都分到同一个分片
+- 按用例历史耗时（utils/case_history.py）加上其依赖链的耗时分配，耗时长的用例先分给当前总耗时最少的分片
+各节点必须使用相同的用例目录和历史文件，才能得到一致且不重叠的分片。
+执行结束后用 merge 命令把各分片的allure结果合并到一个目录，并把结果写入历史，供下次分片使用：
+
+    python -m utils.sharding merge shard-1/allure-results shard-2/allure-results -o allure-results
+"""
+import os
+import sys
+import heapq
+import shutil
+import logging
+import argparse
+from parse.case_loader import load_depends, CaseLoadError
+from utils.case_history import CaseHistory, HISTORY_FILE
+
+
+def parse_shard(spec):
+    """
+    解析分片参数 "i/n"（i从1开始）
+
+    返回:
+        tuple: (i, n)
+
+    异常:
+        ValueError: 格式错误或超出范围时抛出
+    """
+    try:
+        index, total = (int(part) for part in str(spec).split("/"))
+    except ValueError:
+        raise ValueError(f"分片参数格式应为 i/n，例如 1/4: {spec}")
+    if total < 1 or not 1 <= index <= total:
+        raise ValueError(f"分片序号应在 1 到 {total} 之间: {spec}")
+    return index, total
+
+
+def dependency_chain(yaml_file):
+    """
+    用例直接和间接依赖的文件（绝对路径，按发现顺序，不包含用例本身）
+
+    分片执行时每个分片会在执行用例前各自执行这些依赖。
+    """
+    root = os.path.abspath(yaml_file)
+    chain, seen, pending = [], {root}, [root]
+    while pending:
+        path = pending.pop()
+        try:
+            depends = load_depends(path) if os.path.exists(path) else []
+        except (OSError, CaseLoadError):
+            depends = []
+        for depend in depends:
+            depend = os.path.abspath(depend)
+            if depend not in seen:
+                seen.add(depend)
+                chain.append(depend)
+                pending.append(depend)
+    return chain
+
+
+def case_cost(yaml_file, history):
+    """用例在分片中的预计耗时：用例本身加上其依赖链"""
+    return history.duration(yaml_file) + sum(history.duration(os.path.relpath(depend))
+                                             for depend in dependency_chain(yaml_file))
+
+
+def assign_shards(yaml_files, total, history):
+    """
+    把用例分配到total个分片，按历史耗时（包括各自的依赖链）均衡
+
+    返回:
+        list: 长度为total的列表，每个元素是该分片的YAML文件列表（可能为空）
+    """
+    costs = [case_cost(yaml_file, history) for yaml_file in yaml_files]
+    heap = [(0.0, index) for index in range(total)]
+    shards = [[] for _ in range(total)]
+    loads = [0.0] * total
+    # 按耗时从长到短分配，耗时相同时按文件路径排序，保证各节点计算结果一致
+    for cost, yaml_file in sorted(zip(costs, yaml_files), key=lambda item: (-item[0], item[1])):
+        load, index = heapq.heappop(heap)
+        shards[index].append(yaml_file)
+        loads[index] = load + cost
+        heapq.heappush(heap, (loads[index], index))
+
+    order = {f: i for i, f in enumerate(yaml_files)}
+    for index, shard in enumerate(shards):
+        shard.sort(key=order.get)
+        logging.debug(f"分片 {index + 1}/{total}: {len(shard)} 个用例，预计耗时 {loads[index]:.0f} 秒")
+    return shards
+
+
+def select_shard(yaml_files, spec, history=None):
+    """
+    返回分片参数 "i/n" 对应分片的用例列表
+    """
+    index, total = parse_shard(spec)
+    shards = assign_shards(yaml_files, total, history or CaseHistory())
+    shard = shards[index - 1]
+    logging.info(f"分片 {index}/{total}: 执行 {len(shard)}/{len(yaml_files)} 个用例")
+    return shard
+
+
+def merge_shard_results(shard_dirs, target_dir):
+    """
+    把各分片的allure结果复制到目标目录（不修改分片目录）
+
+    结果和附件文件名基于uuid，不会冲突；environment.properties 等同名文件以后者为准。
+
+    返回:
+        int: 复制的文件数
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    merged = 0
+    for shard_dir in shard_dirs:
+        if not os.path.isdir(shard_dir):
+            logging.warning(f"分片结果目录不存在: {shard_dir}")
+            continue
+        if os.path.abspath(shard_dir) == os.path.abspath(target_dir):
+            continue
+        for root, _, files in os.walk(shard_dir):
+            target = os.path.join(target_dir, os.path.relpath(root, shard_dir))
+            os.makedirs(target, exist_ok=True)
+            for file in files:
+                shutil.copy2(os.path.join(root, file), os.path.join(target, file))
+                merged += 1
+    logging.info(f"已合并 {merged} 个分片结果文件到: {target_dir}")
+    return merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="合并各分片的allure结果")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    merge = subparsers.add_parser("merge", help="合并各分片的allure结果并写入用例执行历史")
+    merge.add_argument("shard_dirs", nargs="+", help="各分片的allure结果目录")
+    merge.add_argument("-o", "--output", default="./allure-results", help="合并后的结果目录，默认为./allure-results")
+    merge.add_argument("-d", "--directory", default="examples", help="用例目录，用于把结果对应到用例，默认为examples")
+    merge.add_argument("--history", default=HISTORY_FILE, help=f"用例执行历史文件，默认为{HISTORY_FILE}")
+    args = parser.parse_args(argv)
+
+    from utils.parallel_runner import collect_yaml_files
+    if not merge_shard_results(args.shard_dirs, args.output):
+        return 1
+    CaseHistory(args.history).ingest(args.output, collect_yaml_files(args.directory))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    sys.exit(main())